@@ -0,0 +1,144 @@
+"""Batch lookups with bounded concurrency, yielding results as they complete."""
+
+import asyncio
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# A city name or a (lat, lon) pair
+Query = Union[str, Tuple[float, float]]
+
+
+class BatchResult:
+    """Outcome of one query in a batch: either data or the error it raised."""
+
+    __slots__ = ("query", "data", "error", "elapsed")
+
+    def __init__(
+        self,
+        query: Query,
+        data: Optional[Any] = None,
+        error: Optional[Exception] = None,
+        elapsed: float = 0.0,
+    ):
+        self.query = query
+        self.data = data
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        status = "ok" if self.ok else f"error={self.error}"
+        return f"BatchResult({self.query!r}, {status}, {self.elapsed * 1000:.1f} ms)"
+
+
+class BatchStats:
+    """Aggregate counters for a batch run."""
+
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.latencies: List[float] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return end - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Completed queries (successful or not) per second."""
+        elapsed = self.elapsed
+        return (self.completed + self.failed) / elapsed if elapsed else 0.0
+
+    def record(self, result: BatchResult):
+        if result.ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self.latencies.append(result.elapsed)
+
+    def summary(self) -> Dict[str, Any]:
+        summary = {
+            "completed": self.completed,
+            "failed": self.failed,
+            "elapsed_s": round(self.elapsed, 3),
+            "cities_per_sec": round(self.throughput, 1),
+        }
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            summary["p50_ms"] = round(statistics.median(ordered) * 1000, 2)
+            summary["p95_ms"] = round(ordered[max(0, int(round(0.95 * len(ordered))) - 1)] * 1000, 2)
+        return summary
+
+
+_DONE = object()
+
+
+class WeatherBatch:
+    """
+    Async iterator that runs queries through a fixed number of workers.
+
+    Results are yielded in completion order. A failing query produces a
+    BatchResult with its error instead of stopping the batch. Queries are
+    pulled from the iterable lazily, so very long site lists are fine.
+    Leaving the loop early cancels the remaining work.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[Query], Awaitable[Any]],
+        queries: Iterable[Query],
+        concurrency: int,
+    ):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self._fetch = fetch
+        self._queries = queries
+        self.concurrency = concurrency
+        self.stats = BatchStats()
+
+    def __aiter__(self):
+        return self._results()
+
+    async def _results(self):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency)
+        queries = iter(self._queries)
+        self.stats.started_at = time.perf_counter()
+        workers = [
+            asyncio.create_task(self._worker(queries, queue))
+            for _ in range(self.concurrency)
+        ]
+        remaining = len(workers)
+        try:
+            while remaining:
+                result = await queue.get()
+                if result is _DONE:
+                    remaining -= 1
+                    continue
+                self.stats.record(result)
+                yield result
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.stats.finished_at = time.perf_counter()
+
+    async def _worker(self, queries: Iterator[Query], queue: asyncio.Queue):
+        # Workers share one iterator; next() never runs concurrently on one loop
+        for query in queries:
+            start = time.perf_counter()
+            try:
+                data = await self._fetch(query)
+                result = BatchResult(query, data=data, elapsed=time.perf_counter() - start)
+            except Exception as e:
+                result = BatchResult(query, error=e, elapsed=time.perf_counter() - start)
+            await queue.put(result)
+        await queue.put(_DONE)
@@ -0,0 +1,672 @@
+"""
+Benchmarks for the weather service, run against the local stand-in server.
+
+Usage:
+    python benchmarks.py             # run every benchmark
+    python benchmarks.py pool        # run only the named benchmarks
+"""
+
+import asyncio
+import contextlib
+import gc
+import heapq
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+# The stand-in server does not check the key, but Config requires one
+os.environ.setdefault("OPENWEATHER_API_KEY", "benchmark-key")
+# Benchmarks measure the service itself, not the API key's quota
+os.environ.setdefault("WEATHER_RATE_LIMIT", "0")
+# No background prefetching while measuring
+os.environ.setdefault("WEATHER_PREFETCH_BUDGET", "0")
+
+import flet as ft  # noqa: E402
+import httpx  # noqa: E402
+from flet.core.local_connection import LocalConnection  # noqa: E402
+from flet.core.protocol import (  # noqa: E402
+    ClientActions,
+    ClientMessage,
+    CommandEncoder,
+    PageCommandResponsePayload,
+    PageCommandsBatchResponsePayload,
+)
+from city_index import CityIndex, build_index, fold  # noqa: E402
+from config import Config  # noqa: E402
+from decode import Decoder, available_backends  # noqa: E402
+from disk_cache import DiskCache  # noqa: E402
+from fake_server import FakeWeatherServer, forecast_payload, weather_payload  # noqa: E402
+from forecast import ForecastColumns, aggregate_daily  # noqa: E402
+from geo import LocationCache, grid_cell  # noqa: E402
+from hedging import Endpoint  # noqa: E402
+import main as weather_app  # noqa: E402
+from models import CurrentWeather, Forecast  # noqa: E402
+from weather_service import WeatherService  # noqa: E402
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Return mean/p50/p95 (milliseconds) for a list of latencies in seconds."""
+    ordered = sorted(latencies)
+    p95_index = max(0, int(round(0.95 * len(ordered))) - 1)
+    return {
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[p95_index] * 1000,
+        "total_ms": sum(ordered) * 1000,
+    }
+
+
+def print_summary(label: str, latencies: List[float], extra: str = ""):
+    """Print one benchmark result line."""
+    s = summarize(latencies)
+    print(
+        f"  {label:<28} mean {s['mean_ms']:7.2f} ms  p50 {s['p50_ms']:7.2f} ms  "
+        f"p95 {s['p95_ms']:7.2f} ms  total {s['total_ms']:8.1f} ms  {extra}"
+    )
+
+
+async def bench_pool(lookups: int = 30, handshake_delay: float = 0.03, latency: float = 0.005):
+    """
+    Back-to-back lookups with a new AsyncClient per call (the old behavior)
+    versus the shared pooled client in WeatherService.
+    """
+    print(f"\n[pool] {lookups} sequential lookups, "
+          f"{handshake_delay * 1000:.0f} ms simulated handshake, "
+          f"{latency * 1000:.0f} ms server latency")
+
+    async with FakeWeatherServer(latency=latency, handshake_delay=handshake_delay) as server:
+        # Distinct cities, so the response cache does not hide the network
+        cities = [f"City {i}" for i in range(lookups)]
+
+        # Old behavior: one client (and one connection) per lookup
+        latencies = []
+        for city in cities:
+            start = time.perf_counter()
+            async with httpx.AsyncClient(timeout=Config.TIMEOUT) as client:
+                response = await client.get(
+                    server.weather_url,
+                    params={"q": city, "appid": Config.API_KEY, "units": Config.UNITS},
+                )
+                response.json()
+            latencies.append(time.perf_counter() - start)
+        print_summary("client per call", latencies, f"connections {server.connection_count}")
+
+        # New behavior: one pooled client reused across lookups
+        server.connection_count = 0
+        latencies = []
+        async with WeatherService(base_url=server.weather_url, forecast_url=server.forecast_url) as service:
+            for city in cities:
+                start = time.perf_counter()
+                await service.get_weather(city)
+                latencies.append(time.perf_counter() - start)
+        print_summary("shared pooled client", latencies, f"connections {server.connection_count}")
+
+
+async def bench_coldstart(runs: int = 5, handshake_delay: float = 0.1, latency: float = 0.15):
+    """
+    Time from app start to having both the current weather and forecast
+    ready to render, with an empty versus a warm (stale) disk cache.
+    """
+    print(f"\n[coldstart] {runs} cold starts, {handshake_delay * 1000:.0f} ms handshake, "
+          f"{latency * 1000:.0f} ms server latency")
+
+    async def first_render(server, disk):
+        # A fresh service models a restarted app: empty memory cache and pool
+        async with WeatherService(
+            base_url=server.weather_url,
+            forecast_url=server.forecast_url,
+            disk_cache=disk,
+        ) as service:
+            start = time.perf_counter()
+            await service.get_weather("London")
+            await service.get_forecast("London")
+            return time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        async with FakeWeatherServer(latency=latency, handshake_delay=handshake_delay) as server:
+            latencies = [await first_render(server, None) for _ in range(runs)]
+            print_summary("no disk cache", latencies)
+
+            disk = DiskCache(f"{tmp}/cache.sqlite3", max_snapshots=Config.OFFLINE_SNAPSHOTS)
+            await first_render(server, disk)  # previous session fills the cache
+            # Age the entries past their TTL so every start serves stale data;
+            # they are stored under London's grid cell, learned from the disk
+            location = grid_cell(*LocationCache(disk_cache=disk).read("london"), Config.GRID_RESOLUTION)
+            for key in (f"weather|{location}|{Config.UNITS}", f"forecast|{location}|{Config.UNITS}"):
+                body = disk.get(key)[0]
+                disk.set(key, body, stored_at=time.time() - 2 * Config.FORECAST_TTL)
+            latencies = [await first_render(server, disk) for _ in range(runs)]
+            print_summary("stale disk cache (SWR)", latencies)
+            disk.close()
+
+
+async def bench_batch(cities: int = 300, latency: float = 0.02):
+    """
+    Throughput of get_weather_many at different concurrency caps.
+
+    The stand-in server shares the event loop (and CPU) with the client,
+    so very high caps measure local CPU rather than network overlap.
+    """
+    print(f"\n[batch] {cities} cities, {latency * 1000:.0f} ms server latency")
+    async with FakeWeatherServer(latency=latency) as server:
+        for concurrency in (1, 5, 10, 20):
+            server.connection_count = 0
+            async with WeatherService(
+                base_url=server.weather_url,
+                forecast_url=server.forecast_url,
+                max_connections=concurrency,
+                max_keepalive_connections=concurrency,
+            ) as service:
+                batch = service.get_weather_many(
+                    (f"Site {i}" for i in range(cities)), concurrency=concurrency
+                )
+                async for _ in batch:
+                    pass
+            s = batch.stats.summary()
+            print(f"  concurrency {concurrency:<3}  {s['cities_per_sec']:8.1f} cities/s  "
+                  f"elapsed {s['elapsed_s']:6.2f} s  p50 {s['p50_ms']:6.2f} ms  "
+                  f"connections {server.connection_count}")
+
+
+async def bench_first_paint(searches: int = 10, latency: float = 0.1):
+    """
+    Time until the current weather can be rendered when the forecast is
+    fetched after it (old behavior) versus alongside it.
+    """
+    print(f"\n[first_paint] {searches} searches, {latency * 1000:.0f} ms server latency")
+    async with FakeWeatherServer(latency=latency) as server:
+        async with WeatherService(base_url=server.weather_url, forecast_url=server.forecast_url) as service:
+            await service._open_client()  # exclude one-time SSL context setup
+
+            serial, concurrent, complete = [], [], []
+            for i in range(searches):
+                start = time.perf_counter()
+                await service.get_weather(f"Serial {i}")
+                await service.get_forecast(f"Serial {i}")
+                # Nothing rendered until both responses were in
+                serial.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                forecast = asyncio.create_task(service.get_forecast(f"Concurrent {i}"))
+                await service.get_weather(f"Concurrent {i}")
+                concurrent.append(time.perf_counter() - start)
+                await forecast
+                complete.append(time.perf_counter() - start)
+            print_summary("serial (first paint)", serial)
+            print_summary("concurrent (first paint)", concurrent)
+            print_summary("concurrent (forecast in)", complete)
+
+
+def noon_pick(data: Dict) -> List:
+    """The old display_forecast grouping: one slot nearest noon per host-local day."""
+    daily_forecasts = {}
+    for item in data.get("list", []):
+        dt = datetime.fromtimestamp(item["dt"])
+        day = dt.date()
+        hour = dt.hour
+        if day not in daily_forecasts or abs(hour - 12) < abs(datetime.fromtimestamp(daily_forecasts[day]["dt"]).hour - 12):
+            daily_forecasts[day] = item
+    return sorted(list(daily_forecasts.items()))[:5]
+
+
+def forecast_samples(count: int) -> List[Dict]:
+    """Decoded forecast responses for `count` cities spread over every UTC offset."""
+    samples = []
+    for i in range(count):
+        data = forecast_payload(f"City {i}")
+        data["city"]["timezone"] = (i % 27 - 12) * 3600
+        samples.append(data)
+    return samples
+
+
+async def bench_forecast(forecasts: int = 5000):
+    """
+    Per-day forecast summaries: the old noon-pick loop over the raw dicts
+    versus the NumPy aggregation over parsed Forecast models (which also
+    computes true min/max/mean, pop and the dominant condition).
+    """
+    print(f"\n[forecast] {forecasts} forecasts of 40 slots each")
+    samples = forecast_samples(forecasts)
+    parsed = [Forecast.from_response(data) for data in samples]
+
+    for label, aggregate, inputs in (
+        ("noon pick (old, dicts)", noon_pick, samples),
+        ("numpy aggregate (models)", aggregate_daily, parsed),
+    ):
+        latencies = []
+        for item in inputs:
+            start = time.perf_counter()
+            aggregate(item)
+            latencies.append(time.perf_counter() - start)
+        print_summary(label, latencies, f"{forecasts / sum(latencies):,.0f} forecasts/s")
+
+    # All forecasts in one set of arrays, as a batch job would
+    start = time.perf_counter()
+    columns = ForecastColumns(parsed)
+    built = time.perf_counter()
+    columns.daily()
+    done = time.perf_counter()
+    print(f"  {'numpy aggregate (batch)':<28} columns {(built - start) * 1000:7.1f} ms  "
+          f"aggregate {(done - built) * 1000:7.1f} ms  {forecasts / (done - start):,.0f} forecasts/s")
+
+
+def retained(build: Callable[[], List]) -> Tuple[float, int]:
+    """Return (seconds to run build(), bytes its result keeps allocated)."""
+    # Timed without tracemalloc, which slows allocation down considerably
+    gc.collect()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, size
+
+
+async def bench_models(responses: int = 2000):
+    """
+    Memory held and parse time for a large batch of responses: decoded
+    dicts (what the app kept before) versus CurrentWeather/Forecast models.
+    """
+    print(f"\n[models] {responses} current weather + {responses} forecast responses")
+    weather_bodies = [
+        json.dumps(weather_payload(f"City {i}")).encode() for i in range(responses)
+    ]
+    forecast_bodies = [json.dumps(data).encode() for data in forecast_samples(responses)]
+
+    for kind, bodies, parse in (
+        ("weather", weather_bodies, CurrentWeather.from_response),
+        ("forecast", forecast_bodies, Forecast.from_response),
+    ):
+        dict_time, dict_bytes = retained(lambda: [json.loads(b) for b in bodies])
+        model_time, model_bytes = retained(lambda: [parse(json.loads(b)) for b in bodies])
+        print(f"  {kind:<9} dicts  {dict_bytes / responses:9,.0f} B/response  "
+              f"{dict_time / responses * 1e6:7.1f} us/response")
+        print(f"  {kind:<9} models {model_bytes / responses:9,.0f} B/response  "
+              f"{model_time / responses * 1e6:7.1f} us/response  "
+              f"({dict_bytes / model_bytes:.1f}x smaller)")
+
+def peak_allocation(fn: Callable[[], object]) -> int:
+    """Peak bytes allocated while running fn() once."""
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+async def bench_decode(responses: int = 2000):
+    """
+    Decoding response bodies into models with each installed JSON backend:
+    time per response one at a time and in bulk, and peak allocations
+    while decoding a single response.
+    """
+    print(f"\n[decode] backends: {', '.join(available_backends())}; {responses} bodies per kind")
+    weather_bodies = [
+        json.dumps(weather_payload(f"City {i}")).encode() for i in range(responses)
+    ]
+    forecast_bodies = [json.dumps(data).encode() for data in forecast_samples(responses)]
+
+    for kind, bodies in (("weather", weather_bodies), ("forecast", forecast_bodies)):
+        print(f"  {kind} ({len(bodies[0]):,} byte bodies)")
+        for backend in available_backends():
+            decoder = Decoder(backend)
+            decode = decoder.weather if kind == "weather" else decoder.forecast
+            latencies = []
+            for body in bodies[:200]:
+                start = time.perf_counter()
+                decode(body)
+                latencies.append(time.perf_counter() - start)
+            gc.collect()
+            start = time.perf_counter()
+            for body in bodies:
+                decode(body)
+            bulk = (time.perf_counter() - start) / len(bodies)
+            peak = peak_allocation(lambda: decode(bodies[0]))
+            s = summarize(latencies)
+            print(f"    {backend:<8} single p50 {s['p50_ms'] * 1000:7.1f} us  "
+                  f"bulk {bulk * 1e6:7.1f} us/response  peak alloc {peak:8,} B")
+
+
+class RecordingConnection(LocalConnection):
+    """
+    Stand-in for Flet's socket connection that keeps the size of every
+    message a page update would send to the client, instead of sending it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.sent: List[int] = []  # bytes per message
+
+    def send_command(self, session_id, command):
+        result, message = self._process_command(command)
+        if message:
+            self._record(message)
+        return PageCommandResponsePayload(result=result, error="")
+
+    def send_commands(self, session_id, commands):
+        # Same batching as Flet's socket connection
+        results, messages = [], []
+        for command in commands:
+            result, message = self._process_command(command)
+            if command.name in ("add", "get"):
+                results.append(result)
+            if message:
+                messages.append(message)
+        if messages:
+            self._record(ClientMessage(ClientActions.PAGE_CONTROLS_BATCH, messages))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+    def _record(self, message):
+        self.sent.append(len(json.dumps(message, cls=CommandEncoder, separators=(",", ":"))))
+
+
+class RebuildingWeatherApp(weather_app.WeatherApp):
+    """
+    The old rendering: every search result and unit toggle replaced the
+    current weather column and the forecast cards with new controls,
+    which Flet sends to the client whole.
+    """
+
+    def render_weather(self, weather: CurrentWeather):
+        self.build_weather_card()
+        super().render_weather(weather)
+
+    def render_forecast(self):
+        self.forecast_cards = [self.create_forecast_card() for _ in range(5)]
+        self.forecast_container.content = ft.Column(
+            [card.container for card in self.forecast_cards], spacing=6
+        )
+        super().render_forecast()
+
+
+async def render_updates(app_class, results: List[Tuple[CurrentWeather, Forecast]]) -> Dict:
+    """Drive one app over the results; returns its setup bytes and per-update times and bytes."""
+    conn = RecordingConnection()
+    page = ft.Page(conn, "benchmark", asyncio.get_running_loop())
+    app = app_class(page)
+    report = {"setup_bytes": sum(conn.sent), "search_times": [], "search_bytes": [],
+              "toggle_times": [], "toggle_bytes": []}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for weather, forecast in results:
+            mark = len(conn.sent)
+            start = time.perf_counter()
+            app.current_weather_data = weather
+            app.render_weather(weather)
+            app.weather_container.visible = True
+            app.display_forecast(forecast)
+            page.update()
+            report["search_times"].append(time.perf_counter() - start)
+            report["search_bytes"].append(sum(conn.sent[mark:]))
+
+            mark = len(conn.sent)
+            start = time.perf_counter()
+            app.toggle_temp_unit(None)
+            app.ui.flush()  # send now instead of on the next frame
+            report["toggle_times"].append(time.perf_counter() - start)
+            report["toggle_bytes"].append(sum(conn.sent[mark:]))
+        await app.shutdown()
+    return report
+
+
+async def bench_render(searches: int = 50):
+    """
+    Wire size and Python-side time of the page updates behind a search
+    result (current weather plus forecast) and a unit toggle, measured on
+    a real Flet page with the socket replaced by a recorder: controls
+    rebuilt on every render (old) versus built once and patched in place.
+    """
+    print(f"\n[render] {searches} search results and unit toggles")
+    decoder = Decoder("json")
+    results = [
+        (
+            decoder.weather(json.dumps(weather_payload(f"City {i}")).encode()),
+            decoder.forecast(json.dumps(data).encode()),
+        )
+        for i, data in enumerate(forecast_samples(searches))
+    ]
+
+    names = ("CACHE_DB_PATH", "SETTINGS_PATH", "ASSETS_DIR", "ICON_URL")
+    saved = {name: getattr(Config, name) for name in names}
+    reports = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        Config.CACHE_DB_PATH = os.path.join(tmp, "cache.sqlite3")
+        Config.SETTINGS_PATH = os.path.join(tmp, "settings.json")
+        Config.ASSETS_DIR = tmp
+        try:
+            # The app downloads its icons in the background; keep that local
+            async with FakeWeatherServer() as server:
+                Config.ICON_URL = server.icon_url
+                for label, app_class in (
+                    ("rebuild controls (old)", RebuildingWeatherApp),
+                    ("patch in place", weather_app.WeatherApp),
+                ):
+                    reports.append((label, await render_updates(app_class, results)))
+        finally:
+            os.chdir(cwd)
+            for name, value in saved.items():
+                setattr(Config, name, value)
+
+    for label, report in reports:
+        print(f"  {label}: page setup {report['setup_bytes']:,} B")
+        # The first result builds the controls; report steady state separately
+        print_summary("  first search result", report["search_times"][:1],
+                      f"{report['search_bytes'][0]:7,} B")
+        print_summary("  search result", report["search_times"][1:],
+                      f"{statistics.mean(report['search_bytes'][1:]):7,.0f} B/update")
+        print_summary("  unit toggle", report["toggle_times"],
+                      f"{statistics.mean(report['toggle_bytes']):7,.0f} B/update")
+
+
+async def bench_grid(readings: int = 200, spread: float = 0.02, latency: float = 0.02):
+    """
+    Upstream requests and cache hit rate for location lookups around a few
+    cities (GPS readings scattered up to `spread` degrees, plus respelled
+    city names), for several grid cell sizes.
+    """
+    print(f"\n[grid] {readings} readings within {spread} degrees of 5 cities, "
+          f"{latency * 1000:.0f} ms upstream latency")
+    cities = ["London", "Pili", "Naga", "Tokyo", "Quito"]
+    rng = random.Random(5)
+    for resolution in (1e-6, 0.01, 0.05, 0.1):
+        async with FakeWeatherServer(latency=latency) as server:
+            async with WeatherService(
+                base_url=server.weather_url,
+                forecast_url=server.forecast_url,
+                grid_resolution=resolution,
+            ) as service:
+                centers = {}
+                for city in cities:
+                    weather = await service.get_weather(city)
+                    centers[city] = (weather.lat, weather.lon)
+                latencies = []
+                for _ in range(readings):
+                    city = rng.choice(cities)
+                    start = time.perf_counter()
+                    if rng.random() < 0.2:
+                        await service.get_weather(f"  {city.upper()} ")
+                    else:
+                        lat, lon = centers[city]
+                        await service.get_weather_by_coordinates(
+                            lat + rng.uniform(-spread, spread), lon + rng.uniform(-spread, spread)
+                        )
+                    latencies.append(time.perf_counter() - start)
+                stats = service.location_stats
+        label = "exact points" if resolution < 1e-3 else f"{resolution:g} degree cells"
+        print_summary(label, latencies,
+                      f"{server.request_count:4} requests  hit rate {stats.hit_rate:5.1%}")
+
+
+async def bench_hedge(
+    lookups: int = 300, latency: float = 0.02, jitter: float = 0.02,
+    stall_rate: float = 0.05, stall: float = 0.5,
+):
+    """
+    Lookup latency against one upstream with a long tail (`stall_rate` of
+    requests take `stall` seconds longer), alone and with a second, equally
+    unreliable mirror that slow requests are hedged to.
+    """
+    print(f"\n[hedge] {lookups} lookups, {latency * 1000:.0f}-{(latency + jitter) * 1000:.0f} ms "
+          f"upstream latency, {stall_rate:.0%} stall {stall * 1000:.0f} ms")
+    for mirrors in (0, 1):
+        async with contextlib.AsyncExitStack() as stack:
+            servers = [
+                await stack.enter_async_context(
+                    FakeWeatherServer(
+                        latency=latency, jitter=jitter, stall_rate=stall_rate, stall=stall, seed=i
+                    )
+                )
+                for i in range(1 + mirrors)
+            ]
+            endpoints = [Endpoint(s.weather_url, s.forecast_url) for s in servers]
+            async with WeatherService(endpoints=endpoints) as service:
+                latencies = []
+                for i in range(lookups):
+                    start = time.perf_counter()
+                    await service.get_weather(f"City {i}")
+                    latencies.append(time.perf_counter() - start)
+                hedger = service.hedger
+        upstream = sum(server.request_count for server in servers)
+        print_summary("single endpoint" if not mirrors else "hedged to mirror", latencies,
+                      f"{upstream:4} requests  hedges {hedger.hedges}  won {hedger.hedge_wins}")
+
+
+def synthetic_city_list(cities: int, seed: int = 7) -> List[Dict]:
+    """
+    A stand-in for OpenWeather's city.list.json (not bundled): same fields,
+    skewed first syllables and common words like "San" so some prefixes
+    match many cities, and a population for one city in four.
+    """
+    rng = random.Random(seed)
+    syllables = ["sa", "ka", "ma", "la", "to", "ber", "lon", "par", "ri", "no",
+                 "vi", "go", "han", "chi", "de", "el", "os", "ta", "mun", "quo"]
+    weights = [30, 20, 18, 15, 10, 8, 6, 6, 5, 5, 4, 4, 3, 3, 3, 2, 2, 2, 1, 1]
+    words = ["San", "Saint", "New", "Port", "Santa", "Bad", "Le", "El"]
+    countries = ["US", "PH", "DE", "FR", "BR", "IN", "CN", "MX", "IT", "ES", "GB", "JP"]
+    result = []
+    for i in range(cities):
+        name = "".join(rng.choices(syllables, weights, k=rng.randint(2, 4))).capitalize()
+        if rng.random() < 0.08:
+            name = f"{rng.choice(words)} {name}"
+        item = {
+            "id": 1_000_000 + i,
+            "name": name,
+            "state": "",
+            "country": rng.choice(countries),
+            "coord": {"lon": round(rng.uniform(-180, 180), 5), "lat": round(rng.uniform(-90, 90), 5)},
+        }
+        if rng.random() < 0.25:
+            item["population"] = int(rng.paretovariate(1.2) * 1000)
+        result.append(item)
+    return result
+
+
+async def bench_autocomplete(cities: int = 200_000, queries: int = 2000):
+    """
+    City suggestions from a memory-mapped prefix index versus keeping the
+    parsed city list in memory and scanning it: load time, Python memory
+    held, and latency per keystroke.
+    """
+    print(f"\n[autocomplete] {cities:,} synthetic cities, {queries} keystrokes")
+    city_list = synthetic_city_list(cities)
+    rng = random.Random(11)
+    prefixes = []
+    for _ in range(queries):
+        name = rng.choice(city_list)["name"]
+        prefixes.append(name[:rng.randint(1, min(8, len(name)))])
+    history = [f"{c['name']},{c['country']}" for c in rng.sample(city_list, 10)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "city.list.json")
+        with open(source, "w", encoding="utf-8") as f:
+            json.dump(city_list, f)
+        index_path = os.path.join(tmp, "cities.idx")
+        start = time.perf_counter()
+        build_index(source, index_path)
+        build_time = time.perf_counter() - start
+        print(f"  city.list.json {os.path.getsize(source) / 1e6:6.1f} MB  "
+              f"index {os.path.getsize(index_path) / 1e6:6.1f} MB  built in {build_time:.1f} s")
+
+        # Baseline: parse the list at startup and scan it on every keystroke
+        def load_list():
+            with open(source, encoding="utf-8") as f:
+                data = json.load(f)
+            return [(fold(c["name"]), -c.get("population", 0), c) for c in data]
+
+        list_time, list_bytes = retained(load_list)
+        rows = load_list()
+
+        def scan(text: str, limit: int = 6):
+            key = fold(text)
+            return heapq.nsmallest(limit, (r for r in rows if r[0].startswith(key)),
+                                   key=lambda r: r[1])
+
+        scan_latencies = []
+        for prefix in prefixes[:100]:
+            start = time.perf_counter()
+            scan(prefix)
+            scan_latencies.append(time.perf_counter() - start)
+        del rows
+
+        def open_index():
+            index = CityIndex(index_path)
+            index.suggest("a")
+            return [index]
+
+        open_time, open_bytes = retained(open_index)
+        index = CityIndex(index_path)
+        index_latencies = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            index.suggest(prefix, 6, preferred=history)
+            index_latencies.append(time.perf_counter() - start)
+        index.close()
+
+    print(f"  {'parsed list':<28} load {list_time * 1000:8.1f} ms  "
+          f"held {list_bytes / 1e6:7.1f} MB")
+    print(f"  {'mapped index':<28} load {open_time * 1000:8.1f} ms  "
+          f"held {open_bytes / 1e6:7.3f} MB")
+    print_summary("scan parsed list", scan_latencies)
+    print_summary("prefix index", index_latencies,
+                  f"max {max(index_latencies) * 1000:.2f} ms")
+
+
+BENCHMARKS = {
+    "pool": bench_pool,
+    "coldstart": bench_coldstart,
+    "batch": bench_batch,
+    "first_paint": bench_first_paint,
+    "forecast": bench_forecast,
+    "models": bench_models,
+    "decode": bench_decode,
+    "render": bench_render,
+    "autocomplete": bench_autocomplete,
+    "grid": bench_grid,
+    "hedge": bench_hedge,
+}
+
+
+async def main(names: List[str]):
+    for name in names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {', '.join(BENCHMARKS)}")
+            continue
+        await BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,122 @@
+"""In-process response cache with per-entry TTL and LRU eviction."""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class CacheStats:
+    """Counters describing how the cache is being used."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hit_rate, 3),
+        }
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache where every entry carries its own TTL.
+
+    The cache is limited both by entry count and by the total size of the
+    stored responses (the caller passes each entry's size; the weather
+    service passes models.approximate_size() of the parsed model, not the
+    length of the response body). Least recently used entries are
+    evicted first when either limit is exceeded.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 8 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.stats = CacheStats()
+        self.current_bytes = 0
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None when missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        value, expires_at, _size = entry
+        if self.clock() >= expires_at:
+            self._remove(key)
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float, size: int = 0):
+        """
+        Store a value for ttl seconds.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Time to live in seconds
+            size: Approximate size of the value in bytes
+        """
+        if key in self._entries:
+            self._remove(key)
+
+        # A single response larger than the whole budget is not cached
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = (value, self.clock() + ttl, size)
+        self.current_bytes += size
+
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats.evictions += 1
+
+    def ttl(self, key: Hashable) -> float:
+        """Seconds until an entry expires (0 if missing); does not count as a lookup."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return 0.0
+        return max(0.0, entry[1] - self.clock())
+
+    def invalidate(self, key: Hashable):
+        """Remove a single entry if present."""
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self):
+        """Remove every entry (counters are kept)."""
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def _remove(self, key: Hashable):
+        _value, _expires_at, size = self._entries.pop(key)
+        self.current_bytes -= size
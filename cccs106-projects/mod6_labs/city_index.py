@@ -0,0 +1,415 @@
+"""
+Offline city-name suggestions from the OpenWeather city list.
+
+The city list (city.list.json, about 200k cities) is converted once into a
+compact binary index that is memory-mapped, so the app starts without
+parsing it and only the pages a query touches are ever read.
+
+Usage:
+    python city_index.py city.list.json.gz [cities.idx]
+"""
+
+import gzip
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+_MAGIC = b"CITYIDX2"
+# magic, city count, key blob bytes, field blob bytes, head count, head blob bytes
+_HEADER = struct.Struct("<8sIIIII")
+
+# Prefixes matching more cities than this get their most populous cities
+# stored in the index ("heads"); smaller ranges are ranked when queried
+HEAD_MIN_CITIES = 256
+HEAD_TOP = 16
+
+
+class CitySuggestion(NamedTuple):
+    """One city from the index."""
+
+    id: int
+    name: str
+    state: str
+    country: str
+    lat: float
+    lon: float
+    population: int
+
+    @property
+    def label(self) -> str:
+        """Display text, e.g. "Springfield, IL, US"."""
+        return ", ".join(part for part in (self.name, self.state, self.country) if part)
+
+    @property
+    def query(self) -> str:
+        """Search text the API resolves to this city, e.g. "Springfield,IL,US"."""
+        return ",".join(part for part in (self.name, self.state, self.country) if part)
+
+
+def fold(text: str) -> str:
+    """Search key for a name: no accents, case or extra spaces ("São  Paulo" -> "sao paulo")."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.split()).casefold()
+
+
+def _read_city_list(source: Union[str, Path]) -> List[Dict]:
+    opener = gzip.open if str(source).endswith(".gz") else open
+    with opener(source, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _population(item: Dict) -> int:
+    # city.list.json has no population; other OpenWeather lists carry one
+    population = item.get("population") or (item.get("stat") or {}).get("population") or 0
+    return max(0, min(int(population), 0xFFFFFFFF))
+
+
+def build_index(source: Union[str, Path], path: Union[str, Path]) -> int:
+    """
+    Convert an OpenWeather city list into an index file.
+
+    Args:
+        source: city.list.json, optionally gzipped
+        path: Index file to write (replaced atomically)
+
+    Returns:
+        Number of cities indexed
+    """
+    rows = []
+    for item in _read_city_list(source):
+        name = " ".join(str(item.get("name") or "").split())
+        key = fold(name)
+        if not key:
+            continue
+        coord = item.get("coord") or {}
+        fields = "\t".join((name, item.get("state") or "", item.get("country") or ""))
+        rows.append((
+            key.encode("utf-8"),
+            -_population(item),
+            int(item.get("id") or 0),
+            fields.encode("utf-8"),
+            float(coord.get("lat") or 0.0),
+            float(coord.get("lon") or 0.0),
+        ))
+    # Sorted by key, so every prefix is one contiguous range
+    rows.sort(key=lambda row: row[:3])
+    count = len(rows)
+
+    key_offsets, field_offsets = array("I", [0]), array("I", [0])
+    for key, _, _, fields, _, _ in rows:
+        key_offsets.append(key_offsets[-1] + len(key))
+        field_offsets.append(field_offsets[-1] + len(fields))
+    population = array("I", (-row[1] for row in rows))
+    ids = array("I", (row[2] & 0xFFFFFFFF for row in rows))
+    coords = array("f", (value for row in rows for value in (row[4], row[5])))
+    keys = b"".join(row[0] for row in rows)
+    fields = b"".join(row[3] for row in rows)
+    head_keys, head_tops = _heads([row[0] for row in rows], population)
+    head_offsets = array("I", [0])
+    for key in head_keys:
+        head_offsets.append(head_offsets[-1] + len(key))
+    heads = b"".join(head_keys)
+
+    sections = [key_offsets, field_offsets, population, ids, coords, head_offsets, head_tops]
+    if sys.byteorder != "little":
+        for section in sections:
+            section.byteswap()
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, count, len(keys), len(fields), len(head_keys), len(heads)))
+            for section in sections:
+                section.tofile(f)
+            f.write(keys)
+            f.write(fields)
+            f.write(heads)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return count
+
+
+def _heads(keys: List[bytes], population: array) -> Tuple[List[bytes], array]:
+    """Every prefix shared by more than HEAD_MIN_CITIES keys, with its most populous cities."""
+    head_keys: List[bytes] = []
+    tops = array("I")
+    rank = lambda i: (-population[i], i)  # noqa: E731
+    length = 1
+    while True:
+        found = []
+        start = 0
+        while start < len(keys):
+            prefix = keys[start][:length]
+            end = start + 1
+            while end < len(keys) and keys[end][:length] == prefix:
+                end += 1
+            if end - start > HEAD_MIN_CITIES and len(prefix) == length:
+                found.append((prefix, heapq.nsmallest(HEAD_TOP, range(start, end), key=rank)))
+            start = end
+        if not found:
+            break
+        for prefix, top in found:
+            head_keys.append(prefix)
+            tops.extend(top)
+        length += 1
+    # Looked up by binary search, like the city keys
+    order = sorted(range(len(head_keys)), key=head_keys.__getitem__)
+    sorted_tops = array("I")
+    for h in order:
+        sorted_tops.extend(tops[h * HEAD_TOP:(h + 1) * HEAD_TOP])
+    return [head_keys[h] for h in order], sorted_tops
+
+
+class CityIndex:
+    """
+    Prefix search over a city index file built by build_index().
+
+    The file is memory-mapped on the first query. Cities are sorted by
+    their folded name, so the cities starting with a prefix are the range
+    found by two binary searches. A small range is ranked by population
+    on the spot; a large one (a prefix of one or two letters, or "san ")
+    has its most populous cities stored in the index. Either way a query
+    looks at no more than a few hundred integers and decodes only the
+    cities it returns.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self.count = 0
+
+    @property
+    def available(self) -> bool:
+        """True if the index file exists (it may not be opened yet)."""
+        return self._map is not None or self.path.is_file()
+
+    def open(self):
+        """Map the index file; queries call this themselves."""
+        with self._lock:
+            if self._map is not None:
+                return
+            f = open(self.path, "rb")
+            try:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                f.close()
+                raise ValueError(f"{self.path} is empty")
+            magic, count, keys_size, fields_size, head_count, _ = _HEADER.unpack_from(data)
+            if magic != _MAGIC:
+                data.close()
+                f.close()
+                raise ValueError(f"{self.path} is not a city index")
+
+            view = memoryview(data)
+            exports = [view]  # released before the map can be closed
+            offset = _HEADER.size
+
+            def section(typecode: str, length: int):
+                nonlocal offset
+                chunk = view[offset:offset + 4 * length]
+                offset += 4 * length
+                exports.append(chunk)
+                if sys.byteorder == "little":
+                    exports.append(chunk.cast(typecode))
+                    return exports[-1]
+                values = array(typecode, chunk)
+                values.byteswap()
+                return values
+
+            self._key_offsets = section("I", count + 1)
+            self._field_offsets = section("I", count + 1)
+            self._population = section("I", count)
+            self._ids = section("I", count)
+            self._coords = section("f", 2 * count)
+            self._head_offsets = section("I", head_count + 1)
+            self._head_tops = section("I", head_count * HEAD_TOP)
+            self._keys_start = offset
+            self._fields_start = offset + keys_size
+            self._heads_start = offset + keys_size + fields_size
+            self._head_count = head_count
+            self._exports = exports
+            self._file, self._map, self.count = f, data, count
+
+    def close(self):
+        with self._lock:
+            if self._map is None:
+                return
+            for view in reversed(self._exports):
+                view.release()
+            self._exports = []
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def __len__(self) -> int:
+        self.open()
+        return self.count
+
+    def suggest(
+        self,
+        text: str,
+        limit: int = 5,
+        preferred: Sequence[str] = (),
+    ) -> List[CitySuggestion]:
+        """
+        Cities whose name starts with `text`.
+
+        Args:
+            text: What the user typed so far (case and accents are ignored)
+            limit: Most suggestions to return
+            preferred: Searches to rank first, best first (e.g. the search
+                history); "Name" or "Name,Country" as sent to the API
+
+        Returns:
+            Preferred matches first, then by population
+        """
+        prefix = fold(text).encode("utf-8")
+        if not prefix or limit <= 0:
+            return []
+        self.open()
+
+        picked: List[int] = []
+        for search in preferred:
+            if len(picked) >= limit:
+                break
+            # Skip the index lookup for searches that cannot match
+            if not fold(search.split(",", 1)[0]).encode("utf-8").startswith(prefix):
+                continue
+            index = self.find(search)
+            if index is not None and index not in picked:
+                picked.append(index)
+
+        # No key contains 0xFF, so this bounds every key starting with prefix
+        lo, hi = self._lower_bound(prefix), self._lower_bound(prefix + b"\xff")
+        wanted = limit - len(picked)
+        if wanted > 0 and hi > lo:
+            picked.extend(self._most_populous(prefix, lo, hi, wanted, set(picked)))
+        return [self._city(i) for i in picked]
+
+    def find(self, search: str) -> Optional[int]:
+        """Position of the most populous city matching "Name[,State][,Country]"."""
+        name, *qualifiers = [part.strip() for part in search.split(",")]
+        key = fold(name).encode("utf-8")
+        if not key:
+            return None
+        self.open()
+        lo, hi = self._lower_bound(key), self._lower_bound(key + b"\x00")
+        if lo == hi:
+            return None
+        wanted = {q.casefold() for q in qualifiers if q}
+        # Same-name cities are stored most populous first
+        for i in range(lo, hi):
+            if not wanted:
+                return i
+            _, state, country = self._fields(i)
+            if wanted <= {state.casefold(), country.casefold()}:
+                return i
+        return None
+
+    def _most_populous(self, prefix: bytes, lo: int, hi: int, limit: int, skip: set) -> List[int]:
+        if hi - lo > HEAD_MIN_CITIES:
+            head = self._find_head(prefix)
+            if head is not None:
+                tops = self._head_tops[head * HEAD_TOP:(head + 1) * HEAD_TOP]
+                best = [i for i in tops if i not in skip][:limit]
+                if len(best) == limit:
+                    return best
+        population = self._population
+        return heapq.nsmallest(
+            limit, (i for i in range(lo, hi) if i not in skip),
+            key=lambda i: (-population[i], i),
+        )
+
+    def _find_head(self, prefix: bytes) -> Optional[int]:
+        offsets, data, start = self._head_offsets, self._map, self._heads_start
+        lo, hi = 0, self._head_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            head = data[start + offsets[mid]:start + offsets[mid + 1]]
+            if head == prefix:
+                return mid
+            if head < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def _lower_bound(self, key: bytes) -> int:
+        offsets, data, start = self._key_offsets, self._map, self._keys_start
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if data[start + offsets[mid]:start + offsets[mid + 1]] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _key(self, i: int) -> bytes:
+        start = self._keys_start
+        return self._map[start + self._key_offsets[i]:start + self._key_offsets[i + 1]]
+
+    def _fields(self, i: int) -> Tuple[str, str, str]:
+        start = self._fields_start
+        raw = self._map[start + self._field_offsets[i]:start + self._field_offsets[i + 1]]
+        name, state, country = raw.decode("utf-8").split("\t")
+        return name, state, country
+
+    def _city(self, i: int) -> CitySuggestion:
+        name, state, country = self._fields(i)
+        return CitySuggestion(
+            id=self._ids[i],
+            name=name,
+            state=state,
+            country=country,
+            lat=round(self._coords[2 * i], 5),
+            lon=round(self._coords[2 * i + 1], 5),
+            population=self._population[i],
+        )
+
+
+def ensure_index(source: Union[str, Path], path: Union[str, Path]) -> bool:
+    """
+    Build the index if it is missing or older than the city list.
+
+    Returns:
+        True if an index is available afterwards
+    """
+    source, path = Path(source), Path(path)
+    if not source.is_file():
+        return path.is_file()
+    if not path.is_file() or path.stat().st_mtime < source.stat().st_mtime:
+        build_index(source, path)
+    return True
+
+
+def main(argv: Iterable[str]) -> int:
+    args = list(argv)
+    if not args or len(args) > 2:
+        print(__doc__.strip().splitlines()[-1].strip())
+        return 2
+    source = Path(args[0])
+    path = Path(args[1]) if len(args) > 1 else source.with_name("cities.idx")
+    count = build_index(source, path)
+    print(f"Indexed {count:,} cities into {path} ({path.stat().st_size / 1e6:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,199 @@
+"""
+Fetch weather for a list of places without the GUI, one JSON object per line.
+
+Each input line is a city name ("Naga" or "Naga, PH") or a "lat,lon"
+pair; blank lines and lines starting with "#" are skipped. Results are
+written to stdout as they complete, so the output order is not the
+input order: match them up by "query". The --stats summary goes to
+stderr. The exit status is 1 if any lookup failed.
+
+Usage:
+    python cli.py sites.txt > weather.ndjson
+    python cli.py sites.txt --forecast --workers 20 --stats
+    printf 'London\\n13.62,123.19\\n' | python cli.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from batch import BatchResult, BatchStats, Query
+from config import Config
+from disk_cache import DiskCache
+from models import CurrentWeather, Forecast
+from weather_service import WeatherService
+
+
+def parse_query(line: str) -> Optional[Query]:
+    """
+    Turn one input line into a query.
+
+    Returns:
+        A (lat, lon) pair, a city name, or None for blank and comment lines
+    """
+    text = line.strip()
+    if not text or text.startswith("#"):
+        return None
+    parts = text.split(",")
+    if len(parts) == 2:
+        try:
+            return float(parts[0]), float(parts[1])
+        except ValueError:
+            pass  # "Naga, PH"
+    return text
+
+
+def read_queries(lines: Iterable[str]) -> Iterator[Query]:
+    """Queries from input lines, read only as the workers ask for more."""
+    for line in lines:
+        query = parse_query(line)
+        if query is not None:
+            yield query
+
+
+def model_to_dict(model: Any) -> Dict[str, Any]:
+    """JSON-ready fields of a CurrentWeather or Forecast."""
+    if isinstance(model, Forecast):
+        return {
+            "city": model.city,
+            "country": model.country,
+            "timezone": model.timezone,
+            "lat": model.lat,
+            "lon": model.lon,
+            "slots": [slot._asdict() for slot in model],
+        }
+    if isinstance(model, CurrentWeather):
+        return model._asdict()
+    raise TypeError(f"Cannot serialize {type(model).__name__}")
+
+
+def result_to_record(result: BatchResult) -> Dict[str, Any]:
+    """One output line for a batch result."""
+    query = result.query if isinstance(result.query, str) else list(result.query)
+    record: Dict[str, Any] = {"query": query, "ok": result.ok}
+    if result.ok:
+        record["data"] = model_to_dict(result.data)
+    else:
+        record["error"] = str(result.error)
+        record["error_type"] = type(result.error).__name__
+    record["elapsed_ms"] = round(result.elapsed * 1000, 2)
+    return record
+
+
+def format_stats(stats: BatchStats, service: WeatherService) -> List[str]:
+    """Throughput and latency lines for --stats."""
+    summary = stats.summary()
+    lines = [
+        f"{summary['completed']} ok, {summary['failed']} failed in {summary['elapsed_s']:.2f} s "
+        f"({summary['cities_per_sec']:.1f} lookups/s)"
+    ]
+    if stats.latencies:
+        ordered = sorted(stats.latencies)
+        lines.append(
+            f"latency p50 {summary['p50_ms']:.1f} ms  p95 {summary['p95_ms']:.1f} ms  "
+            f"max {ordered[-1] * 1000:.1f} ms"
+        )
+    hedger = service.hedger
+    lines.append(
+        f"cache hit rate {service.cache.stats.hit_rate:.1%}  retries {service.retry_stats.retries}  "
+        f"hedges {hedger.hedges}  failovers {hedger.failovers}"
+    )
+    return lines
+
+
+async def run(
+    queries: Iterable[Query],
+    out: TextIO,
+    workers: int,
+    forecast: bool = False,
+    service: Optional[WeatherService] = None,
+    stats_out: Optional[TextIO] = None,
+) -> BatchStats:
+    """
+    Fetch every query and write one JSON line per result to `out`.
+
+    Args:
+        queries: City names and/or (lat, lon) pairs
+        out: Stream for the NDJSON results
+        workers: Lookups in flight at once
+        forecast: Fetch forecasts instead of current weather
+        service: Service to use (a new one, closed afterwards, by default)
+        stats_out: Stream for the throughput and latency summary
+
+    Returns:
+        Counters for the run
+    """
+    owned = service is None
+    if service is None:
+        service = WeatherService()
+    try:
+        fetch_many = service.get_forecast_many if forecast else service.get_weather_many
+        batch = fetch_many(queries, concurrency=workers)
+        async for result in batch:
+            out.write(json.dumps(result_to_record(result), ensure_ascii=False) + "\n")
+            out.flush()
+        if stats_out is not None:
+            for line in format_stats(batch.stats, service):
+                print(line, file=stats_out)
+        return batch.stats
+    finally:
+        if owned:
+            await service.close()
+
+
+async def _main(args: argparse.Namespace) -> int:
+    disk_cache = None
+    if args.disk_cache:
+        disk_cache = DiskCache(
+            args.disk_cache,
+            max_bytes=Config.DISK_CACHE_MAX_BYTES,
+            max_snapshots=Config.OFFLINE_SNAPSHOTS,
+        )
+    service = WeatherService(disk_cache=disk_cache)
+    source = open(args.input, "r", encoding="utf-8") if args.input != "-" else sys.stdin
+    try:
+        async with service:
+            stats = await run(
+                read_queries(source),
+                sys.stdout,
+                args.workers,
+                forecast=args.forecast,
+                service=service,
+                stats_out=sys.stderr if args.stats else None,
+            )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if disk_cache is not None:
+            disk_cache.close()
+    return 1 if stats.failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fetch weather for many places as NDJSON")
+    parser.add_argument("input", nargs="?", default="-", help="file of places, one per line (default: stdin)")
+    parser.add_argument("--workers", type=int, default=Config.BATCH_CONCURRENCY,
+                        help=f"lookups in flight at once (default: {Config.BATCH_CONCURRENCY}); "
+                        f"more than WEATHER_MAX_CONNECTIONS ({Config.MAX_CONNECTIONS}) only queue")
+    parser.add_argument("--forecast", action="store_true", help="fetch 5-day forecasts instead")
+    parser.add_argument("--stats", action="store_true", help="print throughput and latency to stderr")
+    parser.add_argument("--disk-cache", metavar="PATH", help="reuse responses cached in this SQLite file")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    try:
+        return asyncio.run(_main(args))
+    except BrokenPipeError:
+        # The reader went away (e.g. "| head"); stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
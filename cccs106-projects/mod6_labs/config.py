@@ -16,16 +16,131 @@ class Config:
         "OPENWEATHER_BASE_URL", 
         "https://api.openweathermap.org/data/2.5/weather"
     )
+    FORECAST_URL = os.getenv(
+        "OPENWEATHER_FORECAST_URL",
+        "https://api.openweathermap.org/data/2.5/forecast"
+    )
+    
+    # Extra API roots serving the same data (mirrors, a regional or local
+    # caching proxy), comma separated, e.g. "http://localhost:8080/data/2.5".
+    # Slow requests are hedged to them; see the hedging settings below.
+    API_MIRRORS = [
+        root.strip() for root in os.getenv("OPENWEATHER_MIRRORS", "").split(",") if root.strip()
+    ]
+    
+    ICON_URL = os.getenv(
+        "OPENWEATHER_ICON_URL",
+        "https://openweathermap.org/img/wn/{name}.png"
+    )
     
     # App Configuration
     APP_TITLE = "Weather App"
     APP_WIDTH = 600
     APP_HEIGHT = 800
+    SEARCH_DEBOUNCE = 0.15  # seconds; rapid searches collapse into the last one
+    UI_FRAME_INTERVAL = 1 / 60  # seconds; page updates are batched to one per frame
     
     # API Settings
-    UNITS = "metric"  # metric, imperial, or standard
+    # Canonical units for every request and cache entry. Keep this metric:
+    # the UI converts temperatures to the selected unit at render time.
+    UNITS = "metric"
     TIMEOUT = 10  # seconds
     
+    # HTTP Connection Pool Settings (shared client in WeatherService)
+    MAX_CONNECTIONS = int(os.getenv("WEATHER_MAX_CONNECTIONS", "20"))
+    MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("WEATHER_MAX_KEEPALIVE", "10"))
+    KEEPALIVE_EXPIRY = float(os.getenv("WEATHER_KEEPALIVE_EXPIRY", "30"))  # seconds
+    HTTP2 = os.getenv("WEATHER_HTTP2", "false").lower() in ("1", "true", "yes")
+    BATCH_CONCURRENCY = 10  # lookups in flight for get_weather_many
+    
+    # Retry and Circuit Breaker Settings
+    RETRY_MAX_ATTEMPTS = 3  # including the first request
+    RETRY_BASE_DELAY = 0.25  # seconds, doubled per attempt (with jitter)
+    RETRY_MAX_DELAY = 4.0  # seconds
+    RETRY_AFTER_MAX = 10.0  # give up if Retry-After asks for longer
+    BREAKER_FAILURE_THRESHOLD = 5  # consecutive failures before opening
+    BREAKER_RESET_TIMEOUT = 30.0  # seconds before a half-open probe
+    
+    # Hedged Requests (only with API_MIRRORS): a request still unanswered
+    # after the endpoint's recent p95 latency is duplicated to the next one
+    HEDGE_INITIAL_DELAY = 0.5  # seconds, until an endpoint has enough samples
+    HEDGE_MIN_DELAY = 0.05
+    HEDGE_MAX_DELAY = 2.0
+    HEDGE_MAX = 1  # duplicates per request
+    
+    # Client-side Rate Limit (the API key's per-minute call budget; 0 disables)
+    RATE_LIMIT_PER_MINUTE = int(os.getenv("WEATHER_RATE_LIMIT", "60"))
+    RATE_LIMIT_BURST = int(os.getenv("WEATHER_RATE_LIMIT_BURST", "10"))
+    SEARCH_MAX_WAIT = 5.0  # seconds a search may queue before failing fast
+    
+    # Response Cache Settings
+    CURRENT_WEATHER_TTL = 600  # seconds (10 minutes)
+    FORECAST_TTL = 3600  # seconds (1 hour)
+    CACHE_MAX_ENTRIES = 256
+    CACHE_MAX_BYTES = 8 * 1024 * 1024  # 8 MB of parsed responses
+    
+    # JSON Decoding ("auto" prefers msgspec, then orjson, then the stdlib json)
+    JSON_DECODER = os.getenv("WEATHER_JSON_DECODER", "auto")
+    
+    # Persistent Cache Settings (SQLite file next to the app)
+    CACHE_DB_PATH = os.getenv(
+        "WEATHER_CACHE_DB",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "weather_cache.sqlite3")
+    )
+    DISK_CACHE_MAX_BYTES = 20 * 1024 * 1024  # 20 MB
+    STALE_TTL = 24 * 3600  # serve stale entries up to a day past their TTL
+    DISK_CACHE_MAX_AGE = 7 * 24 * 3600  # compaction drops entries older than a week
+    
+    # Background Prefetch (keeps the search history cities warm in the cache)
+    PREFETCH_INTERVAL = 300  # seconds between refreshes of one city, on average
+    PREFETCH_JITTER = 0.2  # +/- 20%, so the cities do not refresh together
+    PREFETCH_BUDGET_PER_MINUTE = int(os.getenv("WEATHER_PREFETCH_BUDGET", "6"))  # 0 disables
+    PREFETCH_IDLE_AFTER = 15 * 60  # pause after this long without user activity
+    
+    # Location Cache (responses are shared by every point in a grid cell)
+    GRID_RESOLUTION = float(os.getenv("WEATHER_GRID_RESOLUTION", "0.05"))  # degrees, about 5 km
+    LOCATION_CACHE_SIZE = 1000  # city names remembered as coordinates
+    
+    # Offline Mode (last successful response per city, shown when the API is unreachable)
+    OFFLINE_SNAPSHOTS = 100  # cities remembered, in memory and on disk
+    RECONNECT_INTERVAL = 5.0  # seconds before the first reconnect attempt
+    RECONNECT_MAX_INTERVAL = 60.0  # the wait doubles after each failed attempt
+    
+    # Settings and search history (one JSON file next to the app)
+    SETTINGS_PATH = os.getenv(
+        "WEATHER_SETTINGS_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "settings.json")
+    )
+    HISTORY_MAX_ENTRIES = int(os.getenv("WEATHER_HISTORY_MAX", "50"))
+    HISTORY_DROPDOWN_SIZE = 10  # best ranked cities shown in the dropdown
+    HISTORY_PREFETCH_SIZE = 5  # best ranked cities kept warm by the prefetcher
+    HISTORY_HALF_LIFE = 7 * 24 * 3600  # a search counts half as much after a week
+    SETTINGS_SAVE_DELAY = 0.5  # seconds to collect changes before one write
+    
+    # Offline city suggestions, indexed from OpenWeather's city.list.json
+    # (download it from https://bulk.openweathermap.org/sample/city.list.json.gz)
+    CITY_LIST_PATH = os.getenv(
+        "WEATHER_CITY_LIST",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "city.list.json.gz")
+    )
+    CITY_INDEX_PATH = os.getenv(
+        "WEATHER_CITY_INDEX",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cities.idx")
+    )
+    AUTOCOMPLETE_LIMIT = 6  # suggestions shown under the search field
+    AUTOCOMPLETE_MIN_CHARS = 2  # characters typed before suggesting
+    
+    # HTTP gateway (gateway.py): one shared service for local tools
+    GATEWAY_HOST = os.getenv("WEATHER_GATEWAY_HOST", "127.0.0.1")
+    GATEWAY_PORT = int(os.getenv("WEATHER_GATEWAY_PORT", "8080"))
+    GATEWAY_MAX_WAIT = 2.0  # seconds a request may queue for the rate limit before a 429
+    GATEWAY_MAX_BATCH = 100  # queries per /batch request
+    GATEWAY_MAX_BODY = 64 * 1024  # bytes in a request body
+    
+    # Flet assets directory; condition icons are downloaded into assets/icons
+    ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+    ICON_PREFETCH_CONCURRENCY = 4
+    
     @classmethod
     def validate(cls):
         """Validate that required configuration is present."""
@@ -0,0 +1,197 @@
+"""Decoding of raw API response bodies into weather models."""
+
+import json
+from typing import Any, Dict, List, Union
+
+from models import CurrentWeather, Forecast
+
+# Optional fast JSON libraries; the stdlib json module is always available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BACKENDS = ("msgspec", "orjson", "json")
+
+
+def available_backends() -> List[str]:
+    """Installed backends, fastest first."""
+    installed = {"msgspec": msgspec is not None, "orjson": orjson is not None, "json": True}
+    return [name for name in BACKENDS if installed[name]]
+
+
+class DecodeError(ValueError):
+    """Raised when a response body is not the JSON we expect."""
+    pass
+
+
+if msgspec is not None:
+    # Only the fields the models keep. msgspec skips everything else in the
+    # body without building objects for it, and checks types as it goes.
+    Number = Union[int, float]
+
+    class _Main(msgspec.Struct):
+        temp: Number = 0
+        feels_like: Number = 0
+        temp_min: Number = 0
+        temp_max: Number = 0
+        humidity: Number = 0
+
+    class _Condition(msgspec.Struct):
+        id: int = 0
+        description: str = ""
+        icon: str = "01d"
+
+    class _Coord(msgspec.Struct):
+        lat: float = 0.0
+        lon: float = 0.0
+
+    class _Wind(msgspec.Struct):
+        speed: Number = 0
+
+    class _Sys(msgspec.Struct):
+        country: str = ""
+
+    class _WeatherResponse(msgspec.Struct):
+        name: str = "Unknown"
+        sys: _Sys = msgspec.field(default_factory=_Sys)
+        main: _Main = msgspec.field(default_factory=_Main)
+        weather: List[_Condition] = []
+        wind: _Wind = msgspec.field(default_factory=_Wind)
+        coord: _Coord = msgspec.field(default_factory=_Coord)
+        timezone: int = 0
+        dt: int = 0
+
+    class _Slot(msgspec.Struct):
+        dt: int
+        main: _Main = msgspec.field(default_factory=_Main)
+        weather: List[_Condition] = []
+        pop: Number = 0
+
+    class _City(msgspec.Struct):
+        name: str = "Unknown"
+        country: str = ""
+        timezone: int = 0
+        coord: _Coord = msgspec.field(default_factory=_Coord)
+
+    class _ForecastResponse(msgspec.Struct):
+        list: List[_Slot] = []
+        city: _City = msgspec.field(default_factory=_City)
+
+    _weather_decoder = msgspec.json.Decoder(_WeatherResponse)
+    _forecast_decoder = msgspec.json.Decoder(_ForecastResponse)
+    _DECODE_ERRORS = (ValueError, TypeError, KeyError, AttributeError, msgspec.MsgspecError)
+else:
+    _DECODE_ERRORS = (ValueError, TypeError, KeyError, AttributeError)
+
+
+class Decoder:
+    """
+    Turns response bodies into CurrentWeather and Forecast models.
+
+    The backend is "msgspec" (decodes straight into typed structs, skipping
+    unused fields), "orjson" (fast full decode) or "json" (the stdlib).
+    "auto" picks the fastest one that is installed.
+    """
+
+    def __init__(self, backend: str = "auto"):
+        if backend == "auto":
+            backend = available_backends()[0]
+        if backend not in available_backends():
+            raise ValueError(
+                f"JSON backend '{backend}' is not available; "
+                f"installed: {', '.join(available_backends())}"
+            )
+        self.backend = backend
+        if backend == "orjson":
+            self._loads = orjson.loads
+        elif backend == "msgspec":
+            self._loads = msgspec.json.decode
+        else:
+            self._loads = json.loads
+
+    def loads(self, body: bytes) -> Any:
+        """Decode a JSON body without a schema."""
+        try:
+            return self._loads(body)
+        except _DECODE_ERRORS as e:
+            raise DecodeError(f"Invalid JSON: {e}") from e
+
+    def weather(self, body: bytes) -> CurrentWeather:
+        """Decode a /weather response body."""
+        try:
+            if self.backend == "msgspec":
+                return self._weather_from_struct(_weather_decoder.decode(body))
+            return CurrentWeather.from_response(self._object(body))
+        except DecodeError:
+            raise
+        except _DECODE_ERRORS as e:
+            raise DecodeError(f"Unexpected weather response: {e}") from e
+
+    def forecast(self, body: bytes) -> Forecast:
+        """Decode a /forecast response body."""
+        try:
+            if self.backend == "msgspec":
+                return self._forecast_from_struct(_forecast_decoder.decode(body))
+            return Forecast.from_response(self._object(body))
+        except DecodeError:
+            raise
+        except _DECODE_ERRORS as e:
+            raise DecodeError(f"Unexpected forecast response: {e}") from e
+
+    def _object(self, body: bytes) -> Dict:
+        data = self.loads(body)
+        if not isinstance(data, dict):
+            raise DecodeError("Expected a JSON object")
+        return data
+
+    @staticmethod
+    def _weather_from_struct(data: "_WeatherResponse") -> CurrentWeather:
+        condition = data.weather[0] if data.weather else _Condition()
+        return CurrentWeather(
+            city=data.name,
+            country=data.sys.country,
+            temp=data.main.temp,
+            feels_like=data.main.feels_like,
+            humidity=data.main.humidity,
+            wind_speed=data.wind.speed,
+            description=condition.description,
+            icon=condition.icon,
+            condition_id=condition.id,
+            lat=data.coord.lat,
+            lon=data.coord.lon,
+            timezone=data.timezone,
+            dt=data.dt,
+        )
+
+    @staticmethod
+    def _forecast_from_struct(data: "_ForecastResponse") -> Forecast:
+        rows = []
+        description = []
+        icon = []
+        no_condition = _Condition()
+        for slot in data.list:
+            main = slot.main
+            condition = slot.weather[0] if slot.weather else no_condition
+            rows.append((
+                slot.dt, main.temp, main.temp_min, main.temp_max,
+                main.humidity, slot.pop, condition.id,
+            ))
+            description.append(condition.description)
+            icon.append(condition.icon)
+        city = data.city
+        return Forecast.from_rows(
+            rows,
+            description,
+            icon,
+            city=city.name,
+            country=city.country,
+            timezone=city.timezone,
+            lat=city.coord.lat,
+            lon=city.coord.lon,
+        )
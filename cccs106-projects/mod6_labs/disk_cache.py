@@ -0,0 +1,186 @@
+"""SQLite-backed response cache that survives app restarts."""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional, Tuple, Union
+
+
+class DiskCache:
+    """
+    Persistent store of raw API responses keyed by a string.
+
+    Entries keep the time they were stored, so the caller decides whether
+    an entry is fresh or stale. The file is capped at max_bytes of response
+    data; least recently read entries are evicted first. All methods are
+    synchronous and thread-safe, so the service runs reads and writes
+    through asyncio.to_thread to keep them (and a compact() holding the
+    lock) off the event loop.
+
+    Separately, the last successful response per key can be kept as a
+    snapshot for offline use. Snapshots are not subject to max_bytes or
+    compaction; only the max_snapshots most recent are kept.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_bytes: int = 20 * 1024 * 1024,
+        clock: Callable[[], float] = time.time,
+        max_snapshots: int = 100,
+    ):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_snapshots = max_snapshots
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS snapshots (
+                key TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                stored_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float, int]]:
+        """Return (raw response body, stored_at, size) or None if missing."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (self.clock(), key)
+            )
+            self._conn.commit()
+
+        body, stored_at = row
+        return bytes(body), stored_at, len(body)
+
+    def set(
+        self,
+        key: str,
+        body: bytes,
+        stored_at: Optional[float] = None,
+        keep_snapshot: bool = False,
+    ):
+        """
+        Store a raw response body, then evict if over the size cap.
+
+        Args:
+            key: Cache key
+            body: Raw response body
+            stored_at: When the response was fetched (now by default)
+            keep_snapshot: Also keep it as the key's last-known snapshot
+        """
+        now = self.clock()
+        if stored_at is None:
+            stored_at = now
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, body, size, stored_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, body, len(body), stored_at, now),
+            )
+            self._evict()
+            if keep_snapshot:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO snapshots (key, body, stored_at) VALUES (?, ?, ?)",
+                    (key, body, stored_at),
+                )
+                self._conn.execute(
+                    "DELETE FROM snapshots WHERE key NOT IN "
+                    "(SELECT key FROM snapshots ORDER BY stored_at DESC LIMIT ?)",
+                    (self.max_snapshots,),
+                )
+            self._conn.commit()
+
+    def get_snapshot(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """Return (raw response body, stored_at) of the last-known snapshot, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, stored_at FROM snapshots WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        body, stored_at = row
+        return bytes(body), stored_at
+
+    def delete(self, key: str):
+        """Remove one entry."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def total_bytes(self) -> int:
+        """Total size of the stored response bodies."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def compact(self, max_age: Optional[float] = None) -> int:
+        """
+        Drop entries older than max_age seconds and reclaim file space.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            removed = 0
+            if max_age is not None:
+                cursor = self._conn.execute(
+                    "DELETE FROM responses WHERE stored_at < ?", (self.clock() - max_age,)
+                )
+                removed = cursor.rowcount
+            self._evict()
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            return removed
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self):
+        # Caller holds the lock; drop least recently read entries over the cap
+        total = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at ASC, rowid ASC"
+        ).fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
@@ -0,0 +1,347 @@
+"""
+Local stand-in for the OpenWeatherMap API, used by tests and benchmarks.
+
+Serves recorded /weather and /forecast payloads (fixtures/) with the
+requested city filled in, and can inject latency, random errors and
+specific statuses. It can also run on its own so the app can be pointed
+at it:
+
+    python fake_server.py --port 8765 --latency 0.05 --error-rate 0.1
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8765/data/2.5/weather \\
+    OPENWEATHER_FORECAST_URL=http://127.0.0.1:8765/data/2.5/forecast python main.py
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import random
+import struct
+import time
+import zlib
+from collections import Counter, deque
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Optional, Set, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+_fixtures: Dict[str, Dict] = {}
+
+
+def load_fixture(name: str) -> Dict:
+    """Load (once) a recorded response from the fixtures directory."""
+    if name not in _fixtures:
+        with open(FIXTURES_DIR / name, "r") as f:
+            _fixtures[name] = json.load(f)
+    return _fixtures[name]
+
+
+def _location(query: str) -> Tuple[str, int]:
+    """Display name and a stable id for a city name or "lat,lon" query."""
+    return query.title(), sum(ord(c) * (i + 1) for i, c in enumerate(query.lower())) % 10_000_000
+
+
+def _coordinates(query: str) -> Tuple[float, float]:
+    """A stable, made-up position for a city name."""
+    h = zlib.crc32(" ".join(query.split()).lower().encode("utf-8"))
+    return round((h % 14000) / 100 - 70, 4), round((h // 14000 % 36000) / 100 - 180, 4)
+
+
+def _png(width: int = 1, height: int = 1) -> bytes:
+    """A blank RGBA PNG, standing in for the condition icons."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + b"\x00" * 4 * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+ICON_PNG = _png()
+
+
+def weather_payload(query: str) -> Dict:
+    """Recorded current weather response, relabelled for the requested city."""
+    data = copy.deepcopy(load_fixture("weather_london.json"))
+    data["name"], data["id"] = _location(query)
+    data["coord"] = dict(zip(("lat", "lon"), _coordinates(query)))
+    data["dt"] = int(time.time())
+    return data
+
+
+def forecast_payload(query: str) -> Dict:
+    """Recorded 5-day / 3-hour forecast, relabelled and shifted to start now."""
+    data = copy.deepcopy(load_fixture("forecast_london.json"))
+    data["city"]["name"], data["city"]["id"] = _location(query)
+    data["city"]["coord"] = dict(zip(("lat", "lon"), _coordinates(query)))
+    shift = int(time.time()) // 10800 * 10800 - data["list"][0]["dt"]
+    for slot in data["list"]:
+        slot["dt"] += shift
+        slot["dt_txt"] = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(slot["dt"]))
+    return data
+
+
+class FakeWeatherServer:
+    """
+    Minimal HTTP/1.1 server answering /weather and /forecast requests,
+    plus /img/wn/<icon>.png condition icons.
+
+    Connections are kept alive between requests like a real endpoint.
+    `handshake_delay` is paid once per new connection to stand in for the
+    TCP+TLS setup of api.openweathermap.org. Each request waits `latency`
+    plus a uniform random `jitter` (and, with probability `stall_rate`, a
+    further `stall` seconds), and fails with one of `error_statuses` with
+    probability `error_rate`. Cities in `unknown_cities` get a 404,
+    and when `api_key` is set any other key gets a 401. Pass `seed` for
+    repeatable runs.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        handshake_delay: float = 0.0,
+        unknown_cities: Optional[Set[str]] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: Iterable[int] = (500, 502, 503),
+        api_key: Optional[str] = None,
+        seed: Optional[int] = None,
+        stall_rate: float = 0.0,
+        stall: float = 1.0,
+    ):
+        self.latency = latency
+        self.handshake_delay = handshake_delay
+        self.unknown_cities = {c.lower() for c in (unknown_cities or set())}
+        self.host = host
+        self.port = port
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.api_key = api_key
+        self.rng = random.Random(seed)
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.request_count = 0
+        self.connection_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.status_counts: Counter = Counter()
+        self.places: Dict[str, Tuple[str, Tuple[float, float]]] = {}  # cities requested by name
+        self._faults: Deque[Tuple[int, Dict[str, str]]] = deque()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/data/2.5"
+
+    @property
+    def weather_url(self) -> str:
+        return f"{self.base_url}/weather"
+
+    @property
+    def forecast_url(self) -> str:
+        return f"{self.base_url}/forecast"
+
+    @property
+    def icon_url(self) -> str:
+        """Icon URL template in the form Config.ICON_URL expects."""
+        return f"http://{self.host}:{self.port}/img/wn/{{name}}.png"
+
+    async def start(self):
+        """Start listening; picks a free port when port is 0."""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening and drop open connections."""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            # Closed transports hit EOF, so the handlers finish on their own
+            if self._handlers:
+                await asyncio.wait(list(self._handlers))
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeWeatherServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def inject(self, status: int, count: int = 1, retry_after: Optional[str] = None):
+        """
+        Answer the next `count` requests with an error status.
+
+        A status of 0 drops the connection without answering. retry_after
+        is sent as the Retry-After header.
+        """
+        headers = {"Retry-After": retry_after} if retry_after is not None else {}
+        for _ in range(count):
+            self._faults.append((status, headers))
+
+    async def handle(self, path: str, params: Dict[str, str]) -> Tuple[int, Union[Dict, bytes]]:
+        """Return (status, body) for a request; override to inject behavior."""
+        if path.startswith("/img/wn/"):
+            return (200, ICON_PNG) if path.endswith(".png") else (404, {"message": "not found"})
+
+        if self.api_key is not None and params.get("appid") != self.api_key:
+            return 401, {
+                "cod": 401,
+                "message": "Invalid API key. Please see https://openweathermap.org/faq#error401 for more info.",
+            }
+
+        city = params.get("q", "")
+        by_coordinates = "lat" in params and "lon" in params
+        if by_coordinates:
+            city = f"{params['lat']},{params['lon']}"
+        if not city or city.lower() in self.unknown_cities:
+            return 404, {"cod": "404", "message": "city not found"}
+        if by_coordinates:
+            # Named after the nearest city looked up so far, like the real API
+            point = (float(params["lat"]), float(params["lon"]))
+            city = self.nearest_place(point) or city
+        else:
+            self.places.setdefault(" ".join(city.split()).lower(), (city, _coordinates(city)))
+
+        if path.endswith("/weather"):
+            data = weather_payload(city)
+            if by_coordinates:
+                data["coord"] = {"lat": point[0], "lon": point[1]}
+        elif path.endswith("/forecast"):
+            data = forecast_payload(city)
+            if by_coordinates:
+                data["city"]["coord"] = {"lat": point[0], "lon": point[1]}
+        else:
+            return 404, {"cod": "404", "message": "Internal error"}
+        return 200, data
+
+    def nearest_place(self, point: Tuple[float, float], within: float = 0.1) -> Optional[str]:
+        """Name of the closest city requested by name, if one is within `within` degrees."""
+        best, best_distance = None, within
+        for name, (lat, lon) in self.places.values():
+            distance = max(abs(lat - point[0]), abs(lon - point[1]))
+            if distance <= best_distance:
+                best, best_distance = name, distance
+        return best
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connection_count += 1
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            if self.handshake_delay:
+                await asyncio.sleep(self.handshake_delay)
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                _method, target, _version = request_line.decode("latin-1").split(" ", 2)
+                url = urlsplit(target)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+                self.request_count += 1
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                headers_out: Dict[str, str] = {}
+                try:
+                    delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+                    if self.stall_rate and self.rng.random() < self.stall_rate:
+                        delay += self.stall
+                    if delay:
+                        await asyncio.sleep(delay)
+                    if self._faults:
+                        status, headers_out = self._faults.popleft()
+                        body = {"cod": str(status), "message": "injected fault"}
+                    elif self.error_rate and self.rng.random() < self.error_rate:
+                        status = self.rng.choice(self.error_statuses)
+                        body = {"cod": str(status), "message": "injected fault"}
+                    else:
+                        status, body = await self.handle(url.path, params)
+                finally:
+                    self.in_flight -= 1
+                self.status_counts[status] += 1
+                if status == 0:
+                    break
+
+                if isinstance(body, bytes):
+                    payload, content_type = body, "image/png"
+                else:
+                    payload = json.dumps(body, separators=(",", ":")).encode()
+                    content_type = "application/json; charset=utf-8"
+                writer.write((
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    + "".join(f"{k}: {v}\r\n" for k, v in headers_out.items())
+                    + "\r\n"
+                ).encode("latin-1") + payload)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+
+async def _serve(args: argparse.Namespace):
+    server = FakeWeatherServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        unknown_cities=set(args.unknown),
+        api_key=args.api_key,
+        seed=args.seed,
+        stall_rate=args.stall_rate,
+        stall=args.stall,
+        host=args.host,
+        port=args.port,
+    )
+    await server.start()
+    print(f"Stand-in OpenWeatherMap API listening on {server.base_url}")
+    print(f"  OPENWEATHER_BASE_URL={server.weather_url}")
+    print(f"  OPENWEATHER_FORECAST_URL={server.forecast_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stand-in OpenWeatherMap API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random seconds per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 5xx")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="fraction of requests that stall")
+    parser.add_argument("--stall", type=float, default=1.0, help="extra seconds a stalled request waits")
+    parser.add_argument("--unknown", nargs="*", default=[], help="cities that return 404")
+    parser.add_argument("--api-key", default=None, help="only accept this key (others get 401)")
+    parser.add_argument("--seed", type=int, default=None)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,198 @@
+"""Per-day aggregation of the 5-day / 3-hour forecast using NumPy."""
+
+from datetime import date
+from typing import List, Sequence
+
+import numpy as np
+
+from models import Forecast
+
+SECONDS_PER_DAY = 86400
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# OpenWeatherMap condition ids are three digits (2xx thunderstorm ... 804 clouds)
+_CONDITION_SPAN = 1000
+
+
+class DailyForecast:
+    """One day of the forecast, summarized over all of its 3-hour slots."""
+
+    __slots__ = (
+        "date",
+        "temp_min",
+        "temp_max",
+        "temp_mean",
+        "pop",
+        "humidity",
+        "condition_id",
+        "description",
+        "icon",
+        "slots",
+    )
+
+    def __init__(
+        self,
+        date: date,
+        temp_min: float,
+        temp_max: float,
+        temp_mean: float,
+        pop: float,
+        humidity: float,
+        condition_id: int,
+        description: str,
+        icon: str,
+        slots: int,
+    ):
+        self.date = date
+        self.temp_min = temp_min
+        self.temp_max = temp_max
+        self.temp_mean = temp_mean
+        self.pop = pop  # highest probability of precipitation that day, 0..1
+        self.humidity = humidity  # mean relative humidity, %
+        self.condition_id = condition_id
+        self.description = description
+        self.icon = icon
+        self.slots = slots  # number of 3-hour slots the day is built from
+
+    def __repr__(self) -> str:
+        return (
+            f"DailyForecast({self.date}, {self.temp_min:.1f}..{self.temp_max:.1f}, "
+            f"pop {self.pop:.0%}, {self.description!r})"
+        )
+
+
+class ForecastColumns:
+    """
+    The slots of one or more forecasts concatenated into one array per
+    field, tagged with the forecast they came from, so summarizing many
+    forecasts at once costs little more than summarizing one.
+    """
+
+    __slots__ = (
+        "forecast",
+        "dt",
+        "utc_offset",
+        "temp",
+        "temp_min",
+        "temp_max",
+        "humidity",
+        "pop",
+        "condition_id",
+        "description",
+        "icon",
+        "count",
+    )
+
+    def __init__(self, forecasts: Sequence[Forecast]):
+        lengths = [len(f) for f in forecasts]
+        self.count = len(forecasts)
+        self.forecast = np.repeat(np.arange(len(forecasts)), lengths)
+        # Days are split at the city's midnight, not the host's
+        self.utc_offset = np.repeat(np.array([f.timezone for f in forecasts], dtype=np.int64), lengths)
+        for name in ("dt", "temp", "temp_min", "temp_max", "humidity", "pop", "condition_id"):
+            columns = [getattr(f, name) for f in forecasts]
+            setattr(self, name, np.concatenate(columns) if columns else np.empty(0))
+        self.description = [text for f in forecasts for text in f.description]
+        self.icon = [icon for f in forecasts for icon in f.icon]
+
+    def __len__(self) -> int:
+        return len(self.dt)
+
+    def daily(self, days: int = 5) -> List[List[DailyForecast]]:
+        """
+        Summarize the slots per forecast and local calendar day.
+
+        Args:
+            days: Maximum number of days to return per forecast
+
+        Returns:
+            For each forecast, its days in order, starting with the
+            (possibly partial) current day
+        """
+        result: List[List[DailyForecast]] = [[] for _ in range(self.count)]
+        if not len(self):
+            return result
+
+        # Sort by forecast, then time; each (forecast, day) is then a contiguous run
+        order = np.lexsort((self.dt, self.forecast))
+        forecast = self.forecast[order]
+        local_day = (self.dt[order] + self.utc_offset[order]) // SECONDS_PER_DAY
+        new_group = np.empty(len(order), dtype=bool)
+        new_group[0] = True
+        new_group[1:] = (forecast[1:] != forecast[:-1]) | (local_day[1:] != local_day[:-1])
+        starts = np.flatnonzero(new_group)
+        counts = np.diff(np.append(starts, len(order)))
+
+        temp_min = np.minimum.reduceat(self.temp_min[order], starts)
+        temp_max = np.maximum.reduceat(self.temp_max[order], starts)
+        temp_mean = np.add.reduceat(self.temp[order], starts) / counts
+        pop = np.maximum.reduceat(self.pop[order], starts)
+        humidity = np.add.reduceat(self.humidity[order], starts) / counts
+
+        # Dominant condition: the most frequent id per day; on a tie the
+        # lower id wins, which in OWM's numbering is the more significant weather
+        group = np.cumsum(new_group) - 1
+        pairs, first_slot, pair_counts = np.unique(
+            group * _CONDITION_SPAN + self.condition_id[order],
+            return_index=True,
+            return_counts=True,
+        )
+        pair_group = pairs // _CONDITION_SPAN
+        ranked = np.lexsort((pairs % _CONDITION_SPAN, -pair_counts, pair_group))
+        best = np.empty(len(ranked), dtype=bool)
+        best[0] = True
+        best[1:] = pair_group[ranked][1:] != pair_group[ranked][:-1]
+        dominant = ranked[best]
+        dominant_slot = order[first_slot[dominant]]
+        condition_id = pairs[dominant] % _CONDITION_SPAN
+
+        # Back to Python objects once per column, not once per element
+        columns = zip(
+            forecast[starts].tolist(),
+            local_day[starts].tolist(),
+            temp_min.tolist(),
+            temp_max.tolist(),
+            temp_mean.tolist(),
+            pop.tolist(),
+            humidity.tolist(),
+            condition_id.tolist(),
+            dominant_slot.tolist(),
+            counts.tolist(),
+        )
+        for index, day, low, high, mean, rain, humid, condition, slot, slots in columns:
+            days_out = result[index]
+            if len(days_out) >= days:
+                continue
+            days_out.append(DailyForecast(
+                date=date.fromordinal(_EPOCH_ORDINAL + day),
+                temp_min=low,
+                temp_max=high,
+                temp_mean=mean,
+                pop=rain,
+                humidity=humid,
+                condition_id=condition,
+                description=self.description[slot],
+                # A day card always shows the daytime variant of the icon
+                icon=self.icon[slot][:2] + "d",
+                slots=slots,
+            ))
+        return result
+
+
+def aggregate_daily(forecast: Forecast, days: int = 5) -> List[DailyForecast]:
+    """
+    Per-day summary of a forecast.
+
+    Args:
+        forecast: Parsed forecast
+        days: Maximum number of days to return
+
+    Returns:
+        Daily min/max/mean temperature, precipitation probability and
+        dominant condition, split by the city's local date
+    """
+    return ForecastColumns([forecast]).daily(days)[0]
+
+
+def aggregate_many(forecasts: Sequence[Forecast], days: int = 5) -> List[List[DailyForecast]]:
+    """Per-day summaries of many forecasts in one vectorized pass."""
+    return ForecastColumns(forecasts).daily(days)
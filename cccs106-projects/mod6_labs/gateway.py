@@ -0,0 +1,454 @@
+"""
+Local HTTP gateway: one WeatherService, with its connection pool, caches
+and rate limit, shared by every tool on this machine.
+
+Endpoints (JSON in and out):
+    GET  /weather?q=Naga               current weather for a city
+    GET  /weather?lat=13.62&lon=123.19 ... or for a point
+    GET  /forecast?q=Naga              5-day forecast, same parameters
+    POST /batch                        {"queries": ["Naga", [13.62, 123.19]],
+                                        "kind": "weather" or "forecast"}
+    GET  /stats                        gateway, cache and upstream counters
+
+Lookups are answered with Cache-Control (how much longer the shared
+cache keeps the response), Age, ETag and X-Cache: HIT when the shared
+cache already held a fresh copy, MISS when it had to be fetched, STALE
+when an expired copy is served while a fresh one is fetched. A request
+with a matching If-None-Match gets 304 Not Modified.
+
+Usage:
+    python gateway.py                          # http://127.0.0.1:8080
+    python gateway.py --port 9000 --disk-cache weather_cache.sqlite3
+    curl 'http://127.0.0.1:8080/weather?q=Naga'
+"""
+
+import argparse
+import asyncio
+import functools
+import hashlib
+import json
+import sys
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from batch import Query, WeatherBatch
+from cli import model_to_dict, result_to_record
+from config import Config
+from disk_cache import DiskCache
+from rate_limit import Priority
+from weather_service import (
+    CircuitOpenError,
+    NotFoundError,
+    RateLimitedError,
+    WeatherModel,
+    WeatherService,
+    WeatherServiceError,
+)
+
+JSON_TYPE = "application/json; charset=utf-8"
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+}
+
+KINDS = ("weather", "forecast")
+
+# (status, headers, body)
+Response = Tuple[int, Dict[str, str], bytes]
+
+# (method, target, version, headers, body)
+Request = Tuple[str, str, str, Dict[str, str], bytes]
+
+
+class HttpError(Exception):
+    """Answered with `status` and a {"error": message} body."""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class WeatherGateway:
+    """
+    Minimal HTTP/1.1 server in front of one WeatherService.
+
+    Every client connection is a task on the same event loop, so any
+    number of tools share the service's connection pool, response cache,
+    single-flight lookups and API rate limit. Connections are kept alive
+    between requests. A lookup that would queue for the rate limit longer
+    than `max_wait` seconds gets a 429 instead of holding the client.
+    """
+
+    def __init__(
+        self,
+        service: WeatherService,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        max_wait: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        max_body: Optional[int] = None,
+        batch_concurrency: Optional[int] = None,
+        encoded_cache_size: int = 1024,
+    ):
+        """
+        Args:
+            service: Service answering every request (not closed by stop())
+            host: Interface to listen on; keep it local, there is no auth
+            port: Port to listen on (0 picks a free one)
+            max_wait: Seconds a lookup may wait for the rate limit
+                (Config.GATEWAY_MAX_WAIT)
+            max_batch: Queries allowed in one /batch request
+                (Config.GATEWAY_MAX_BATCH)
+            max_body: Largest request body in bytes (Config.GATEWAY_MAX_BODY)
+            batch_concurrency: Lookups in flight per /batch request
+                (Config.BATCH_CONCURRENCY)
+            encoded_cache_size: Responses kept serialized, so a cache hit
+                is not encoded to JSON again
+        """
+        self.service = service
+        self.host = host
+        self.port = port
+        self.max_wait = Config.GATEWAY_MAX_WAIT if max_wait is None else max_wait
+        self.max_batch = max_batch or Config.GATEWAY_MAX_BATCH
+        self.max_body = max_body or Config.GATEWAY_MAX_BODY
+        self.batch_concurrency = batch_concurrency or Config.BATCH_CONCURRENCY
+        self.encoded_cache_size = encoded_cache_size
+        # id(model) -> (model, body, etag); holding the model keeps its id unique
+        self._encoded: "OrderedDict[int, Tuple[WeatherModel, bytes, str]]" = OrderedDict()
+        self.request_count = 0
+        self.connection_count = 0
+        self.status_counts: Counter = Counter()
+        self.cache_counts: Counter = Counter()  # X-Cache values sent
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._handlers: Set[asyncio.Task] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        """Start listening; picks a free port when port is 0."""
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, backlog=1024
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stop listening and drop open connections."""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            if self._handlers:
+                await asyncio.wait(list(self._handlers))
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "WeatherGateway":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def handle(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Response:
+        """Answer one request."""
+        url = urlsplit(target)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        try:
+            if url.path in ("/weather", "/forecast"):
+                if method != "GET":
+                    raise HttpError(405, "Use GET", {"Allow": "GET"})
+                return await self._lookup(url.path[1:], params, headers)
+            if url.path == "/batch":
+                if method != "POST":
+                    raise HttpError(405, "Use POST", {"Allow": "POST"})
+                return await self._batch(body)
+            if url.path == "/stats":
+                return self._json(200, self.stats(), {"Cache-Control": "no-store"})
+            raise HttpError(404, f"No such endpoint: {url.path}")
+        except HttpError as e:
+            return self._json(e.status, {"error": str(e)}, e.headers)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /stats."""
+        service = self.service
+        return {
+            "gateway": {
+                "connections": self.connection_count,
+                "requests": self.request_count,
+                "statuses": {str(k): v for k, v in sorted(self.status_counts.items())},
+                "cache": dict(self.cache_counts),
+            },
+            "upstream_requests": sum(s.requests for s in service.hedger.stats.values()),
+            "cache": service.cache.stats.as_dict(),
+            "locations": service.location_stats.as_dict(),
+            "retries": service.retry_stats.as_dict(),
+            "breaker": service.breaker.as_dict(),
+            "rate_limit": service.rate_limiter.as_dict() if service.rate_limiter else None,
+            "hedging": service.hedger.as_dict(),
+        }
+
+    async def _lookup(self, kind: str, params: Dict[str, str], headers: Dict[str, str]) -> Response:
+        query = self._query(params)
+        fresh_before, _ = self.service.cache_status(kind, query)
+        try:
+            model = await self._fetch(kind, query, priority=Priority.INTERACTIVE)
+        except WeatherServiceError as e:
+            raise self._http_error(e)
+        fresh_for, age = self.service.cache_status(kind, query)
+        if fresh_before > 0:
+            cache = "HIT"
+        else:
+            cache = "MISS" if fresh_for > 0 else "STALE"
+        self.cache_counts[cache] += 1
+
+        body, etag = self._encode(model)
+        out = {
+            "Cache-Control": f"public, max-age={int(fresh_for)}",
+            "ETag": etag,
+            "X-Cache": cache,
+        }
+        if age is not None:
+            out["Age"] = str(int(age))
+        if self._matches(headers.get("if-none-match", ""), etag):
+            return 304, out, b""
+        out["Content-Type"] = JSON_TYPE
+        return 200, out, body
+
+    async def _batch(self, body: bytes) -> Response:
+        try:
+            request = json.loads(body or b"null")
+        except ValueError:
+            raise HttpError(400, "The body must be JSON")
+        if not isinstance(request, dict) or not isinstance(request.get("queries"), list):
+            raise HttpError(400, 'Expected {"queries": [city or [lat, lon], ...]}')
+        kind = request.get("kind", "weather")
+        if kind not in KINDS:
+            raise HttpError(400, f"kind must be one of {', '.join(KINDS)}")
+        if len(request["queries"]) > self.max_batch:
+            raise HttpError(413, f"At most {self.max_batch} queries per batch")
+        queries = [self._batch_query(i, item) for i, item in enumerate(request["queries"])]
+
+        # Batches yield to single lookups for the rate limit
+        batch = WeatherBatch(
+            functools.partial(self._fetch, kind, priority=Priority.BACKGROUND),
+            queries,
+            self.batch_concurrency,
+        )
+        results = [result_to_record(result) async for result in batch]
+        return self._json(
+            200, {"results": results, "stats": batch.stats.summary()}, {"Cache-Control": "no-store"}
+        )
+
+    async def _fetch(self, kind: str, query: Query, priority: int) -> WeatherModel:
+        service = self.service
+        if isinstance(query, str):
+            get = service.get_weather if kind == "weather" else service.get_forecast
+            return await get(query, priority=priority, max_wait=self.max_wait)
+        get = (
+            service.get_weather_by_coordinates if kind == "weather"
+            else service.get_forecast_by_coordinates
+        )
+        return await get(query[0], query[1], priority=priority, max_wait=self.max_wait)
+
+    @staticmethod
+    def _http_error(error: WeatherServiceError) -> HttpError:
+        """The status a service error is reported with."""
+        if isinstance(error, NotFoundError):
+            return HttpError(404, str(error))
+        if isinstance(error, RateLimitedError):
+            return HttpError(429, str(error), {"Retry-After": "1"})
+        if isinstance(error, CircuitOpenError):
+            return HttpError(503, str(error), {"Retry-After": str(int(Config.BREAKER_RESET_TIMEOUT))})
+        # The API failed or answered something unusable
+        return HttpError(502, str(error))
+
+    @staticmethod
+    def _matches(if_none_match: str, etag: str) -> bool:
+        """Whether an If-None-Match header names `etag` (weak tags compare equal)."""
+        if if_none_match.strip() == "*":
+            return True
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag.startswith("W/"):
+                tag = tag[2:]
+            if tag == etag:
+                return True
+        return False
+
+    @staticmethod
+    def _query(params: Dict[str, str]) -> Query:
+        """City name or (lat, lon) pair from the query string."""
+        if "lat" in params or "lon" in params:
+            try:
+                lat, lon = float(params["lat"]), float(params["lon"])
+            except (KeyError, ValueError):
+                raise HttpError(400, "lat and lon must both be numbers")
+            if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+                raise HttpError(400, "lat must be within ±90 and lon within ±180")
+            return lat, lon
+        city = params.get("q", "").strip()
+        if not city:
+            raise HttpError(400, "Pass a city as q=... or a point as lat=...&lon=...")
+        return city
+
+    @staticmethod
+    def _batch_query(index: int, item: Any) -> Query:
+        if isinstance(item, str) and item.strip():
+            return item.strip()
+        if (
+            isinstance(item, list) and len(item) == 2
+            and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in item)
+        ):
+            return WeatherGateway._query({"lat": str(item[0]), "lon": str(item[1])})
+        raise HttpError(400, f"queries[{index}] must be a city name or [lat, lon]")
+
+    def _encode(self, model: WeatherModel) -> Tuple[bytes, str]:
+        """JSON body and ETag of a model, reused while the cache hands out the same object."""
+        entry = self._encoded.get(id(model))
+        if entry is not None and entry[0] is model:
+            self._encoded.move_to_end(id(model))
+            return entry[1], entry[2]
+        body = json.dumps(model_to_dict(model), separators=(",", ":")).encode()
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        self._encoded[id(model)] = (model, body, etag)
+        while len(self._encoded) > self.encoded_cache_size:
+            self._encoded.popitem(last=False)
+        return body, etag
+
+    @staticmethod
+    def _json(status: int, data: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+        body = json.dumps(data, separators=(",", ":")).encode()
+        return status, {"Content-Type": JSON_TYPE, **(headers or {})}, body
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        """Next request on a connection, or None once the client closed it."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise HttpError(400, "Malformed request line")
+        method, target, version = parts
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        body = b""
+        if "transfer-encoding" in headers:
+            raise HttpError(411, "Send the body with a Content-Length")
+        if "content-length" in headers:
+            try:
+                length = int(headers["content-length"])
+            except ValueError:
+                raise HttpError(400, "Bad Content-Length")
+            if length < 0:
+                raise HttpError(400, "Bad Content-Length")
+            if length > self.max_body:
+                raise HttpError(413, f"Bodies are limited to {self.max_body} bytes")
+            body = await reader.readexactly(length)
+        return method.upper(), target, version, headers, body
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connection_count += 1
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HttpError as e:
+                    # The rest of the stream cannot be trusted: answer and hang up
+                    await self._write(writer, self._json(e.status, {"error": str(e)}, e.headers), False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                self.request_count += 1
+                try:
+                    response = await self.handle(method, target, headers, body)
+                except Exception as e:
+                    print(f"Gateway error for {method} {target}: {e!r}")
+                    response = self._json(500, {"error": "Internal error"})
+                connection = headers.get("connection", "").lower()
+                keep_alive = (
+                    connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+                )
+                await self._write(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass  # client went away, or sent a line longer than the stream limit
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def _write(self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+        status, headers, body = response
+        self.status_counts[status] += 1
+        lines: List[str] = [f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if status != 304:
+            lines.append(f"Content-Length: {len(body)}")
+        if not keep_alive:
+            lines.append("Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host: str, port: int, disk_cache_path: Optional[str] = None):
+    """Run the gateway until cancelled."""
+    disk_cache = None
+    if disk_cache_path:
+        disk_cache = DiskCache(
+            disk_cache_path,
+            max_bytes=Config.DISK_CACHE_MAX_BYTES,
+            max_snapshots=Config.OFFLINE_SNAPSHOTS,
+        )
+    try:
+        async with WeatherService(disk_cache=disk_cache) as service:
+            async with WeatherGateway(service, host, port) as gateway:
+                print(f"Weather gateway listening on {gateway.base_url}")
+                await asyncio.Event().wait()
+    finally:
+        if disk_cache is not None:
+            disk_cache.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve WeatherService as a local JSON API")
+    parser.add_argument("--host", default=Config.GATEWAY_HOST)
+    parser.add_argument("--port", type=int, default=Config.GATEWAY_PORT)
+    parser.add_argument("--disk-cache", metavar="PATH", help="keep responses in this SQLite file")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.disk_cache))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Closed-loop load test for the HTTP gateway at a fixed upstream call budget.
+
+`clients` simulated tools each send a request, wait for the answer and
+send the next one, for `duration` seconds. They ask for cities with a
+Zipf popularity (a few hot cities and a long tail) from a pool of
+`cities`. The gateway's service may spend at most `budget` upstream
+calls per minute. A request that would have to queue longer than
+Config.GATEWAY_MAX_WAIT for one gets a 429. The report shows the
+requests per second the gateway sustained, how they were answered
+(status and X-Cache), latency percentiles, and the upstream calls
+actually made.
+
+By default the stand-in API, the gateway and the clients share this
+process, so the request rate is a lower bound. --url points the clients
+at a gateway started separately (python gateway.py); its own rate limit
+applies then.
+
+Usage:
+    python gateway_load_test.py                        # budgets of 60 and 600 calls/min
+    python gateway_load_test.py --budget 60 600 6000 --clients 200 --duration 10
+    python gateway_load_test.py --url http://127.0.0.1:8080 --json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+from urllib.parse import quote, urlsplit
+
+# The stand-in server does not check the key, but Config requires one
+os.environ.setdefault("OPENWEATHER_API_KEY", "load-test-key")
+
+import httpx  # noqa: E402
+
+from fake_server import FakeWeatherServer  # noqa: E402
+from gateway import WeatherGateway  # noqa: E402
+from load_test import percentile  # noqa: E402
+from rate_limit import TokenBucket  # noqa: E402
+from weather_service import WeatherService  # noqa: E402
+
+
+async def get(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, target: str
+) -> Tuple[int, Dict[str, str]]:
+    """One GET on a kept-alive connection; returns (status, headers)."""
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: gateway\r\n\r\n".encode("latin-1"))
+    status = int((await reader.readline()).split()[1])
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get("content-length", "0")))
+    return status, headers
+
+
+def zipf_weights(count: int, exponent: float) -> List[float]:
+    """Cumulative weights where city k is asked for in proportion to 1 / k**exponent."""
+    return list(itertools.accumulate(1 / (k ** exponent) for k in range(1, count + 1)))
+
+
+async def drive(
+    url: str,
+    clients: int,
+    duration: float,
+    cities: int,
+    exponent: float = 1.1,
+    seed: int = 1,
+) -> Dict:
+    """
+    Run the clients against a gateway, each on its own connection like
+    separate tools would be (one shared httpx pool would measure its own
+    queueing instead).
+
+    Returns:
+        Request counts, throughput, latency percentiles and the upstream
+        calls the gateway made meanwhile (from its /stats)
+    """
+    names = [f"City {i}" for i in range(cities)]
+    weights = zipf_weights(cities, exponent)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    cache: Counter = Counter()
+    errors: Counter = Counter()
+
+    address = urlsplit(url)
+    async with httpx.AsyncClient(base_url=url, timeout=30) as http:
+        upstream_before = (await http.get("/stats")).json()["upstream_requests"]
+        connections = [
+            await asyncio.open_connection(address.hostname, address.port) for _ in range(clients)
+        ]
+
+        async def client(i: int):
+            rng = random.Random(seed * 100_003 + i)
+            reader, writer = connections[i]
+            try:
+                while time.perf_counter() < deadline:
+                    city = rng.choices(names, cum_weights=weights)[0]
+                    start = time.perf_counter()
+                    status, headers = await get(reader, writer, f"/weather?q={quote(city)}")
+                    statuses[status] += 1
+                    cache[headers.get("x-cache", "-")] += 1
+                    latencies.append(time.perf_counter() - start)
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError) as e:
+                errors[type(e).__name__] += 1
+            finally:
+                writer.close()
+
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(client(i) for i in range(clients)))
+        elapsed = time.perf_counter() - start
+        upstream = (await http.get("/stats")).json()["upstream_requests"] - upstream_before
+
+    ordered = sorted(latencies)
+    total = len(ordered)
+    return {
+        "clients": clients,
+        "cities": cities,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "x_cache": dict(cache),
+        "errors": dict(errors),
+        "upstream_requests": upstream,
+        "upstream_per_min": round(upstream * 60 / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2) if ordered else 0.0,
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2) if ordered else 0.0,
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2) if ordered else 0.0,
+    }
+
+
+async def run_budget(budget: int, args: argparse.Namespace) -> Dict:
+    """Stand-in API, service and gateway with `budget` upstream calls per minute."""
+    async with FakeWeatherServer(latency=args.latency, seed=args.seed) as server:
+        limiter = TokenBucket.per_minute(budget, burst=args.burst)
+        async with WeatherService(
+            base_url=server.weather_url,
+            forecast_url=server.forecast_url,
+            rate_limiter=limiter,
+        ) as service:
+            async with WeatherGateway(service) as gateway:
+                report = await drive(
+                    gateway.base_url, args.clients, args.duration, args.cities, args.zipf, args.seed
+                )
+    report["budget_per_min"] = budget
+    return report
+
+
+def print_report(report: Dict):
+    """Print one run in a readable form."""
+    budget = report.get("budget_per_min")
+    label = f"budget {budget} calls/min" if budget is not None else "external gateway"
+    print(f"\n[{label}] {report['clients']} clients, {report['cities']} cities, "
+          f"{report['elapsed_s']:.1f} s")
+    print(
+        f"  throughput {report['throughput_rps']:8.1f} req/s   "
+        f"p50 {report['p50_ms']:7.2f} ms  p95 {report['p95_ms']:7.2f} ms  "
+        f"p99 {report['p99_ms']:7.2f} ms"
+    )
+    statuses = ", ".join(f"{code}: {count}" for code, count in report["statuses"].items())
+    cache = ", ".join(f"{name} {count}" for name, count in report["x_cache"].items())
+    print(f"  {report['requests']} requests ({statuses})   X-Cache {cache}")
+    print(f"  upstream {report['upstream_requests']} calls ({report['upstream_per_min']:.0f}/min)")
+    if report["errors"]:
+        print(f"  client errors: {report['errors']}")
+
+
+async def main(args: argparse.Namespace):
+    if args.url:
+        reports = [await drive(args.url, args.clients, args.duration, args.cities, args.zipf, args.seed)]
+    else:
+        reports = [await run_budget(budget, args) for budget in args.budget]
+    for report in reports:
+        if args.json:
+            print(json.dumps(report))
+        else:
+            print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the HTTP gateway at an upstream call budget")
+    parser.add_argument("--budget", type=int, nargs="+", default=[60, 600],
+                        help="upstream calls per minute, one run each")
+    parser.add_argument("--burst", type=int, default=10, help="upstream calls allowed back to back")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument("--cities", type=int, default=500, help="distinct cities asked for")
+    parser.add_argument("--zipf", type=float, default=1.1, help="popularity skew of the cities")
+    parser.add_argument("--latency", type=float, default=0.05, help="stand-in API latency in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="load an already running gateway instead")
+    parser.add_argument("--json", action="store_true", help="print one JSON report per run")
+    asyncio.run(main(parser.parse_args()))
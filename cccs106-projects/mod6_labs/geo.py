@@ -0,0 +1,110 @@
+"""City-to-coordinates memory and the lat/lon grid that weather responses are cached on."""
+
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from disk_cache import DiskCache
+
+Coordinates = Tuple[float, float]
+
+
+def grid_cell(lat: float, lon: float, resolution: float) -> str:
+    """
+    Name of the grid cell containing a point, e.g. "@0.05:1030,-3".
+
+    Cells are `resolution` degrees on each side, so every point within
+    about resolution / 2 of a cell's center shares its name. The
+    resolution is part of the name, so cells of different grids never
+    collide.
+    """
+    lon = (lon + 180.0) % 360.0 - 180.0
+    return f"@{resolution:g}:{round(lat / resolution)},{round(lon / resolution)}"
+
+
+class LocationStats:
+    """Counters describing how lookups were answered."""
+
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0  # answered from the memory or disk cache
+        self.resolved = 0  # city names already known as coordinates
+        self.geocoded = 0  # city names learned from a response
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "resolved": self.resolved,
+            "geocoded": self.geocoded,
+            "hit_rate": round(self.hit_rate, 3),
+        }
+
+
+class LocationCache:
+    """
+    Coordinates of city names seen before, so a name is resolved once.
+
+    Bounded LRU in memory; with a disk cache the mapping also survives
+    restarts (stored as "geo|<name>" entries holding "lat,lon").
+    """
+
+    def __init__(self, max_entries: int = 1000, disk_cache: Optional[DiskCache] = None):
+        self.max_entries = max_entries
+        self.disk_cache = disk_cache
+        self._entries: "OrderedDict[str, Coordinates]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, name: str) -> Optional[Coordinates]:
+        """Coordinates for a normalized city name, or None if not in memory (see read())."""
+        coordinates = self._entries.get(name)
+        if coordinates is not None:
+            self._entries.move_to_end(name)
+        return coordinates
+
+    def read(self, name: str) -> Optional[Coordinates]:
+        """
+        Coordinates persisted for a name by an earlier session, or None
+        (blocking; run it off the event loop). Only reads the disk cache:
+        set() them to use them.
+        """
+        if self.disk_cache is None:
+            return None
+        entry = self.disk_cache.get(f"geo|{name}")
+        if entry is None:
+            return None
+        try:
+            lat, lon = (float(part) for part in entry[0].decode("ascii").split(","))
+        except ValueError:
+            return None
+        return lat, lon
+
+    def set(self, name: str, lat: float, lon: float) -> bool:
+        """
+        Remember where a normalized city name is (in memory; see persist()).
+
+        Returns:
+            True if this changed what was known about the name
+        """
+        coordinates = (lat, lon)
+        if self._entries.get(name) == coordinates:
+            return False
+        self._store(name, coordinates)
+        return True
+
+    def persist(self, name: str):
+        """Write one mapping to the disk cache (blocking; run it off the event loop)."""
+        coordinates = self._entries.get(name)
+        if coordinates is not None and self.disk_cache is not None:
+            self.disk_cache.set(f"geo|{name}", f"{coordinates[0]},{coordinates[1]}".encode("ascii"))
+
+    def _store(self, name: str, coordinates: Coordinates):
+        self._entries[name] = coordinates
+        self._entries.move_to_end(name)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
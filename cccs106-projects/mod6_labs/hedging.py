@@ -0,0 +1,257 @@
+"""Hedged requests across an ordered list of equivalent API endpoints."""
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+
+
+class Endpoint(NamedTuple):
+    """One upstream that serves the weather and forecast APIs."""
+
+    weather_url: str
+    forecast_url: str
+
+    @classmethod
+    def from_root(cls, root: str) -> "Endpoint":
+        """Endpoint for an API root such as "https://api.openweathermap.org/data/2.5"."""
+        root = root.rstrip("/")
+        return cls(f"{root}/weather", f"{root}/forecast")
+
+    @property
+    def name(self) -> str:
+        return self.weather_url.rsplit("/", 1)[0]
+
+    def url(self, kind: str) -> str:
+        """URL for "weather" or "forecast"."""
+        return self.weather_url if kind == "weather" else self.forecast_url
+
+
+class EndpointStats:
+    """Recent latency of one endpoint."""
+
+    def __init__(self, window: int = 50, alpha: float = 0.2):
+        self.alpha = alpha
+        self.ewma: Optional[float] = None  # smoothed latency, seconds
+        self._latencies: Deque[float] = deque(maxlen=window)  # completed requests
+        self.requests = 0
+        self.wins = 0
+        self.failures = 0
+
+    def record(self, seconds: float, completed: bool = True):
+        """
+        Add a latency sample. A request cancelled because another endpoint
+        answered first is recorded with completed=False: its latency is at
+        least `seconds`, which still counts against it in the ordering.
+        """
+        self.ewma = seconds if self.ewma is None else (
+            self.alpha * seconds + (1 - self.alpha) * self.ewma
+        )
+        if completed:
+            self._latencies.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of the recent completed requests, or None without samples."""
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[max(0, int(round(0.95 * len(ordered))) - 1)]
+
+    @property
+    def samples(self) -> int:
+        return len(self._latencies)
+
+    def as_dict(self) -> Dict[str, float]:
+        p95 = self.p95()
+        return {
+            "requests": self.requests,
+            "wins": self.wins,
+            "failures": self.failures,
+            "ewma_ms": round(self.ewma * 1000, 1) if self.ewma is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+# send(endpoint) -> response from that endpoint
+SendFunction = Callable[[Endpoint], Awaitable[httpx.Response]]
+
+
+class HedgedSender:
+    """
+    Sends a request to the best endpoint and, if it has not answered
+    within its own recent p95 latency, a duplicate to the next one; the
+    first good answer wins and the others are cancelled.
+
+    Endpoints are ordered by smoothed latency. An endpoint without samples
+    keeps its configured place behind those that have some, so the first
+    endpoint is the primary until a hedge shows another one answering
+    faster. A request that fails outright (network error, 5xx, 429) starts
+    the next endpoint at once instead of waiting for the hedge delay.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[Endpoint],
+        initial_delay: float = 0.5,
+        min_delay: float = 0.05,
+        max_delay: float = 2.0,
+        min_samples: int = 10,
+        max_hedges: int = 1,
+        allow_hedge: Optional[Callable[[], bool]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            endpoints: Upstreams in order of preference
+            initial_delay: Hedge delay until an endpoint has min_samples
+            min_delay: Lower bound of the hedge delay
+            max_delay: Upper bound of the hedge delay
+            min_samples: Samples needed before the p95 is trusted
+            max_hedges: Duplicates one request may start (failover after
+                an outright failure does not count)
+            allow_hedge: Asked before every hedge or failover, e.g. to
+                take a rate limiter token; returning False skips it
+            clock: Monotonic time source
+        """
+        if not endpoints:
+            raise ValueError("at least one endpoint is required")
+        self.endpoints = list(endpoints)
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.max_hedges = max_hedges
+        self.allow_hedge = allow_hedge
+        self.clock = clock
+        self.stats: Dict[Endpoint, EndpointStats] = {e: EndpointStats() for e in self.endpoints}
+        # Metrics
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    def ordered(self) -> List[Endpoint]:
+        """Endpoints, fastest first; ones without samples keep their configured order."""
+        position = {e: i for i, e in enumerate(self.endpoints)}
+
+        def rank(endpoint: Endpoint) -> Tuple[float, int]:
+            ewma = self.stats[endpoint].ewma
+            return (float("inf") if ewma is None else ewma, position[endpoint])
+
+        return sorted(self.endpoints, key=rank)
+
+    def hedge_delay(self, endpoint: Endpoint) -> float:
+        """Seconds to wait for an endpoint before hedging: its recent p95."""
+        stats = self.stats[endpoint]
+        delay = stats.p95() if stats.samples >= self.min_samples else self.initial_delay
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    async def send(self, send: SendFunction) -> httpx.Response:
+        """
+        Run `send` against the endpoints until one gives a good answer.
+
+        Returns:
+            The first good response, else the last bad one
+
+        Raises:
+            The last network error, if no endpoint returned a response
+        """
+        order = self.ordered()
+        if len(order) == 1:
+            return await self._timed(order[0], send)
+
+        pending: Dict[asyncio.Task, Tuple[Endpoint, float]] = {}
+        waiting = deque(order)
+        hedges = 0
+        last_response: Optional[httpx.Response] = None
+        last_error: Optional[BaseException] = None
+
+        def start(endpoint: Endpoint):
+            pending[asyncio.create_task(send(endpoint))] = (endpoint, self.clock())
+            self.stats[endpoint].requests += 1
+
+        start(waiting.popleft())
+        try:
+            while pending:
+                timeout = None
+                if waiting and hedges < self.max_hedges:
+                    # Hedge once the newest request is overdue
+                    newest, started = max(pending.values(), key=lambda item: item[1])
+                    timeout = max(0.0, started + self.hedge_delay(newest) - self.clock())
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Too slow: send a duplicate to the next endpoint
+                    if self._may_send():
+                        hedges += 1
+                        self.hedges += 1
+                        start(waiting.popleft())
+                    else:
+                        hedges = self.max_hedges
+                    continue
+
+                for task in done:
+                    endpoint, started = pending.pop(task)
+                    stats = self.stats[endpoint]
+                    elapsed = self.clock() - started
+                    try:
+                        response = task.result()
+                    except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError) as e:
+                        last_error = e
+                        stats.failures += 1
+                        stats.record(max(elapsed, self.max_delay), completed=False)
+                        continue
+                    if response.status_code >= 500 or response.status_code == 429:
+                        last_response = response
+                        stats.failures += 1
+                        # A quick failure must not make an endpoint look fast
+                        stats.record(max(elapsed, self.max_delay), completed=False)
+                        continue
+                    stats.record(elapsed)
+                    stats.wins += 1
+                    if endpoint != order[0]:
+                        self.hedge_wins += 1
+                    return response
+
+                if not pending and waiting and self._may_send():
+                    # Every request so far failed: fail over right away
+                    self.failovers += 1
+                    start(waiting.popleft())
+        finally:
+            # Cancel the losers; their elapsed time is a lower bound on their latency
+            for task, (endpoint, started) in pending.items():
+                task.cancel()
+                self.stats[endpoint].record(self.clock() - started, completed=False)
+
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def _may_send(self) -> bool:
+        return self.allow_hedge is None or self.allow_hedge()
+
+    async def _timed(self, endpoint: Endpoint, send: SendFunction) -> httpx.Response:
+        stats = self.stats[endpoint]
+        stats.requests += 1
+        started = self.clock()
+        try:
+            response = await send(endpoint)
+        except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError):
+            stats.failures += 1
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            stats.failures += 1
+        else:
+            stats.record(self.clock() - started)
+            stats.wins += 1
+        return response
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "endpoints": {e.name: self.stats[e].as_dict() for e in self.ordered()},
+        }
@@ -0,0 +1,139 @@
+"""Local cache of OpenWeatherMap condition icons in the Flet assets directory."""
+
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple, Union
+
+import httpx
+
+# Every icon code the API uses, day ("d") and night ("n") variants
+ICON_CODES = tuple(
+    f"{number}{variant}"
+    for number in ("01", "02", "03", "04", "09", "10", "11", "13", "50")
+    for variant in ("d", "n")
+)
+
+# "" is the 50 px icon used by forecast cards, "@2x" the 100 px current weather icon
+ICON_SIZES = ("", "@2x")
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class IconStore:
+    """
+    Downloads each condition icon once into <assets_dir>/icons and hands
+    out the local asset path for ft.Image.
+
+    The set of icons on disk is read once at construction and kept in
+    memory, so src() never touches the disk or the network. An icon that
+    is not stored yet falls back to its remote URL.
+    """
+
+    def __init__(
+        self,
+        assets_dir: Union[str, Path],
+        url_template: str,
+        timeout: float = 10.0,
+    ):
+        self.assets_dir = Path(assets_dir)
+        self.icon_dir = self.assets_dir / "icons"
+        self.url_template = url_template
+        self.timeout = timeout
+        self._stored: Set[str] = set()
+        if self.icon_dir.is_dir():
+            self._stored = {p.stem for p in self.icon_dir.glob("*.png")}
+        self.downloaded = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+
+    def src(self, code: str, size: str = "") -> str:
+        """Image source for an icon: the local asset if stored, else the remote URL."""
+        name = f"{code}{size}"
+        if name in self._stored:
+            return f"/icons/{name}.png"
+        return self.url_template.format(name=name)
+
+    def is_stored(self, code: str, size: str = "") -> bool:
+        return f"{code}{size}" in self._stored
+
+    def missing(
+        self,
+        codes: Iterable[str] = ICON_CODES,
+        sizes: Iterable[str] = ICON_SIZES,
+    ) -> List[Tuple[str, str]]:
+        """(code, size) pairs not stored yet."""
+        return [(c, s) for c in codes for s in sizes if f"{c}{s}" not in self._stored]
+
+    async def prefetch(
+        self,
+        codes: Iterable[str] = ICON_CODES,
+        sizes: Iterable[str] = ICON_SIZES,
+        concurrency: int = 4,
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> int:
+        """
+        Download every missing icon.
+
+        Args:
+            codes: Icon codes to fetch (all of them by default)
+            sizes: Size suffixes to fetch
+            concurrency: Downloads in flight at once
+            client: HTTP client to use; a short-lived one by default
+
+        Returns:
+            Number of icons downloaded
+        """
+        todo = self.missing(codes, sizes)
+        if not todo:
+            return 0
+
+        if client is None:
+            async with httpx.AsyncClient(timeout=self.timeout) as own_client:
+                return await self.prefetch(codes, sizes, concurrency, own_client)
+
+        queue = iter(todo)
+        before = self.downloaded
+
+        async def worker():
+            # Workers share one iterator, like batch lookups do
+            for code, size in queue:
+                await self.fetch(client, code, size)
+
+        await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        return self.downloaded - before
+
+    async def fetch(self, client: httpx.AsyncClient, code: str, size: str = "") -> bool:
+        """Download one icon; returns True if it is stored afterwards."""
+        name = f"{code}{size}"
+        try:
+            response = await client.get(self.url_template.format(name=name))
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            self.failed += 1
+            self.last_error = f"{name}: {e}"
+            return False
+
+        body = response.content
+        if not body.startswith(_PNG_SIGNATURE):
+            self.failed += 1
+            self.last_error = f"{name}: not a PNG"
+            return False
+
+        await asyncio.to_thread(self._write, name, body)
+        self._stored.add(name)
+        self.downloaded += 1
+        return True
+
+    def _write(self, name: str, body: bytes):
+        # Write to a temporary file and rename, so a half-written icon is never served
+        self.icon_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.icon_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            os.replace(tmp, self.icon_dir / f"{name}.png")
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -0,0 +1,211 @@
+"""
+Open-loop load generator for WeatherService, run against the local
+stand-in server.
+
+Requests are started on a fixed schedule (`rps` per second) whether or
+not earlier ones have finished, and latency is measured from the moment
+a request was due. A slow service therefore shows up as queueing in the
+tail, instead of quietly lowering the request rate.
+
+Usage:
+    python load_test.py                      # run every scenario
+    python load_test.py baseline errors      # run only the named scenarios
+    python load_test.py --rps 200 --duration 10 --latency 0.05 --error-rate 0.1
+    python load_test.py --json               # one JSON object per scenario
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+# The stand-in server does not check the key, but Config requires one
+os.environ.setdefault("OPENWEATHER_API_KEY", "load-test-key")
+# Measure the service itself, not the API key's quota
+os.environ.setdefault("WEATHER_RATE_LIMIT", "0")
+
+from fake_server import FakeWeatherServer  # noqa: E402
+from resilience import RetryPolicy  # noqa: E402
+from weather_service import WeatherService  # noqa: E402
+
+
+class Scenario:
+    """
+    One repeatable load profile.
+
+    Args:
+        name: Label used on the command line and in reports
+        rps: Requests started per second
+        duration: Seconds to generate load for
+        latency: Upstream latency per request in seconds
+        jitter: Extra uniform random upstream latency in seconds
+        error_rate: Fraction of upstream requests answered with a 5xx
+        unknown_share: Fraction of lookups for cities that return 404
+        cities: Size of the city pool; 0 makes every lookup a new city,
+            so the response cache never answers
+        seed: Seed for the server, the city choice and retry jitter
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rps: float = 100.0,
+        duration: float = 5.0,
+        latency: float = 0.02,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        unknown_share: float = 0.0,
+        cities: int = 0,
+        seed: int = 1,
+    ):
+        self.name = name
+        self.rps = rps
+        self.duration = duration
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.unknown_share = unknown_share
+        self.cities = cities
+        self.seed = seed
+
+
+SCENARIOS = {
+    "baseline": Scenario("baseline"),
+    "slow_upstream": Scenario("slow_upstream", latency=0.15, jitter=0.25),
+    "errors": Scenario("errors", error_rate=0.05),
+    "not_found": Scenario("not_found", unknown_share=0.2),
+    "hot_cities": Scenario("hot_cities", rps=200.0, cities=50),
+}
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(0, int(round(pct / 100 * len(ordered))) - 1)]
+
+
+async def run_scenario(scenario: Scenario) -> Dict:
+    """
+    Drive WeatherService.get_weather at the scenario's request rate.
+
+    Returns:
+        Report with latency percentiles, throughput and error breakdown
+    """
+    rng = random.Random(scenario.seed)
+    total = int(scenario.rps * scenario.duration)
+    unknown = {f"Nowhere {i}" for i in range(total)} if scenario.unknown_share else set()
+
+    def pick_city(i: int) -> str:
+        if rng.random() < scenario.unknown_share:
+            return f"Nowhere {i}"
+        if scenario.cities:
+            return f"City {rng.randrange(scenario.cities)}"
+        return f"City {i}"
+
+    latencies: List[float] = []
+    errors: Counter = Counter()
+
+    async def one(city: str, due: float):
+        try:
+            await service.get_weather(city)
+        except Exception as e:
+            errors[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - due)
+
+    server = FakeWeatherServer(
+        latency=scenario.latency,
+        jitter=scenario.jitter,
+        error_rate=scenario.error_rate,
+        unknown_cities=unknown,
+        seed=scenario.seed,
+    )
+    async with server:
+        service = WeatherService(
+            base_url=server.weather_url,
+            forecast_url=server.forecast_url,
+            retry_policy=RetryPolicy(rng=random.Random(scenario.seed).random),
+        )
+        async with service:
+            tasks = []
+            start = time.perf_counter()
+            for i in range(total):
+                due = start + i / scenario.rps
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(one(pick_city(i), due)))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "scenario": scenario.name,
+        "target_rps": scenario.rps,
+        "requests": total,
+        "ok": total - sum(errors.values()),
+        "errors": dict(errors),
+        "upstream_requests": server.request_count,
+        "upstream_statuses": {str(k): v for k, v in sorted(server.status_counts.items())},
+        "retries": service.retry_stats.retries,
+        "cache_hit_rate": round(service.cache.stats.hit_rate, 3),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2) if ordered else 0.0,
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2) if ordered else 0.0,
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2) if ordered else 0.0,
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+def print_report(report: Dict):
+    """Print one scenario report in a readable form."""
+    print(f"\n[{report['scenario']}] {report['requests']} requests at {report['target_rps']:.0f} rps")
+    print(
+        f"  throughput {report['throughput_rps']:7.1f} rps   "
+        f"p50 {report['p50_ms']:7.2f} ms  p95 {report['p95_ms']:7.2f} ms  "
+        f"p99 {report['p99_ms']:7.2f} ms  max {report['max_ms']:7.2f} ms"
+    )
+    errors = ", ".join(f"{name} {count}" for name, count in report["errors"].items()) or "none"
+    statuses = ", ".join(f"{code}: {count}" for code, count in report["upstream_statuses"].items())
+    print(f"  ok {report['ok']}   errors: {errors}")
+    print(
+        f"  upstream {report['upstream_requests']} requests ({statuses})   "
+        f"retries {report['retries']}   cache hit rate {report['cache_hit_rate']:.1%}"
+    )
+
+
+async def main(args: argparse.Namespace):
+    names = args.scenarios or list(SCENARIOS)
+    for name in names:
+        if name not in SCENARIOS:
+            print(f"Unknown scenario '{name}'. Available: {', '.join(SCENARIOS)}")
+            continue
+        scenario = SCENARIOS[name]
+        # Command-line flags override the scenario's own settings
+        for attr in ("rps", "duration", "latency", "jitter", "error_rate", "seed"):
+            value: Optional[float] = getattr(args, attr)
+            if value is not None:
+                setattr(scenario, attr, value)
+        report = await run_scenario(scenario)
+        if args.json:
+            print(json.dumps(report))
+        else:
+            print_report(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test WeatherService against the stand-in API")
+    parser.add_argument("scenarios", nargs="*", help=f"scenarios to run ({', '.join(SCENARIOS)})")
+    parser.add_argument("--rps", type=float, help="requests started per second")
+    parser.add_argument("--duration", type=float, help="seconds of load per scenario")
+    parser.add_argument("--latency", type=float, help="upstream latency in seconds")
+    parser.add_argument("--jitter", type=float, help="extra random upstream latency in seconds")
+    parser.add_argument("--error-rate", type=float, help="fraction of upstream 5xx responses")
+    parser.add_argument("--seed", type=int, help="seed for repeatable runs")
+    parser.add_argument("--json", action="store_true", help="print one JSON report per scenario")
+    asyncio.run(main(parser.parse_args()))
@@ -1,10 +1,178 @@
 """Weather Application using Flet v0.28.3"""
 
 import flet as ft
-from weather_service import WeatherService
+from weather_service import (
+    RateLimitedError,
+    ServiceUnavailableError,
+    Snapshot,
+    WeatherService,
+    WeatherServiceError,
+    normalize_city,
+)
+from city_index import CityIndex, CitySuggestion, ensure_index
+from disk_cache import DiskCache
+from icon_store import IconStore
+from prefetch import PrefetchScheduler
+from settings_store import SettingsStore
+from forecast import DailyForecast, aggregate_daily
+from models import CurrentWeather, Forecast
+from rate_limit import Priority
 from config import Config
-import json
-from pathlib import Path
+import asyncio
+import functools
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+
+
+class SearchScheduler:
+    """
+    Runs one search at a time for a page session; the latest search wins.
+    
+    Submitting a search cancels the one that is waiting or in flight,
+    including its HTTP requests. Each search waits a short debounce period
+    first, so a burst of submits and dropdown changes costs a single lookup.
+    """
+    
+    def __init__(self, search: Callable[[str], Awaitable[None]], debounce: float):
+        self._search = search
+        self.debounce = debounce
+        self._task: Optional[asyncio.Task] = None
+        self.superseded = 0  # searches cancelled by a newer one
+    
+    async def submit(self, city: str):
+        """Schedule a search, cancelling any older one."""
+        self.cancel()
+        self._task = asyncio.create_task(self._run(city))
+    
+    def cancel(self):
+        """Cancel the pending or running search, if any."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            self.superseded += 1
+        self._task = None
+    
+    async def _run(self, city: str):
+        await asyncio.sleep(self.debounce)
+        await self._search(city)
+
+
+class ReconnectWatcher:
+    """
+    Retries a refresh until it succeeds, waiting longer after each failure.
+    
+    The refresh raises ServiceUnavailableError (or RateLimitedError) while
+    the API is still out of reach; any other error stops the watcher.
+    """
+    
+    def __init__(self, refresh: Callable[[], Awaitable[None]], interval: float, max_interval: float):
+        self._refresh = refresh
+        self.interval = interval
+        self.max_interval = max_interval
+        self._task: Optional[asyncio.Task] = None
+        self.attempts = 0  # refreshes tried since the watcher last started
+    
+    @property
+    def active(self) -> bool:
+        return self._task is not None and not self._task.done()
+    
+    def start(self):
+        """Start watching, unless already running."""
+        if not self.active:
+            self.attempts = 0
+            self._task = asyncio.create_task(self._run())
+    
+    def cancel(self):
+        """Stop watching."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+    
+    async def _run(self):
+        delay = self.interval
+        while True:
+            await asyncio.sleep(delay)
+            self.attempts += 1
+            try:
+                await self._refresh()
+            except (ServiceUnavailableError, RateLimitedError):
+                delay = min(delay * 2, self.max_interval)
+                continue
+            except Exception as e:
+                print(f"Reconnect stopped: {e}")
+            return
+
+
+class UpdateBatcher:
+    """
+    Coalesces page updates into as few round-trips as possible.
+    
+    request() marks the page dirty; everything changed before the next
+    flush goes out in one page.update(), at most once per `interval`
+    seconds. flush() sends pending changes at once, for states the user
+    must see immediately (loading, errors, the start of an animation).
+    Both are safe to call from Flet's handler threads.
+    """
+    
+    def __init__(self, page: ft.Page, interval: float):
+        self.page = page
+        self.interval = interval
+        self._dirty = False
+        self._handle: Optional[asyncio.Handle] = None
+        self._last_flush = 0.0
+        self.requests = 0  # update() calls asked for
+        self.flushes = 0  # page.update() calls made
+    
+    def request(self):
+        """Schedule an update for the next flush."""
+        self.requests += 1
+        self._dirty = True
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.page.loop:
+            self._arm()
+        else:
+            self.page.loop.call_soon_threadsafe(self._arm)
+    
+    def flush(self):
+        """Send pending changes now."""
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self.flushes += 1
+        self.page.update()
+    
+    def _arm(self):
+        if self._handle is not None or not self._dirty:
+            return
+        delay = max(0.0, self._last_flush + self.interval - time.monotonic())
+        self._handle = self.page.loop.call_later(delay, self._run)
+    
+    def _run(self):
+        self._handle = None
+        if not self._dirty:
+            return
+        if time.monotonic() < self._last_flush + self.interval:
+            # flush() ran after this was armed; wait out its interval
+            self._arm()
+            return
+        try:
+            self.flush()
+        except Exception as e:
+            # The session may have closed while the update was pending
+            print(f"Page update failed: {e}")
+
+
+class ForecastCardControls(NamedTuple):
+    """The controls of one forecast row that change from day to day."""
+    
+    container: ft.Container
+    day: ft.Text
+    description: ft.Text
+    icon: ft.Image
+    temp_max: ft.Text
+    temp_min: ft.Text
 
 
 class WeatherApp:
@@ -12,39 +180,68 @@ class WeatherApp:
     
     def __init__(self, page: ft.Page):
         self.page = page
-        self.weather_service = WeatherService()
-        self.history_file = Path("search_history.json")
-        self.temp_pref_file = Path("temp_preference.json")
-        self.search_history = self.load_history()
-        self.temp_unit = self.load_temp_preference()  # "C" or "F"
+        self.disk_cache = DiskCache(
+            Config.CACHE_DB_PATH,
+            max_bytes=Config.DISK_CACHE_MAX_BYTES,
+            max_snapshots=Config.OFFLINE_SNAPSHOTS,
+        )
+        self.weather_service = WeatherService(disk_cache=self.disk_cache)
+        self.icon_store = IconStore(Config.ASSETS_DIR, Config.ICON_URL)
+        # Unit and search history; read in the background, written behind the UI
+        self.settings = SettingsStore(
+            Config.SETTINGS_PATH,
+            max_history=Config.HISTORY_MAX_ENTRIES,
+            half_life=Config.HISTORY_HALF_LIFE,
+            save_delay=Config.SETTINGS_SAVE_DELAY,
+        )
+        self.temp_unit = self.settings.unit  # "C" or "F"
+        # Offline city suggestions; usable once prepare_city_index has run
+        self.city_index = CityIndex(Config.CITY_INDEX_PATH)
+        self.autocomplete_ready = False
         self.current_weather_data = None  # Store current weather data for unit conversion
+        self.current_forecast_days = None  # Daily summaries on screen, also for unit conversion
+        self.current_city = None  # City whose weather is on screen
+        self.search_scheduler = SearchScheduler(self.get_weather, Config.SEARCH_DEBOUNCE)
+        # All page updates go through here, so bursts of changes share one round-trip
+        self.ui = UpdateBatcher(self.page, Config.UI_FRAME_INTERVAL)
+        # Last-known data on screen while offline, and the watcher that replaces it
+        self.offline_snapshot: Optional[Snapshot] = None
+        self.reconnect = ReconnectWatcher(
+            self.refresh_offline, Config.RECONNECT_INTERVAL, Config.RECONNECT_MAX_INTERVAL
+        )
+        # Keeps the history cities fresh so picking one from the dropdown is instant
+        self.prefetcher = PrefetchScheduler(
+            self.prefetch_city,
+            interval=Config.PREFETCH_INTERVAL,
+            jitter=Config.PREFETCH_JITTER,
+            budget_per_minute=Config.PREFETCH_BUDGET_PER_MINUTE,
+            idle_after=Config.PREFETCH_IDLE_AFTER,
+        )
         self.setup_page()
         self.build_ui()
+        
+        # Work that runs alongside the UI until shutdown() stops it
+        self.background: List[asyncio.Task] = []
+        self.starting = self.page.run_task(self.start_background)
+    
+    async def start_background(self):
+        """Start the background work on the page's event loop."""
+        # Fill in the stored unit and history once they are read
+        handlers = [self.load_settings]
+        # Trim the persistent cache and download missing icons in the background
+        handlers += [self.compact_cache, self.prepare_city_index, self.prefetch_icons]
+        if Config.PREFETCH_BUDGET_PER_MINUTE > 0:
+            handlers.append(self.start_prefetch)
+        self.background = [asyncio.create_task(handler()) for handler in handlers]
     
-    def load_history(self):
-        """Load search history from file."""
-        if self.history_file.exists():
-            with open(self.history_file, 'r') as f:
-                return json.load(f)
-        return []
-    
-    def load_temp_preference(self):
-        """Load temperature unit preference from file."""
-        if self.temp_pref_file.exists():
-            with open(self.temp_pref_file, 'r') as f:
-                data = json.load(f)
-                return data.get("unit", "C")
-        return "C"  # Default to Celsius
-    
-    def save_temp_preference(self):
-        """Save temperature unit preference to file."""
-        with open(self.temp_pref_file, 'w') as f:
-            json.dump({"unit": self.temp_unit}, f)
-    
-    def save_history(self):
-        """Save search history to file."""
-        with open(self.history_file, 'w') as f:
-            json.dump(self.search_history, f)
+    async def load_settings(self):
+        """Apply the stored unit and search history once the settings are read."""
+        await self.settings.load()
+        if self.settings.unit != self.temp_unit:
+            self.temp_unit = self.settings.unit
+            self.temp_unit_button.tooltip = f"Temperature: {self.temp_unit}°"
+            self.render_units()
+        self.update_history_dropdown()
     
     def celsius_to_fahrenheit(self, celsius: float) -> float:
         """Convert Celsius to Fahrenheit."""
@@ -54,12 +251,27 @@ class WeatherApp:
         """Convert Fahrenheit to Celsius."""
         return (fahrenheit - 32) * 5/9
     
+    def format_temp(self, celsius: float, decimals: int = 1) -> str:
+        """Format a Celsius temperature in the selected unit, e.g. "21.5°C"."""
+        if self.temp_unit == "F":
+            return f"{self.celsius_to_fahrenheit(celsius):.{decimals}f}°F"
+        return f"{celsius:.{decimals}f}°C"
+    
+    def format_age(self, seconds: float) -> str:
+        """Format an age in seconds, e.g. "5 min ago" or "3 h ago"."""
+        if seconds < 60:
+            return "just now"
+        if seconds < 3600:
+            return f"{int(seconds // 60)} min ago"
+        if seconds < 86400:
+            return f"{int(seconds // 3600)} h ago"
+        days = int(seconds // 86400)
+        return f"{days} day{'s' if days > 1 else ''} ago"
+    
     def add_to_history(self, city: str):
         """Add city to search history."""
-        if city not in self.search_history:
-            self.search_history.insert(0, city)
-            self.search_history = self.search_history[:5]  # Keep last 5
-            self.save_history()
+        self.settings.record_search(city)
+        if self.settings.loaded:
             self.update_history_dropdown()
         
     def setup_page(self):
@@ -84,6 +296,86 @@ class WeatherApp:
         
         # Center the window on desktop
         self.page.window.center()
+        
+        # Release pooled HTTP connections when the session ends
+        self.page.on_close = self.on_session_close
+        
+        # Pause background prefetching while the window is hidden
+        self.page.on_app_lifecycle_state_change = self.on_lifecycle_change
+    
+    def on_session_close(self, e):
+        """Close the weather service when the page session is closed."""
+        self.page.run_task(self.shutdown)
+    
+    def on_lifecycle_change(self, e: ft.AppLifecycleStateChangeEvent):
+        """Pause prefetching while the app is hidden or in the background."""
+        if e.state in (ft.AppLifecycleState.HIDE, ft.AppLifecycleState.PAUSE, ft.AppLifecycleState.DETACH):
+            self.prefetcher.pause("hidden")
+        elif e.state in (ft.AppLifecycleState.SHOW, ft.AppLifecycleState.RESUME):
+            self.prefetcher.resume("hidden")
+    
+    async def shutdown(self):
+        """Release pooled connections and the persistent cache."""
+        # Stop the background work before closing what it uses (once it
+        # has been started, which may still be pending on the loop)
+        await asyncio.wrap_future(self.starting)
+        for task in self.background:
+            task.cancel()
+        await asyncio.gather(*self.background, return_exceptions=True)
+        self.search_scheduler.cancel()
+        self.reconnect.cancel()
+        self.prefetcher.stop()
+        await self.settings.flush()
+        await self.weather_service.close()
+        self.disk_cache.close()
+        self.city_index.close()
+    
+    async def compact_cache(self):
+        """Drop old entries from the persistent cache off the event loop."""
+        await asyncio.to_thread(self.disk_cache.compact, Config.DISK_CACHE_MAX_AGE)
+    
+    async def prepare_city_index(self):
+        """Index the city list (first run only) and map it for suggestions."""
+        try:
+            available = await asyncio.to_thread(
+                ensure_index, Config.CITY_LIST_PATH, Config.CITY_INDEX_PATH
+            )
+            if available:
+                await asyncio.to_thread(self.city_index.open)
+        except (OSError, ValueError) as e:
+            print(f"City suggestions unavailable: {e}")
+            return
+        if not available:
+            print(f"City suggestions off: no city list at {Config.CITY_LIST_PATH}")
+            return
+        self.autocomplete_ready = True
+    
+    async def start_prefetch(self):
+        """Start refreshing the history cities in the background."""
+        self.prefetcher.start()
+    
+    async def prefetch_city(self, city: str) -> int:
+        """Refresh one history city unless it stays fresh until its next turn."""
+        return await self.weather_service.prefetch(
+            city,
+            min_ttl=Config.PREFETCH_INTERVAL * (1 + Config.PREFETCH_JITTER),
+            max_wait=Config.SEARCH_MAX_WAIT,
+        )
+    
+    async def prefetch_icons(self):
+        """Download condition icons once so later cards load them from assets."""
+        try:
+            fetched = await self.icon_store.prefetch(
+                concurrency=Config.ICON_PREFETCH_CONCURRENCY
+            )
+        except Exception as e:
+            print(f"Icon prefetch failed: {e}")
+            return
+        if fetched:
+            print(f"Downloaded {fetched} weather icons to {self.icon_store.icon_dir}")
+        if self.icon_store.failed:
+            # Those icons keep loading from the remote URL
+            print(f"Could not download {self.icon_store.failed} icons ({self.icon_store.last_error})")
     
     def build_ui(self):
         """Build the user interface."""
@@ -129,7 +421,7 @@ class WeatherApp:
         # History dropdown with enhanced styling
         self.history_dropdown = ft.Dropdown(
             label="Recent Searches",
-            options=[ft.dropdown.Option(city) for city in self.search_history],
+            options=[],
             on_change=self.load_from_history,
             width=450,
             border_color=ft.Colors.BLUE_300,
@@ -144,14 +436,29 @@ class WeatherApp:
             prefix_icon=ft.Icons.LOCATION_CITY,
             autofocus=True,
             on_submit=self.on_search,
+            on_change=self.on_city_change,
             width=450,
             dense=True,
         )
         
-        # Container for input and dropdown
+        # Suggestions while typing; the tiles are reused for every keystroke
+        self.suggestion_tiles = [
+            ft.ListTile(
+                leading=ft.Icon(ft.Icons.PLACE, color=ft.Colors.BLUE_300),
+                title=ft.Text("", size=14),
+                dense=True,
+                visible=False,
+                on_click=self.on_pick_suggestion,
+            )
+            for _ in range(Config.AUTOCOMPLETE_LIMIT)
+        ]
+        self.suggestion_list = ft.Column(self.suggestion_tiles, spacing=0, visible=False, width=450)
+        
+        # Container for input, suggestions and dropdown
         self.input_container = ft.Column(
             [
                 self.city_input,
+                self.suggestion_list,
                 self.history_dropdown,
             ],
             spacing=4,
@@ -184,6 +491,7 @@ class WeatherApp:
             ),
             border=ft.border.all(1, ft.Colors.LIGHT_BLUE_200),
         )
+        self.build_weather_card()
         
         # 5-day forecast container
         self.forecast_container = ft.Container(
@@ -199,6 +507,13 @@ class WeatherApp:
             border=ft.border.all(1, ft.Colors.LIGHT_BLUE_200),
         )
         
+        # One card per forecast day, filled in by render_forecast
+        self.forecast_cards = [self.create_forecast_card() for _ in range(5)]
+        self.forecast_container.content = ft.Column(
+            [card.container for card in self.forecast_cards],
+            spacing=6,
+        )
+        
         # Forecast header
         self.forecast_header = ft.Text(
             "📅 5-Day Forecast",
@@ -217,6 +532,22 @@ class WeatherApp:
             weight=ft.FontWeight.W_500,
         )
         
+        # Offline notice shown above last-known data
+        self.offline_text = ft.Text("", size=12, color=ft.Colors.GREY_800, expand=True)
+        self.offline_banner = ft.Container(
+            visible=False,
+            bgcolor=ft.Colors.GREY_200,
+            padding=10,
+            border_radius=12,
+            content=ft.Row(
+                [
+                    ft.Icon(ft.Icons.CLOUD_OFF, color=ft.Colors.GREY_700, size=20),
+                    self.offline_text,
+                ],
+                spacing=8,
+            ),
+        )
+        
         # Loading indicator with size adjustment
         self.loading = ft.ProgressRing(
             visible=False,
@@ -224,7 +555,10 @@ class WeatherApp:
             stroke_width=4,
         )
         
-        # Create alert banner
+        # Create alert banner; check_weather_alerts sets its text and colors
+        self.alert_icon = ft.Icon(ft.Icons.WARNING, color=ft.Colors.AMBER, size=32)
+        self.alert_title = ft.Text("Alert", weight=ft.FontWeight.BOLD, size=16)
+        self.alert_message = ft.Text("Alert message", size=12, color=ft.Colors.BLACK)
         self.alert_banner = ft.Container(
             visible=False,
             bgcolor=ft.Colors.AMBER_100,
@@ -238,11 +572,11 @@ class WeatherApp:
             ),
             content=ft.Row(
                 [
-                    ft.Icon(ft.Icons.WARNING, color=ft.Colors.AMBER, size=32),
+                    self.alert_icon,
                     ft.Column(
                         [
-                            ft.Text("Alert", weight=ft.FontWeight.BOLD, size=16),
-                            ft.Text("Alert message", size=12),
+                            self.alert_title,
+                            self.alert_message,
                         ],
                         expand=True,
                     ),
@@ -270,6 +604,7 @@ class WeatherApp:
                     ft.Divider(height=10, color=ft.Colors.TRANSPARENT),
                     self.loading,
                     self.error_message,
+                    self.offline_banner,
                     # Current weather
                     self.weather_container,
                     # Forecast section
@@ -284,63 +619,115 @@ class WeatherApp:
         )
     
     def update_history_dropdown(self):
-        """Update the history dropdown options."""
+        """Show the best ranked history cities and keep them warm."""
         self.history_dropdown.options = [
-            ft.dropdown.Option(city) for city in self.search_history
+            ft.dropdown.Option(city)
+            for city in self.settings.history(Config.HISTORY_DROPDOWN_SIZE)
         ]
         self.history_dropdown.value = None  # Clear selection
-        self.page.update()
+        self.prefetcher.set_cities(self.settings.history(Config.HISTORY_PREFETCH_SIZE))
+        self.ui.request()
     
     def load_from_history(self, e):
         """Load a city from history dropdown."""
+        self.prefetcher.touch()
         if e.control.value:
             self.city_input.value = e.control.value
-            self.page.run_task(self.get_weather)
+            self.page.run_task(self.search_scheduler.submit, e.control.value)
             # Clear dropdown selection after loading
             e.control.value = None
-            self.page.update()
+            self.ui.request()
+    
+    def on_city_change(self, e):
+        """Suggest cities matching what has been typed so far."""
+        self.prefetcher.touch()
+        if not self.autocomplete_ready:
+            return
+        text = (self.city_input.value or "").strip()
+        suggestions = []
+        if len(text) >= Config.AUTOCOMPLETE_MIN_CHARS:
+            # Cities from the search history first, then the most populous
+            suggestions = self.city_index.suggest(
+                text, Config.AUTOCOMPLETE_LIMIT, preferred=self.settings.history()
+            )
+        for tile, city in zip(self.suggestion_tiles, suggestions):
+            tile.title.value = city.label
+            tile.data = city
+            tile.visible = True
+        for tile in self.suggestion_tiles[len(suggestions):]:
+            tile.visible = False
+        self.suggestion_list.visible = bool(suggestions)
+        self.ui.request()
+    
+    def on_pick_suggestion(self, e):
+        """Search for the suggested city that was clicked."""
+        self.prefetcher.touch()
+        city = e.control.data
+        self.city_input.value = city.query
+        self.hide_suggestions()
+        self.page.run_task(self.search_suggestion, city)
+    
+    async def search_suggestion(self, city: CitySuggestion):
+        """Search a suggested city by its coordinates from the city list."""
+        await self.weather_service.remember_location(city.query, city.lat, city.lon)
+        await self.search_scheduler.submit(city.query)
+    
+    def hide_suggestions(self):
+        """Close the suggestion list."""
+        if self.suggestion_list.visible:
+            self.suggestion_list.visible = False
+            self.ui.request()
     
     def on_search(self, e):
         """Handle search button click or enter key press."""
-        self.page.run_task(self.get_weather)
+        self.prefetcher.touch()
+        self.hide_suggestions()
+        self.page.run_task(self.search_scheduler.submit, self.city_input.value or "")
     
     def toggle_theme(self, e):
         """Toggle between light and dark theme."""
+        self.prefetcher.touch()
         if self.page.theme_mode == ft.ThemeMode.LIGHT:
             self.page.theme_mode = ft.ThemeMode.DARK
             self.theme_button.icon = ft.Icons.LIGHT_MODE
         else:
             self.page.theme_mode = ft.ThemeMode.LIGHT
             self.theme_button.icon = ft.Icons.DARK_MODE
-        self.page.update()
+        self.ui.request()
     
     def toggle_temp_unit(self, e):
         """Toggle between Celsius and Fahrenheit."""
+        self.prefetcher.touch()
         if self.temp_unit == "C":
             self.temp_unit = "F"
         else:
             self.temp_unit = "C"
         
-        # Save preference
-        self.save_temp_preference()
+        # Save preference; handlers may run on a worker thread, the store
+        # lives on the event loop
+        self.page.loop.call_soon_threadsafe(self.settings.set_unit, self.temp_unit)
         
         # Update button tooltip
         self.temp_unit_button.tooltip = f"Temperature: {self.temp_unit}°"
         
-        # Redisplay weather if data exists
-        if self.current_weather_data:
-            self.page.run_task(self.redisplay_weather)
-        
-        self.page.update()
+        # Data is kept in Celsius, so a unit switch is a local re-render of
+        # everything on screen in one update, never a network call
+        self.render_units()
+        self.ui.request()
     
-    async def redisplay_weather(self):
-        """Redisplay current weather with new temperature unit."""
+    def render_units(self):
+        """Re-render current weather, alerts and forecast in the selected unit."""
         if self.current_weather_data:
-            await self.display_weather(self.current_weather_data)
+            self.render_weather(self.current_weather_data)
+            # Only the text of a banner on screen changes; a dismissed one stays hidden
+            if self.alert_banner.visible:
+                self.check_weather_alerts(self.current_weather_data)
+        if self.current_forecast_days:
+            self.render_forecast()
     
-    async def get_weather(self):
+    async def get_weather(self, city: str):
         """Fetch and display weather data with comprehensive error handling."""
-        city = self.city_input.value.strip()
+        city = city.strip()
         
         # Validate input - empty city name
         if not city:
@@ -358,26 +745,68 @@ class WeatherApp:
         self.weather_container.visible = False
         self.forecast_container.visible = False
         self.forecast_header.visible = False
-        self.page.update()
+        # Last-known data and its reconnect watcher belong to the previous search
+        self.leave_offline_mode()
+        # The spinner must show at once, not with the result
+        self.ui.flush()
         
         try:
-            # Fetch current weather and forecast data from service
-            weather_data = await self.weather_service.get_weather(city)
-            forecast_data = await self.weather_service.get_forecast(city)
+            # Request current weather and forecast at the same time.
+            # Stale cached data is returned at once; fresh data arrives via the callbacks
+            weather_task = asyncio.create_task(
+                self.weather_service.get_weather(
+                    city,
+                    on_refresh=functools.partial(self.on_weather_refreshed, city),
+                    max_wait=Config.SEARCH_MAX_WAIT,
+                )
+            )
+            forecast_task = asyncio.create_task(
+                self.weather_service.get_forecast(
+                    city,
+                    on_refresh=functools.partial(self.on_forecast_refreshed, city),
+                    max_wait=Config.SEARCH_MAX_WAIT,
+                )
+            )
+            
+            try:
+                weather_data = await weather_task
+            except BaseException:
+                # No current weather means nothing to show the forecast under.
+                # This also covers a newer search cancelling this one.
+                weather_task.cancel()
+                forecast_task.cancel()
+                raise
             
             # Add successful search to history
             self.add_to_history(city)
+            self.current_city = city
+            self.current_forecast_days = None
+            self.leave_offline_mode()
             
-            # Display the weather data (with animation)
+            # Display the current weather as soon as it lands (with animation)
+            self.loading.visible = False
             await self.display_weather(weather_data)
             
-            # Display the forecast
-            self.display_forecast(forecast_data)
+            # Fill in the forecast when it arrives; current weather stays if it fails
+            try:
+                forecast_data = await forecast_task
+            except asyncio.CancelledError:
+                forecast_task.cancel()
+                raise
+            except Exception as e:
+                print(f"Forecast unavailable for {city}: {e}")
+            else:
+                self.display_forecast(forecast_data)
+                self.forecast_header.visible = True
             
-            # Show forecast header
-            self.forecast_header.visible = True
             self.error_message.visible = False
-            self.page.update()
+            self.ui.request()
+            
+        except ServiceUnavailableError as e:
+            # Offline or the API is down: fall back to the last known data
+            if not await self.show_last_known(city):
+                self.leave_offline_mode()
+                self.show_error(str(e))
             
         except Exception as e:
             # Catch and display any errors (WeatherServiceError or unexpected)
@@ -386,10 +815,108 @@ class WeatherApp:
         finally:
             # Always hide loading indicator, regardless of success or failure
             self.loading.visible = False
-            self.page.update()
+            self.ui.request()
+    
+    async def show_last_known(self, city: str) -> bool:
+        """
+        Show the last successful result for a city, marked with its age,
+        and start watching for the API to come back.
+        
+        Returns:
+            False if the city was never fetched successfully
+        """
+        weather = await self.weather_service.get_last_known(city, "weather")
+        if weather is None:
+            return False
+        forecast = await self.weather_service.get_last_known(city, "forecast")
+        
+        self.current_city = city
+        self.current_forecast_days = None
+        self.offline_snapshot = weather
+        self.render_offline_banner()
+        self.offline_banner.visible = True
+        self.loading.visible = False
+        await self.display_weather(weather.model)
+        if forecast is not None:
+            self.display_forecast(forecast.model)
+            self.forecast_header.visible = True
+        
+        self.reconnect.start()
+        return True
+    
+    def render_offline_banner(self):
+        """Update the offline notice with the age of the data on screen."""
+        if self.offline_snapshot is None:
+            return
+        as_of = self.offline_snapshot.as_of
+        age = time.time() - as_of
+        stamp = datetime.fromtimestamp(as_of).strftime("%H:%M" if age < 86400 else "%b %d, %H:%M")
+        self.offline_text.value = (
+            f"Offline · showing data as of {stamp} ({self.format_age(age)}). "
+            "It will refresh when the connection is back."
+        )
+    
+    def leave_offline_mode(self):
+        """Hide the offline notice and stop watching for the connection."""
+        self.offline_snapshot = None
+        self.offline_banner.visible = False
+        self.reconnect.cancel()
+    
+    async def refresh_offline(self):
+        """
+        Replace last-known data with live data. Raises ServiceUnavailableError
+        while the API is still unreachable, so the watcher tries again later.
+        """
+        city = self.current_city
+        if city is None or self.offline_snapshot is None:
+            return
+        try:
+            weather = await self.weather_service.get_weather(
+                city, priority=Priority.BACKGROUND, max_wait=Config.SEARCH_MAX_WAIT
+            )
+        except (ServiceUnavailableError, RateLimitedError):
+            # Still offline; keep the age on the notice current
+            self.render_offline_banner()
+            self.ui.request()
+            raise
+        if not self.is_current_city(city):
+            return
+        
+        # Cancelling the watcher here would cancel this very task
+        self.offline_snapshot = None
+        self.offline_banner.visible = False
+        await self.display_weather(weather)
+        try:
+            forecast = await self.weather_service.get_forecast(
+                city, priority=Priority.BACKGROUND, max_wait=Config.SEARCH_MAX_WAIT
+            )
+        except WeatherServiceError as e:
+            print(f"Forecast unavailable for {city}: {e}")
+        else:
+            self.display_forecast(forecast)
+            self.forecast_header.visible = True
+            self.ui.request()
+    
+    def is_current_city(self, city: str) -> bool:
+        """Check whether the given city is the one currently displayed."""
+        return self.current_city is not None and normalize_city(self.current_city) == normalize_city(city)
+    
+    async def on_weather_refreshed(self, city: str, weather: CurrentWeather):
+        """Replace stale current weather once the background refresh lands."""
+        if self.is_current_city(city):
+            await self.display_weather(weather)
+    
+    async def on_forecast_refreshed(self, city: str, forecast: Forecast):
+        """Replace a stale forecast once the background refresh lands."""
+        if self.is_current_city(city):
+            self.display_forecast(forecast)
+            self.ui.request()
     
-    def check_weather_alerts(self, temp_celsius: float, wind_speed: float, humidity: float, temp_unit: str):
-        """Check for extreme weather conditions and display alerts."""
+    def check_weather_alerts(self, weather: CurrentWeather):
+        """Check for extreme weather conditions and update the alert banner."""
+        temp_celsius = weather.temp
+        wind_speed = weather.wind_speed
+        humidity = weather.humidity
         alert_triggered = False
         alert_title = ""
         alert_msg = ""
@@ -401,11 +928,7 @@ class WeatherApp:
         if temp_celsius > 35:
             alert_triggered = True
             alert_title = "⚠️ High Temperature Alert!"
-            if temp_unit == "F":
-                display_temp = self.celsius_to_fahrenheit(temp_celsius)
-                alert_msg = f"Temperature exceeds 95°F ({display_temp:.1f}°F)"
-            else:
-                alert_msg = f"Temperature exceeds 35°C ({temp_celsius:.1f}°C)"
+            alert_msg = f"Temperature exceeds {self.format_temp(35, 0)} ({self.format_temp(temp_celsius)})"
             alert_color = ft.Colors.ORANGE
             bg_color = ft.Colors.ORANGE_100
             border_color = ft.Colors.ORANGE
@@ -437,113 +960,101 @@ class WeatherApp:
             bg_color = ft.Colors.BLUE_100
             border_color = ft.Colors.BLUE
         
-        # Update banner
+        # Update banner in place
         if alert_triggered:
             self.alert_banner.bgcolor = bg_color
             self.alert_banner.border = ft.border.all(2, border_color)
-            self.alert_banner.content = ft.Row(
-                [
-                    ft.Icon(ft.Icons.WARNING, color=alert_color, size=32),
-                    ft.Column(
-                        [
-                            ft.Text(alert_title, weight=ft.FontWeight.BOLD, size=16, color=alert_color),
-                            ft.Text(alert_msg, size=12, color=ft.Colors.BLACK),
-                        ],
-                        expand=True,
-                    ),
-                    ft.IconButton(
-                        ft.Icons.CLOSE,
-                        on_click=self.dismiss_alert_banner,
-                    ),
-                ],
-                spacing=10,
-            )
+            self.alert_icon.color = alert_color
+            self.alert_title.value = alert_title
+            self.alert_title.color = alert_color
+            self.alert_message.value = alert_msg
             self.alert_banner.visible = True
         else:
             self.alert_banner.visible = False
-        
-        self.page.update()
     
     def dismiss_banner(self, e):
         """Dismiss the alert banner."""
         self.page.banner.open = False
-        self.page.update()
+        self.ui.request()
     
     def dismiss_alert_banner(self, e):
         """Dismiss the alert container."""
         self.alert_banner.visible = False
-        self.page.update()
+        self.ui.request()
     
-    async def display_weather(self, data: dict):
+    async def display_weather(self, weather: CurrentWeather):
 
         """Display weather information with animation."""
         # Store current weather data for unit conversion
-        self.current_weather_data = data
-        
-        # Extract data
-        city_name = data.get("name", "Unknown")
-        country = data.get("sys", {}).get("country", "")
-        temp_celsius = data.get("main", {}).get("temp", 0)
-        feels_like_celsius = data.get("main", {}).get("feels_like", 0)
-        humidity = data.get("main", {}).get("humidity", 0)
-        description = data.get("weather", [{}])[0].get("description", "").title()
-        icon_code = data.get("weather", [{}])[0].get("icon", "01d")
-        wind_speed = data.get("wind", {}).get("speed", 0)
-        
-        # Convert temperatures if Fahrenheit is selected
-        if self.temp_unit == "F":
-            temp = self.celsius_to_fahrenheit(temp_celsius)
-            feels_like = self.celsius_to_fahrenheit(feels_like_celsius)
-            temp_unit_display = "°F"
-        else:
-            temp = temp_celsius
-            feels_like = feels_like_celsius
-            temp_unit_display = "°C"
+        self.current_weather_data = weather
+        # Alerts are checked on new data only (always in Celsius)
+        self.check_weather_alerts(weather)
+        self.render_weather(weather)
+        
+        # Setup animation - start with opacity 0
+        self.weather_container.animate_opacity = 300  # 300ms animation duration
+        self.weather_container.opacity = 0
+        self.weather_container.visible = True
+        self.error_message.visible = False
+        self.ui.flush()
         
-        # Check for extreme weather conditions and display alerts (always use Celsius for thresholds)
-        self.check_weather_alerts(temp_celsius, wind_speed, humidity, self.temp_unit)
+        # Small delay to ensure container is rendered before animation
+        await asyncio.sleep(0.05)
+        
+        # Fade in animation
+        self.weather_container.opacity = 1
+        self.ui.request()
+    
+    def build_weather_card(self):
+        """Create the current weather card once; render_weather fills it in."""
+        self.weather_location = ft.Text(
+            "",
+            size=24,
+            weight=ft.FontWeight.BOLD,
+            color=ft.Colors.BLUE_900,
+        )
+        self.weather_icon = ft.Image(
+            src=self.icon_store.src("01d", "@2x"),
+            width=80,
+            height=80,
+        )
+        self.weather_description = ft.Text(
+            "",
+            size=16,
+            weight=ft.FontWeight.W_600,
+            color=ft.Colors.BLUE_700,
+        )
+        self.weather_temp = ft.Text(
+            "",
+            size=32,
+            weight=ft.FontWeight.BOLD,
+            color=ft.Colors.BLUE_900,
+        )
+        self.weather_feels_like = ft.Text(
+            "",
+            size=12,
+            color=ft.Colors.BLUE_600,
+            weight=ft.FontWeight.W_500,
+        )
+        humidity_card, self.humidity_value = self.create_info_card(ft.Icons.WATER_DROP, "Humidity")
+        wind_card, self.wind_value = self.create_info_card(ft.Icons.AIR, "Wind")
         
-        # Build weather display with enhanced styling
         self.weather_container.content = ft.Column(
             [
                 # Location header with enhanced styling
-                ft.Text(
-                    f"{city_name}, {country}",
-                    size=24,
-                    weight=ft.FontWeight.BOLD,
-                    color=ft.Colors.BLUE_900,
-                ),
+                self.weather_location,
                 
                 ft.Divider(height=6, color=ft.Colors.LIGHT_BLUE_200),
                 
                 # Weather icon and description in a row
                 ft.Row(
                     [
-                        ft.Image(
-                            src=f"https://openweathermap.org/img/wn/{icon_code}@2x.png",
-                            width=80,
-                            height=80,
-                        ),
+                        self.weather_icon,
                         ft.Column(
                             [
-                                ft.Text(
-                                    description,
-                                    size=16,
-                                    weight=ft.FontWeight.W_600,
-                                    color=ft.Colors.BLUE_700,
-                                ),
-                                ft.Text(
-                                    f"{temp:.1f}{temp_unit_display}",
-                                    size=32,
-                                    weight=ft.FontWeight.BOLD,
-                                    color=ft.Colors.BLUE_900,
-                                ),
-                                ft.Text(
-                                    f"Feels like {feels_like:.1f}{temp_unit_display}",
-                                    size=12,
-                                    color=ft.Colors.BLUE_600,
-                                    weight=ft.FontWeight.W_500,
-                                ),
+                                self.weather_description,
+                                self.weather_temp,
+                                self.weather_feels_like,
                             ],
                             spacing=2,
                         ),
@@ -556,18 +1067,7 @@ class WeatherApp:
                 
                 # Additional info cards in a more compact grid
                 ft.Row(
-                    [
-                        self.create_info_card(
-                            ft.Icons.WATER_DROP,
-                            "Humidity",
-                            f"{humidity}%"
-                        ),
-                        self.create_info_card(
-                            ft.Icons.AIR,
-                            "Wind",
-                            f"{wind_speed} m/s"
-                        ),
-                    ],
+                    [humidity_card, wind_card],
                     alignment=ft.MainAxisAlignment.SPACE_AROUND,
                     spacing=8,
                 ),
@@ -575,62 +1075,30 @@ class WeatherApp:
             horizontal_alignment=ft.CrossAxisAlignment.START,
             spacing=4,
         )
-        
-        # Setup animation - start with opacity 0
-        self.weather_container.animate_opacity = 300  # 300ms animation duration
-        self.weather_container.opacity = 0
-        self.weather_container.visible = True
-        self.error_message.visible = False
-        self.page.update()
-        
-        # Small delay to ensure container is rendered before animation
-        import asyncio
-        await asyncio.sleep(0.05)
-        
-        # Fade in animation
-        self.weather_container.opacity = 1
-        self.page.update()
     
-    def display_forecast(self, data: dict):
+    def render_weather(self, weather: CurrentWeather):
+        """Fill the current weather card (without updating the page)."""
+        # Only the changed values travel to the client on the next update
+        self.weather_location.value = f"{weather.city}, {weather.country}"
+        self.weather_icon.src = self.icon_store.src(weather.icon, "@2x")
+        self.weather_description.value = weather.description.title()
+        self.weather_temp.value = self.format_temp(weather.temp)
+        self.weather_feels_like.value = f"Feels like {self.format_temp(weather.feels_like)}"
+        self.humidity_value.value = f"{weather.humidity}%"
+        self.wind_value.value = f"{weather.wind_speed} m/s"
+    
+    def display_forecast(self, forecast: Forecast):
         """Display 5-day weather forecast."""
         try:
-            from datetime import datetime
-            
-            # Extract forecast data
-            forecast_list = data.get("list", [])
-            
-            if not forecast_list:
-                print("No forecast data available")
-                return
-            
-            # Group forecasts by day (take one entry per day at noon)
-            daily_forecasts = {}
-            for item in forecast_list:
-                dt = datetime.fromtimestamp(item["dt"])
-                day = dt.date()
-                
-                # Take the entry closest to noon
-                hour = dt.hour
-                if day not in daily_forecasts or abs(hour - 12) < abs(datetime.fromtimestamp(daily_forecasts[day]["dt"]).hour - 12):
-                    daily_forecasts[day] = item
-            
-            # Get the next 5 days
-            forecast_days = sorted(list(daily_forecasts.items()))[:5]
+            # Per-day summaries, split at the city's midnight
+            forecast_days = aggregate_daily(forecast, days=5)
             
             if not forecast_days:
-                print("No forecast days found")
+                print("No forecast data available")
                 return
             
-            # Create forecast cards
-            forecast_row = ft.Column(
-                [
-                    self.create_forecast_card(day, forecast_data)
-                    for day, forecast_data in forecast_days
-                ],
-                spacing=6,
-            )
-            
-            self.forecast_container.content = forecast_row
+            self.current_forecast_days = forecast_days
+            self.render_forecast()
             self.forecast_container.visible = True
             print(f"Forecast displayed with {len(forecast_days)} days")
             
@@ -639,49 +1107,35 @@ class WeatherApp:
             import traceback
             traceback.print_exc()
     
-    def create_forecast_card(self, day, forecast_data):
-        """Create a forecast card for a specific day."""
-        from datetime import datetime
-        
-        # Extract data
-        temp_min = forecast_data.get("main", {}).get("temp_min", 0)
-        temp_max = forecast_data.get("main", {}).get("temp_max", 0)
-        description = forecast_data.get("weather", [{}])[0].get("description", "").title()
-        icon_code = forecast_data.get("weather", [{}])[0].get("icon", "01d")
-        humidity = forecast_data.get("main", {}).get("humidity", 0)
-        
-        # Convert temperatures if Fahrenheit is selected
-        if self.temp_unit == "F":
-            temp_min = self.celsius_to_fahrenheit(temp_min)
-            temp_max = self.celsius_to_fahrenheit(temp_max)
-            temp_unit = "°F"
-        else:
-            temp_unit = "°C"
-        
-        # Format day name
-        day_name = day.strftime("%a, %b %d")
+    def render_forecast(self):
+        """Fill the forecast cards with the stored daily summaries."""
+        days = self.current_forecast_days
+        for index, card in enumerate(self.forecast_cards):
+            if index < len(days):
+                self.fill_forecast_card(card, days[index])
+                card.container.visible = True
+            else:
+                card.container.visible = False
+    
+    def create_forecast_card(self) -> ForecastCardControls:
+        """Create the controls of one forecast card; fill_forecast_card sets their values."""
+        day = ft.Text("", size=12, weight=ft.FontWeight.BOLD, color=ft.Colors.BLUE_900)
+        description = ft.Text("", size=10, color=ft.Colors.BLUE_600)
+        icon = ft.Image(src=self.icon_store.src("01d"), width=50, height=50)
+        temp_max = ft.Text("", size=12, weight=ft.FontWeight.BOLD, color=ft.Colors.BLUE_900)
+        temp_min = ft.Text("", size=10, color=ft.Colors.BLUE_600)
         
-        return ft.Container(
+        container = ft.Container(
             content=ft.Row(
                 [
                     ft.Column(
-                        [
-                            ft.Text(day_name, size=12, weight=ft.FontWeight.BOLD, color=ft.Colors.BLUE_900),
-                            ft.Text(description, size=10, color=ft.Colors.BLUE_600),
-                        ],
+                        [day, description],
                         spacing=2,
                         expand=True,
                     ),
-                    ft.Image(
-                        src=f"https://openweathermap.org/img/wn/{icon_code}.png",
-                        width=50,
-                        height=50,
-                    ),
+                    icon,
                     ft.Column(
-                        [
-                            ft.Text(f"{temp_max:.0f}{temp_unit}", size=12, weight=ft.FontWeight.BOLD, color=ft.Colors.BLUE_900),
-                            ft.Text(f"{temp_min:.0f}{temp_unit}", size=10, color=ft.Colors.BLUE_600),
-                        ],
+                        [temp_max, temp_min],
                         spacing=1,
                         horizontal_alignment=ft.CrossAxisAlignment.END,
                     ),
@@ -698,21 +1152,38 @@ class WeatherApp:
                 blur_radius=4,
                 color=ft.Colors.LIGHT_BLUE_100,
             ),
+            visible=False,
         )
+        return ForecastCardControls(container, day, description, icon, temp_max, temp_min)
+    
+    def fill_forecast_card(self, card: ForecastCardControls, day: DailyForecast):
+        """Show one day's summary on a forecast card."""
+        description = day.description.title()
+        
+        # Show the chance of precipitation when there is one
+        if day.pop >= 0.1:
+            description = f"{description} · {day.pop:.0%} rain"
+        
+        card.day.value = day.date.strftime("%a, %b %d")
+        card.description.value = description
+        card.icon.src = self.icon_store.src(day.icon)
+        card.temp_max.value = self.format_temp(day.temp_max, 0)
+        card.temp_min.value = self.format_temp(day.temp_min, 0)
     
-    def create_info_card(self, icon, label, value):
-        """Create an enhanced info card for weather details."""
-        return ft.Container(
+    def create_info_card(self, icon, label):
+        """Create an enhanced info card for weather details; returns it and its value text."""
+        value = ft.Text(
+            "",
+            size=18,
+            weight=ft.FontWeight.BOLD,
+            color=ft.Colors.BLUE_900,
+        )
+        card = ft.Container(
             content=ft.Column(
                 [
                     ft.Icon(icon, size=32, color=ft.Colors.BLUE_700),
                     ft.Text(label, size=11, color=ft.Colors.BLUE_600, weight=ft.FontWeight.W_600),
-                    ft.Text(
-                        value,
-                        size=18,
-                        weight=ft.FontWeight.BOLD,
-                        color=ft.Colors.BLUE_900,
-                    ),
+                    value,
                 ],
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
                 spacing=6,
@@ -728,6 +1199,7 @@ class WeatherApp:
             ),
             border=ft.border.all(1, ft.Colors.LIGHT_BLUE_200),
         )
+        return card, value
     
     def show_error(self, message: str):
         """
@@ -743,11 +1215,12 @@ class WeatherApp:
         self.error_message.value = f"❌ {message}"
         self.error_message.visible = True
         
-        # Hide weather container to show error prominently
+        # Hide weather container and spinner to show error prominently
         self.weather_container.visible = False
+        self.loading.visible = False
         
         # Update page to display error immediately
-        self.page.update()
+        self.ui.flush()
 
 
 def main(page: ft.Page):
@@ -756,4 +1229,4 @@ def main(page: ft.Page):
 
 
 if __name__ == "__main__":
-    ft.app(target=main)
\ No newline at end of file
+    ft.app(target=main, assets_dir=Config.ASSETS_DIR)
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""Compact, immutable weather models parsed from OpenWeatherMap responses."""
+
+import sys
+from typing import Any, Dict, Iterator, List, NamedTuple, Tuple, Union
+
+import numpy as np
+
+
+class CurrentWeather(NamedTuple):
+    """The fields of a /weather response that the app uses."""
+
+    city: str
+    country: str
+    temp: float
+    feels_like: float
+    humidity: float
+    wind_speed: float
+    description: str
+    icon: str
+    condition_id: int
+    lat: float
+    lon: float
+    timezone: int  # seconds east of UTC
+    dt: int  # observation time, unix seconds
+
+    @classmethod
+    def from_response(cls, data: Dict) -> "CurrentWeather":
+        """Parse a decoded /weather response; missing fields get defaults."""
+        main = data.get("main", {})
+        weather = (data.get("weather") or [{}])[0]
+        coord = data.get("coord", {})
+        return cls(
+            city=data.get("name", "Unknown"),
+            country=data.get("sys", {}).get("country", ""),
+            temp=main.get("temp", 0),
+            feels_like=main.get("feels_like", 0),
+            humidity=main.get("humidity", 0),
+            wind_speed=data.get("wind", {}).get("speed", 0),
+            description=weather.get("description", ""),
+            icon=weather.get("icon", "01d"),
+            condition_id=weather.get("id", 0),
+            lat=coord.get("lat", 0.0),
+            lon=coord.get("lon", 0.0),
+            timezone=data.get("timezone", 0) or 0,
+            dt=data.get("dt", 0),
+        )
+
+
+class ForecastSlot(NamedTuple):
+    """One 3-hour step of a forecast."""
+
+    dt: int
+    temp: float
+    temp_min: float
+    temp_max: float
+    humidity: float
+    pop: float  # probability of precipitation, 0..1
+    condition_id: int
+    description: str
+    icon: str
+
+
+class Forecast:
+    """
+    A /forecast response, with the 3-hour slots stored column by column.
+
+    Numeric fields are read-only NumPy arrays and text fields are tuples,
+    so one forecast costs a few small buffers instead of 40 nested dicts.
+    Indexing or iterating yields ForecastSlot tuples.
+    """
+
+    __slots__ = (
+        "city",
+        "country",
+        "timezone",
+        "lat",
+        "lon",
+        "dt",
+        "temp",
+        "temp_min",
+        "temp_max",
+        "humidity",
+        "pop",
+        "condition_id",
+        "description",
+        "icon",
+    )
+
+    def __init__(
+        self,
+        city: str,
+        country: str,
+        timezone: int,
+        lat: float,
+        lon: float,
+        dt: np.ndarray,
+        temp: np.ndarray,
+        temp_min: np.ndarray,
+        temp_max: np.ndarray,
+        humidity: np.ndarray,
+        pop: np.ndarray,
+        condition_id: np.ndarray,
+        description: Tuple[str, ...],
+        icon: Tuple[str, ...],
+    ):
+        values = locals()
+        for name in self.__slots__:
+            value = values[name]
+            if isinstance(value, np.ndarray):
+                value.flags.writeable = False
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    @classmethod
+    def from_response(cls, data: Dict) -> "Forecast":
+        """Parse a decoded /forecast response in one pass over its slots."""
+        rows = []
+        description = []
+        icon = []
+        for item in data.get("list") or []:
+            main = item.get("main", {})
+            weather = (item.get("weather") or [{}])[0]
+            rows.append((
+                item["dt"],
+                main.get("temp", 0),
+                main.get("temp_min", 0),
+                main.get("temp_max", 0),
+                main.get("humidity", 0),
+                item.get("pop", 0),
+                weather.get("id", 0),
+            ))
+            description.append(weather.get("description", ""))
+            icon.append(weather.get("icon", "01d"))
+
+        city = data.get("city") or {}
+        coord = city.get("coord", {})
+        return cls.from_rows(
+            rows,
+            description,
+            icon,
+            city=city.get("name", "Unknown"),
+            country=city.get("country", ""),
+            timezone=city.get("timezone", 0) or 0,
+            lat=coord.get("lat", 0.0),
+            lon=coord.get("lon", 0.0),
+        )
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: List[Tuple[float, ...]],
+        description: List[str],
+        icon: List[str],
+        **location: Any,
+    ) -> "Forecast":
+        """
+        Build a forecast from per-slot rows.
+
+        Args:
+            rows: (dt, temp, temp_min, temp_max, humidity, pop, condition_id)
+                for each slot
+            description: Condition description for each slot
+            icon: Icon code for each slot
+            **location: city, country, timezone, lat and lon
+        """
+        # One contiguous array per field; the row table is dropped afterwards
+        table = np.array(rows, dtype=np.float64).reshape(len(rows), 7).T
+        return cls(
+            dt=table[0].astype(np.int64),
+            temp=np.ascontiguousarray(table[1]),
+            temp_min=np.ascontiguousarray(table[2]),
+            temp_max=np.ascontiguousarray(table[3]),
+            humidity=np.ascontiguousarray(table[4]),
+            pop=np.ascontiguousarray(table[5]),
+            condition_id=table[6].astype(np.int64),
+            # Interned, so every forecast shares one copy of "light rain"
+            description=tuple(sys.intern(text) for text in description),
+            icon=tuple(sys.intern(code) for code in icon),
+            **location,
+        )
+
+    def __len__(self) -> int:
+        return len(self.dt)
+
+    def __getitem__(self, index: int) -> ForecastSlot:
+        return ForecastSlot(
+            int(self.dt[index]),
+            float(self.temp[index]),
+            float(self.temp_min[index]),
+            float(self.temp_max[index]),
+            float(self.humidity[index]),
+            float(self.pop[index]),
+            int(self.condition_id[index]),
+            self.description[index],
+            self.icon[index],
+        )
+
+    def __iter__(self) -> Iterator[ForecastSlot]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def __repr__(self) -> str:
+        return f"Forecast({self.city!r}, {len(self)} slots)"
+
+
+def approximate_size(model: Union[CurrentWeather, Forecast]) -> int:
+    """Rough memory footprint of a model in bytes, for cache budgets."""
+    if isinstance(model, Forecast):
+        arrays = (model.dt, model.temp, model.temp_min, model.temp_max,
+                  model.humidity, model.pop, model.condition_id)
+        # Each array owns its buffer, so getsizeof includes the data;
+        # the description and icon strings are interned and shared
+        return (
+            sys.getsizeof(model)
+            + sum(sys.getsizeof(a) for a in arrays)
+            + sys.getsizeof(model.description) + sys.getsizeof(model.icon)
+        )
+    return sys.getsizeof(model) + sum(sys.getsizeof(v) for v in model)
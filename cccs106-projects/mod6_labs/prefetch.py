@@ -0,0 +1,190 @@
+"""Background refresh of the cities a user keeps coming back to."""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# refresh(city) -> number of upstream requests it made; an error it raises
+# may carry that number as `requests`
+RefreshFunction = Callable[[str], Awaitable[int]]
+
+
+class PrefetchScheduler:
+    """
+    Keeps the weather for a list of cities warm in the cache, so picking
+    one of them renders without waiting on the network.
+
+    Every city has its own due time. After a refresh the next one is
+    `interval` seconds away, give or take `jitter` (a fraction), so the
+    cities drift apart instead of refreshing in lockstep. The scheduler
+    pauses while any pause reason is set (e.g. the window is hidden) and
+    after `idle_after` seconds without touch(). It never spends more than
+    `budget_per_minute` upstream requests in any 60 second window.
+    """
+
+    def __init__(
+        self,
+        refresh: RefreshFunction,
+        interval: float,
+        jitter: float = 0.2,
+        budget_per_minute: int = 10,
+        cost_per_city: int = 2,
+        idle_after: Optional[float] = None,
+        startup_spread: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ):
+        """
+        Args:
+            refresh: Refreshes one city and returns the requests it made
+            interval: Average seconds between refreshes of a city
+            jitter: Random spread of the interval, as a fraction of it
+            budget_per_minute: Most upstream requests in any minute; below
+                cost_per_city nothing is ever refreshed
+            cost_per_city: Most requests one refresh can make; a refresh
+                only starts when that much budget is left
+            idle_after: Pause after this many seconds without touch()
+                (None never goes idle)
+            startup_spread: Newly added cities are spread over this many
+                seconds instead of all refreshing at once
+            clock: Monotonic time source
+            rng: Uniform [0, 1) random source
+        """
+        self._refresh = refresh
+        self.interval = interval
+        self.jitter = jitter
+        self.budget_per_minute = budget_per_minute
+        self.cost_per_city = cost_per_city
+        self.idle_after = idle_after
+        self.startup_spread = startup_spread
+        self.clock = clock
+        self.rng = rng
+        self._due: Dict[str, float] = {}
+        self._spent: Deque[Tuple[float, int]] = deque()  # (time, requests) in the last minute
+        self._paused: Set[str] = set()
+        self._last_touch = clock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Metrics
+        self.runs = 0
+        self.requests = 0
+        self.failures = 0
+
+    def set_cities(self, cities: Iterable[str]):
+        """Replace the watched cities; new ones are due shortly, removed ones dropped."""
+        now = self.clock()
+        wanted = list(dict.fromkeys(cities))
+        self._due = {
+            city: self._due.get(city, now + self.rng() * self.startup_spread)
+            for city in wanted
+        }
+        self._wake.set()
+
+    def schedule(self) -> List[Tuple[str, float]]:
+        """(city, seconds until its next refresh), soonest first."""
+        now = self.clock()
+        return sorted(
+            ((city, max(0.0, due - now)) for city, due in self._due.items()),
+            key=lambda item: item[1],
+        )
+
+    @property
+    def paused(self) -> bool:
+        return bool(self._paused) or self.idle
+
+    @property
+    def idle(self) -> bool:
+        return self.idle_after is not None and self.clock() - self._last_touch >= self.idle_after
+
+    def pause(self, reason: str):
+        """Stop refreshing until resume() is called with the same reason."""
+        self._paused.add(reason)
+
+    def resume(self, reason: str):
+        self._paused.discard(reason)
+        self._wake.set()
+
+    def touch(self):
+        """Record user activity; ends an idle pause."""
+        self._last_touch = self.clock()
+        self._wake.set()
+
+    def budget_left(self) -> int:
+        """Requests that may still be made in the current 60 second window."""
+        now = self.clock()
+        while self._spent and now - self._spent[0][0] >= 60:
+            self._spent.popleft()
+        return self.budget_per_minute - sum(count for _, count in self._spent)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the background loop, unless already running."""
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        """Stop the background loop; the schedule is kept."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            delay = self._next_delay()
+            if delay is None or delay > 0:
+                # Sleep until the next city is due, or until something changes
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_once()
+
+    def _next_delay(self) -> Optional[float]:
+        """Seconds to wait before the next refresh; None waits for a wake-up."""
+        if self._paused or not self._due or self.budget_per_minute < self.cost_per_city:
+            # Paused, nothing to do, or a budget too small for any refresh
+            return None
+        now = self.clock()
+        if self.idle:
+            return None
+        wait = min(self._due.values()) - now
+        if self.budget_left() < self.cost_per_city:
+            # Wait for the oldest spending to leave the window
+            wait = max(wait, self._spent[0][0] + 60 - now if self._spent else 0.0)
+        return max(0.0, wait)
+
+    async def run_once(self) -> Optional[str]:
+        """Refresh the city that is due soonest, if any is due; returns it."""
+        now = self.clock()
+        due = [(when, city) for city, when in self._due.items() if when <= now]
+        if not due or self.budget_left() < self.cost_per_city:
+            return None
+        _, city = min(due)
+
+        self.runs += 1
+        try:
+            spent = await self._refresh(city)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            # Without a count, charge a failed refresh as a full one
+            spent = getattr(e, "requests", self.cost_per_city)
+            logger.warning("Prefetch failed for %s: %s", city, e)
+        self.requests += spent
+        if spent:
+            self._spent.append((self.clock(), spent))
+
+        if city in self._due:
+            self._due[city] = self.clock() + self.interval * (1 + self.jitter * (2 * self.rng() - 1))
+        return city
@@ -0,0 +1,142 @@
+"""Client-side token-bucket rate limiter with priority lanes."""
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+
+class Priority:
+    """Request lanes; a lower value is served first."""
+
+    INTERACTIVE = 0  # a user is waiting on the result
+    BACKGROUND = 1  # refreshes, prefetching and batch jobs
+
+    ALL = (INTERACTIVE, BACKGROUND)
+
+
+class TokenBucket:
+    """
+    Async token bucket: `rate` requests per second with bursts of up to
+    `burst` requests.
+
+    Callers that find the bucket empty wait in a FIFO queue for their
+    priority lane. Interactive callers are always served before background
+    ones. A caller can pass max_wait to give up (acquire returns False)
+    instead of queueing indefinitely.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lanes: Dict[int, Deque[asyncio.Future]] = {p: deque() for p in Priority.ALL}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Metrics
+        self.granted = 0
+        self.rejected = 0
+        self._waits: Deque[float] = deque(maxlen=1000)
+
+    @classmethod
+    def per_minute(cls, calls: int, burst: int = 1) -> "TokenBucket":
+        """Bucket for a quota expressed in calls per minute."""
+        return cls(rate=calls / 60.0, burst=burst)
+
+    def queue_depth(self, priority: Optional[int] = None) -> int:
+        """Callers currently waiting (in one lane, or in all lanes)."""
+        lanes = [self._lanes[priority]] if priority is not None else self._lanes.values()
+        return sum(1 for lane in lanes for fut in lane if not fut.done())
+
+    def try_acquire(self) -> bool:
+        """Take one token if one is available right now and nobody is queued."""
+        self._refill()
+        if self._tokens >= 1 and not self.queue_depth():
+            self._tokens -= 1
+            self._record_wait(0.0)
+            return True
+        return False
+
+    async def acquire(self, priority: int = Priority.INTERACTIVE, max_wait: Optional[float] = None) -> bool:
+        """
+        Take one token, waiting for it if needed.
+
+        Args:
+            priority: Lane to wait in (Priority.INTERACTIVE or BACKGROUND)
+            max_wait: Seconds to wait at most; None waits as long as needed
+
+        Returns:
+            True once a token was taken, False if max_wait ran out first
+        """
+        self._refill()
+        if self._tokens >= 1 and not self.queue_depth():
+            self._tokens -= 1
+            self._record_wait(0.0)
+            return True
+
+        fut = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append(fut)
+        self._schedule()
+        start = self.clock()
+        try:
+            if max_wait is None:
+                await fut
+            else:
+                await asyncio.wait_for(fut, max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return False
+        self._record_wait(self.clock() - start)
+        return True
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _schedule(self):
+        # One timer at a time wakes the queue when the next token is due
+        if self._timer is None:
+            delay = max(0.0, (1 - self._tokens) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _dispatch(self):
+        self._timer = None
+        self._refill()
+        for priority in Priority.ALL:
+            lane = self._lanes[priority]
+            while lane and self._tokens >= 1:
+                fut = lane.popleft()
+                if fut.done():
+                    continue  # caller timed out or was cancelled
+                fut.set_result(None)
+                self._tokens -= 1
+        if self.queue_depth():
+            self._schedule()
+
+    def _record_wait(self, waited: float):
+        self.granted += 1
+        self._waits.append(waited)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Queue depth and wait-time metrics."""
+        waits: List[float] = sorted(self._waits)
+        return {
+            "queue_depth": self.queue_depth(),
+            "queue_interactive": self.queue_depth(Priority.INTERACTIVE),
+            "queue_background": self.queue_depth(Priority.BACKGROUND),
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "wait_mean_ms": round(statistics.mean(waits) * 1000, 2) if waits else 0.0,
+            "wait_p95_ms": round(waits[max(0, int(round(0.95 * len(waits))) - 1)] * 1000, 2) if waits else 0.0,
+            "wait_max_ms": round(waits[-1] * 1000, 2) if waits else 0.0,
+        }
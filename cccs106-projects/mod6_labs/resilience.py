@@ -0,0 +1,159 @@
+"""Retry with backoff and a circuit breaker for upstream API calls."""
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Iterable, Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header into seconds.
+
+    Accepts both forms allowed by HTTP: a number of seconds or a date.
+    Returns None when the header is missing or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before retrying an idempotent GET.
+
+    Delays grow exponentially from base_delay up to max_delay and use
+    "full jitter" (a random delay between zero and the cap), so clients
+    that failed together do not retry together. A Retry-After header from
+    the server replaces the computed delay; one longer than
+    max_retry_after means giving up instead of waiting.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.25,
+        max_delay: float = 4.0,
+        max_retry_after: float = 10.0,
+        retry_statuses: Iterable[int] = (429, 500, 502, 503, 504),
+        rng: Callable[[], float] = random.random,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.retry_statuses = frozenset(retry_statuses)
+        self.rng = rng
+
+    def should_retry(self, attempt: int, status: Optional[int] = None) -> bool:
+        """Whether to retry after the given attempt (status None means a network error)."""
+        if attempt >= self.max_attempts:
+            return False
+        return status is None or status in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Seconds to wait before the next attempt, or None to give up."""
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_retry_after else None
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return self.rng() * cap
+
+
+class RetryStats:
+    """Counters for requests sent through a retry policy."""
+
+    def __init__(self):
+        self.requests = 0  # calls to the service's send path
+        self.attempts = 0  # HTTP requests actually sent
+        self.retries = 0
+        self.gave_up = 0  # retryable failures returned after the last attempt
+        self.short_circuited = 0  # rejected by an open circuit breaker
+
+    def as_dict(self) -> Dict[str, int]:
+        return dict(vars(self))
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the upstream is unhealthy.
+
+    CLOSED: requests flow; consecutive failures are counted.
+    OPEN: after failure_threshold consecutive failures, requests are
+        rejected for reset_timeout seconds.
+    HALF_OPEN: after the timeout, up to half_open_max_calls probe requests
+        are let through. A successful probe closes the circuit; a failed
+        one opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes_in_flight = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        """Return True if a request may be sent now."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and self._probes_in_flight < self.half_open_max_calls:
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._probes_in_flight = 0
+        self._state = self.CLOSED
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def release_probe(self):
+        """Return a half-open probe slot whose request ended without a verdict."""
+        if self._probes_in_flight:
+            self._probes_in_flight -= 1
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = self.clock()
+        self._probes_in_flight = 0
+        self.times_opened += 1
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+        }
@@ -0,0 +1,261 @@
+"""Search history and preferences in one file, written atomically in the background."""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from weather_service import normalize_city
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_VERSION = 1
+DEFAULT_UNIT = "C"
+
+
+class HistoryEntry:
+    """One searched city with its decaying search score."""
+
+    __slots__ = ("city", "score", "last", "count")
+
+    def __init__(self, city: str, score: float, last: float, count: int):
+        self.city = city  # spelling from the most recent search
+        self.score = score  # searches, each decaying with the store's half-life
+        self.last = last  # unix time of the most recent search
+        self.count = count  # total searches
+
+    def rank(self, now: float, half_life: float) -> float:
+        """Score decayed to `now`: frequent and recent cities rank highest."""
+        return self.score * math.pow(0.5, max(0.0, now - self.last) / half_life)
+
+    def as_dict(self) -> Dict:
+        return {"city": self.city, "score": self.score, "last": self.last, "count": self.count}
+
+
+class SettingsStore:
+    """
+    The temperature unit and the ranked search history, kept in one JSON
+    file.
+
+    Nothing is read until load() is awaited, which runs the file read off
+    the event loop; the app starts with defaults and fills in the stored
+    values when they arrive. Changes made before that are kept and applied
+    on top of the file. Changes update memory at once and are written
+    `save_delay` seconds later, so a burst of changes costs one write. A
+    write goes to a temporary file that then replaces the settings file,
+    so a crash leaves either the old or the new settings, never half of
+    one.
+
+    History is ranked by frecency: every search adds 1 to a city's score
+    and scores halve every `half_life` seconds. Only the `max_history`
+    best ranked cities are kept.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_history: int = 50,
+        half_life: float = 7 * 24 * 3600,
+        save_delay: float = 0.5,
+        legacy_dir: Optional[Union[str, Path]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            path: Settings file
+            max_history: Most cities kept in the history
+            half_life: Seconds for a search to lose half its weight
+            save_delay: Seconds to wait for more changes before writing
+            legacy_dir: Directory with search_history.json and
+                temp_preference.json to import when there is no settings
+                file yet (the settings file's directory by default)
+            clock: Wall clock, unix seconds
+        """
+        self.path = Path(path)
+        self.max_history = max_history
+        self.half_life = half_life
+        self.save_delay = save_delay
+        self.legacy_dir = Path(legacy_dir) if legacy_dir is not None else self.path.parent
+        self.clock = clock
+        self.unit = DEFAULT_UNIT
+        self._history: Dict[str, HistoryEntry] = {}  # normalized city -> entry
+        self._pending: List[Tuple[str, float]] = []  # searches before load()
+        self._unit: Optional[str] = None  # unit chosen before load()
+        self._loading: Optional[asyncio.Task] = None
+        self._saving: Optional[asyncio.Task] = None
+        self._dirty = False
+        self._flush_now = asyncio.Event()
+        self.loaded = False
+        self.writes = 0
+
+    async def load(self):
+        """Read the settings file (once; later calls wait for the first)."""
+        if self._loading is None:
+            self._loading = asyncio.create_task(self._load())
+        await self._loading
+
+    async def _load(self):
+        data, migrated = await asyncio.to_thread(self._read)
+        if self._unit is None and data.get("unit") in ("C", "F"):
+            self.unit = data["unit"]
+        for item in data.get("history", []):
+            try:
+                entry = HistoryEntry(
+                    str(item["city"]), float(item["score"]), float(item["last"]), int(item["count"])
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+            self._history.setdefault(normalize_city(entry.city), entry)
+        self.loaded = True
+        # Searches made before the file was read count on top of it
+        pending, self._pending = self._pending, []
+        for city, when in pending:
+            self._record(city, when)
+        self._trim()
+        if migrated or pending or self._unit is not None:
+            self._schedule_save()
+
+    def _read(self):
+        """Return (settings dict, whether it came from the legacy files)."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                return data, False
+            logger.warning("Ignoring %s: not a settings object", self.path)
+        except FileNotFoundError:
+            return self._read_legacy()
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable %s: %s", self.path, e)
+        return {}, False
+
+    def _read_legacy(self):
+        """Import search_history.json and temp_preference.json, if present."""
+        data: Dict = {}
+        now = self.clock()
+        try:
+            with open(self.legacy_dir / "search_history.json", "r", encoding="utf-8") as f:
+                cities = json.load(f)
+            # Most recent first; keep that order with one search each
+            data["history"] = [
+                {"city": city, "score": 1.0, "last": now - 1 - i, "count": 1}
+                for i, city in enumerate(cities)
+                if isinstance(city, str) and city.strip()
+            ]
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(self.legacy_dir / "temp_preference.json", "r", encoding="utf-8") as f:
+                data["unit"] = json.load(f).get("unit", DEFAULT_UNIT)
+        except (OSError, ValueError, AttributeError):
+            pass
+        return data, bool(data)
+
+    def history(self, limit: Optional[int] = None) -> List[str]:
+        """Searched cities, best ranked first."""
+        now = self.clock()
+        ranked = sorted(
+            self._history.values(),
+            key=lambda entry: (entry.rank(now, self.half_life), entry.last),
+            reverse=True,
+        )
+        return [entry.city for entry in ranked[:limit]]
+
+    def entry(self, city: str) -> Optional[HistoryEntry]:
+        return self._history.get(normalize_city(city))
+
+    def record_search(self, city: str):
+        """Count a successful search for a city."""
+        now = self.clock()
+        if not self.loaded:
+            # Replayed once the file has been read
+            self._pending.append((city, now))
+            return
+        self._record(city, now)
+        self._trim()
+        self._schedule_save()
+
+    def _record(self, city: str, now: float):
+        key = normalize_city(city)
+        entry = self._history.get(key)
+        if entry is None:
+            self._history[key] = HistoryEntry(city, 1.0, now, 1)
+        else:
+            entry.score = entry.rank(now, self.half_life) + 1.0
+            entry.last = max(entry.last, now)
+            entry.count += 1
+            entry.city = city
+
+    def set_unit(self, unit: str):
+        """Remember the temperature unit, "C" or "F"."""
+        if unit not in ("C", "F"):
+            raise ValueError(f"Unknown temperature unit: {unit}")
+        if not self.loaded:
+            # Wins over the stored unit once the file has been read
+            self._unit = unit
+            self.unit = unit
+            return
+        if unit != self.unit:
+            self.unit = unit
+            self._schedule_save()
+
+    async def flush(self):
+        """Write pending changes now, e.g. before the app exits."""
+        if self._saving is not None and not self._saving.done():
+            self._flush_now.set()
+            await self._saving
+
+    def _trim(self):
+        # Drop the lowest ranked cities beyond max_history
+        if len(self._history) <= self.max_history:
+            return
+        keep = {normalize_city(city) for city in self.history(self.max_history)}
+        self._history = {key: entry for key, entry in self._history.items() if key in keep}
+
+    def _schedule_save(self):
+        self._dirty = True
+        if self._saving is None or self._saving.done():
+            self._saving = asyncio.create_task(self._save_later())
+
+    async def _save_later(self):
+        # One task writes until nothing changed during the last write
+        while self._dirty:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.save_delay)
+            except asyncio.TimeoutError:
+                pass
+            await self.load()
+            self._dirty = False
+            await self._write()
+        self._flush_now.clear()
+
+    async def _write(self):
+        data = {
+            "version": SETTINGS_VERSION,
+            "unit": self.unit,
+            "history": [entry.as_dict() for entry in self._history.values()],
+        }
+        try:
+            await asyncio.to_thread(self._replace, json.dumps(data, indent=1))
+            self.writes += 1
+        except OSError as e:
+            logger.warning("Could not save settings to %s: %s", self.path, e)
+
+    def _replace(self, text: str):
+        # Write a temporary file next to the settings and rename it over them
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
@@ -2,32 +2,107 @@
 """Simple tests for weather service."""
 
 import asyncio
-from weather_service import WeatherService, WeatherServiceError
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+# Every test runs against the local stand-in server (fake_server.py), so no
+# real API key or network access is needed. Set these before config loads.
+os.environ.setdefault("OPENWEATHER_API_KEY", "test-key")
+# The stand-in server has no quota; rate limiter tests build their own bucket
+os.environ.setdefault("WEATHER_RATE_LIMIT", "0")
+
+import cli  # noqa: E402
+from cache import ResponseCache  # noqa: E402
+from city_index import CityIndex, build_index  # noqa: E402
+from config import Config  # noqa: E402
+from decode import DecodeError, Decoder, available_backends  # noqa: E402
+from disk_cache import DiskCache  # noqa: E402
+from forecast import aggregate_daily  # noqa: E402
+from icon_store import IconStore  # noqa: E402
+from models import CurrentWeather, Forecast  # noqa: E402
+from prefetch import PrefetchScheduler  # noqa: E402
+from rate_limit import Priority, TokenBucket  # noqa: E402
+from settings_store import SettingsStore  # noqa: E402
+from resilience import CircuitBreaker, RetryPolicy  # noqa: E402
+from singleflight import SingleFlight  # noqa: E402
+from fake_server import FIXTURES_DIR, FakeWeatherServer  # noqa: E402
+from gateway import WeatherGateway  # noqa: E402
+from geo import grid_cell  # noqa: E402
+from hedging import Endpoint  # noqa: E402
+from main import SearchScheduler, UpdateBatcher  # noqa: E402
+from weather_service import (  # noqa: E402
+    CircuitOpenError,
+    RateLimitedError,
+    ServiceUnavailableError,
+    WeatherService,
+    WeatherServiceError,
+)
+
+
+def service_for(server: FakeWeatherServer, **kwargs) -> WeatherService:
+    """Create a WeatherService pointed at the stand-in server."""
+    return WeatherService(
+        base_url=server.weather_url,
+        forecast_url=server.forecast_url,
+        **kwargs,
+    )
 
 
 async def test_valid_city():
     """Test fetching weather for a valid city."""
-    service = WeatherService()
-    try:
-        data = await service.get_weather("London")
-        print(f"✅ Successfully fetched weather for {data['name']}")
-        print(f"   Temperature: {data['main']['temp']}°C")
-        return True
-    except Exception as e:
-        print(f"❌ Test failed: {e}")
-        return False
+    async with FakeWeatherServer() as server:
+        async with service_for(server) as service:
+            try:
+                data = await service.get_weather("London")
+                forecast = await service.get_forecast("London")
+            except Exception as e:
+                print(f"❌ Test failed: {e}")
+                return False
+    
+    print(f"✅ Successfully fetched weather for {data.city}")
+    print(f"   Temperature: {data.temp}°C, {len(forecast)} forecast slots")
+    return True
 
 
 async def test_invalid_city():
     """Test handling of invalid city."""
-    service = WeatherService()
-    try:
-        await service.get_weather("InvalidCityXYZ123")
-        print("❌ Should have raised an error")
-        return False
-    except WeatherServiceError as e:
-        print(f"✅ Correctly handled error: {e}")
-        return True
+    async with FakeWeatherServer(unknown_cities={"InvalidCityXYZ123"}) as server:
+        async with service_for(server) as service:
+            try:
+                await service.get_weather("InvalidCityXYZ123")
+                print("❌ Should have raised an error")
+                return False
+            except WeatherServiceError as e:
+                if "not found" not in str(e):
+                    print(f"❌ Unexpected error: {e}")
+                    return False
+                print(f"✅ Correctly handled error: {e}")
+                return True
+
+
+async def test_invalid_api_key():
+    """Test handling of a rejected API key."""
+    async with FakeWeatherServer(api_key="some-other-key") as server:
+        async with service_for(server) as service:
+            try:
+                await service.get_weather("London")
+                print("❌ Should have raised an error")
+                return False
+            except WeatherServiceError as e:
+                if "API key" not in str(e):
+                    print(f"❌ Unexpected error: {e}")
+                    return False
+                print(f"✅ Correctly handled error: {e}")
+                return True
 
 
 async def test_empty_city():
@@ -42,6 +117,1104 @@ async def test_empty_city():
         return True
 
 
+async def test_connection_reuse():
+    """Test that back-to-back lookups share one pooled connection."""
+    async with FakeWeatherServer() as server:
+        async with service_for(server) as service:
+            for city in ["London", "Tokyo", "Paris", "Naga", "Pili"]:
+                await service.get_weather(city)
+            await service.get_forecast("London")
+    
+    if server.connection_count == 1 and server.request_count == 6:
+        print("✅ 6 lookups reused a single connection")
+        return True
+    print(f"❌ Expected 1 connection, got {server.connection_count}")
+    return False
+
+
+async def test_ssl_context_loaded_once():
+    """Test that concurrent first lookups share one SSL context load."""
+    loads = []
+    create_ssl_context = httpx.create_ssl_context
+    
+    def counting(*args, **kwargs):
+        loads.append(1)
+        return create_ssl_context(*args, **kwargs)
+    
+    httpx.create_ssl_context = counting
+    try:
+        async with FakeWeatherServer(latency=0.02) as server:
+            async with service_for(server) as service:
+                results = await asyncio.gather(
+                    *(service.get_weather(f"City {i}") for i in range(50))
+                )
+                await service.get_weather("London")
+    finally:
+        httpx.create_ssl_context = create_ssl_context
+    
+    if len(loads) == 1 and len(results) == 50:
+        print("✅ 50 concurrent cold lookups loaded the SSL context once")
+        return True
+    print(f"❌ Expected 1 SSL context load, got {len(loads)}")
+    return False
+
+
+async def test_cache_normalized_keys():
+    """Test that differently cased searches share one cached response."""
+    async with FakeWeatherServer() as server:
+        async with service_for(server) as service:
+            await service.get_weather("Pili")
+            await service.get_weather("pili")
+            await service.get_weather("  PILI ")
+            await service.get_forecast("Pili")
+            await service.get_forecast("pili")
+            stats = service.cache.stats
+    
+    if server.request_count == 2 and stats.hits == 3 and stats.misses == 2:
+        print(f"✅ Cache served repeat searches: {stats.as_dict()}")
+        return True
+    print(f"❌ Expected 2 upstream requests, got {server.request_count}")
+    return False
+
+
+async def test_cache_ttl_and_lru():
+    """Test TTL expiry and LRU eviction by entry count and size."""
+    now = [0.0]
+    cache = ResponseCache(max_entries=2, max_bytes=100, clock=lambda: now[0])
+    
+    cache.set("a", 1, ttl=10, size=10)
+    cache.set("b", 2, ttl=10, size=10)
+    cache.get("a")  # "a" becomes most recently used
+    cache.set("c", 3, ttl=10, size=10)  # evicts "b"
+    count_ok = cache.get("b") is None and cache.get("a") == 1
+    
+    cache.set("d", 4, ttl=10, size=95)  # over byte budget, evicts the rest
+    size_ok = len(cache) == 1 and cache.current_bytes == 95
+    
+    now[0] = 11.0
+    ttl_ok = cache.get("d") is None and cache.stats.expirations == 1
+    
+    if count_ok and size_ok and ttl_ok and cache.stats.evictions == 3:
+        print("✅ Cache expires by TTL and evicts least recently used entries")
+        return True
+    print(f"❌ Unexpected cache state: {cache.stats.as_dict()}")
+    return False
+
+
+async def test_disk_reads_off_event_loop():
+    """Test that disk cache reads wait for a compaction without blocking the event loop."""
+    with tempfile.TemporaryDirectory() as tmp:
+        disk = DiskCache(os.path.join(tmp, "cache.sqlite3"))
+        async with FakeWeatherServer() as server:
+            async with service_for(server, disk_cache=disk) as service:
+                await service.get_weather("London")
+            
+            # A restarted app looks London up while compact() holds the lock
+            held = threading.Event()
+            
+            def compact():
+                with disk._lock:
+                    held.set()
+                    time.sleep(0.3)
+            
+            async with service_for(server, disk_cache=disk) as restarted:
+                requests = server.request_count
+                holder = threading.Thread(target=compact)
+                holder.start()
+                held.wait()
+                lookup = asyncio.create_task(restarted.get_weather("London"))
+                start = time.perf_counter()
+                await asyncio.sleep(0.05)
+                tick = time.perf_counter() - start
+                weather = await lookup
+                holder.join()
+                from_disk = server.request_count == requests
+        disk.close()
+    
+    if tick < 0.2 and weather.city == "London" and from_disk:
+        print(f"✅ Event loop kept running during a disk read ({tick * 1000:.0f} ms tick)")
+        return True
+    print(f"❌ Disk read blocked the event loop: {tick * 1000:.0f} ms tick, from disk {from_disk}")
+    return False
+
+
+async def test_stale_while_revalidate():
+    """Test that a stale disk entry is served at once and refreshed in the background."""
+    with tempfile.TemporaryDirectory() as tmp:
+        disk = DiskCache(os.path.join(tmp, "cache.sqlite3"))
+        stale_at = time.time() - Config.CURRENT_WEATHER_TTL - 60
+        disk.set(f"weather|london|{Config.UNITS}", b'{"name": "Stale London"}', stored_at=stale_at)
+        
+        refreshed = asyncio.Event()
+        fresh = []
+        
+        def on_refresh(weather):
+            fresh.append(weather)
+            refreshed.set()
+        
+        async with FakeWeatherServer(latency=0.05) as server:
+            async with service_for(server, disk_cache=disk) as service:
+                data = await service.get_weather("London", on_refresh=on_refresh)
+                requests_before_refresh = server.request_count
+                await asyncio.wait_for(refreshed.wait(), timeout=2)
+        
+        # The refresh learned where London is and is stored under its grid cell
+        cell = grid_cell(*service.locations.get("london"), Config.GRID_RESOLUTION)
+        stored_at = disk.get(f"weather|{cell}|{Config.UNITS}")[1]
+        disk.close()
+    
+    if (data.city == "Stale London" and requests_before_refresh == 0
+            and fresh[0].city == "London" and stored_at > stale_at):
+        print("✅ Stale entry served immediately and refreshed in the background")
+        return True
+    print(f"❌ Unexpected stale-while-revalidate result: {data}, {fresh}")
+    return False
+
+
+async def test_disk_cache_eviction_and_compaction():
+    """Test the disk cache size cap and compaction of old entries."""
+    with tempfile.TemporaryDirectory() as tmp:
+        disk = DiskCache(os.path.join(tmp, "cache.sqlite3"), max_bytes=250)
+        disk.set("old", b"x" * 100, stored_at=time.time() - 3600)
+        disk.set("a", b"a" * 100)
+        disk.set("b", b"b" * 100)  # over the cap, evicts "old"
+        evicted = disk.get("old") is None and disk.total_bytes() == 200
+        
+        disk.set("c", b"c" * 10, stored_at=time.time() - 3600)
+        removed = disk.compact(max_age=60)
+        compacted = removed == 1 and len(disk) == 2
+        disk.close()
+    
+    if evicted and compacted:
+        print("✅ Disk cache evicts over its size cap and compacts old entries")
+        return True
+    print("❌ Disk cache eviction or compaction failed")
+    return False
+
+
+async def test_concurrent_lookups_coalesced():
+    """Test that 100 concurrent lookups for one city make one upstream request."""
+    async with FakeWeatherServer(latency=0.05, unknown_cities={"Atlantis"}) as server:
+        async with service_for(server) as service:
+            results = await asyncio.gather(
+                *(service.get_weather("London" if i % 2 else "london") for i in range(100))
+            )
+            ok_requests = server.request_count
+            
+            errors = await asyncio.gather(
+                *(service.get_weather("Atlantis") for _ in range(100)),
+                return_exceptions=True,
+            )
+            error_requests = server.request_count - ok_requests
+    
+    same_result = all(r is results[0] for r in results)
+    all_failed = all(isinstance(e, WeatherServiceError) for e in errors)
+    if ok_requests == 1 and same_result and error_requests == 1 and all_failed:
+        print("✅ 100 concurrent awaiters shared one upstream request (and one error)")
+        return True
+    print(f"❌ Expected 1 upstream request, got {ok_requests} and {error_requests}")
+    return False
+
+
+async def test_singleflight_cancellation():
+    """Test that one cancelled waiter does not cancel the shared call."""
+    flight = SingleFlight()
+    started = []
+    
+    async def slow():
+        started.append(1)
+        await asyncio.sleep(0.05)
+        return "done"
+    
+    first = asyncio.create_task(flight.do("k", slow))
+    second = asyncio.create_task(flight.do("k", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+    survivor_ok = await second == "done" and first.cancelled()
+    
+    # When every waiter is cancelled the shared call is cancelled too
+    inner_cancelled = asyncio.Event()
+    
+    async def never():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            inner_cancelled.set()
+            raise
+    
+    waiters = [asyncio.create_task(flight.do("n", never)) for _ in range(3)]
+    await asyncio.sleep(0)
+    for w in waiters:
+        w.cancel()
+    await asyncio.wait_for(inner_cancelled.wait(), timeout=1)
+    await asyncio.sleep(0.01)
+    
+    if survivor_ok and len(started) == 1 and len(flight) == 0:
+        print("✅ Cancelled waiters leave the shared call running for the others")
+        return True
+    print("❌ Single-flight cancellation semantics are wrong")
+    return False
+
+
+async def test_batch_lookup():
+    """Test batch lookups: bounded concurrency and per-item failures."""
+    cities = [f"City {i}" for i in range(40)] + ["Atlantis", (14.6, 121.0)]
+    async with FakeWeatherServer(latency=0.01, unknown_cities={"Atlantis"}) as server:
+        async with service_for(server) as service:
+            batch = service.get_weather_many(cities, concurrency=5)
+            results = [result async for result in batch]
+    
+    failed = [r.query for r in results if not r.ok]
+    stats = batch.stats.summary()
+    if (len(results) == 42 and failed == ["Atlantis"] and server.max_in_flight <= 5
+            and server.connection_count <= 5 and stats["completed"] == 41):
+        print(f"✅ Batch of 42 finished with 1 failure: {stats}")
+        return True
+    print(f"❌ Unexpected batch result: {stats}, failed={failed}, "
+          f"max in flight={server.max_in_flight}")
+    return False
+
+
+def fast_retry_policy():
+    """Retry policy with tiny delays so fault tests run quickly."""
+    return RetryPolicy(max_attempts=3, base_delay=0.01, max_delay=0.02)
+
+
+async def test_retry_on_server_errors():
+    """Test that 5xx responses and dropped connections are retried."""
+    async with FakeWeatherServer() as server:
+        async with service_for(server, retry_policy=fast_retry_policy()) as service:
+            server.inject(503)
+            server.inject(0)  # connection dropped mid-request
+            data = await service.get_weather("London")
+            recovered = data.city == "London" and server.request_count == 3
+            
+            server.inject(500, count=3)
+            try:
+                await service.get_weather("Paris")
+                gave_up = False
+            except WeatherServiceError as e:
+                gave_up = "unavailable" in str(e)
+            stats = service.retry_stats.as_dict()
+    
+    if recovered and gave_up and stats["retries"] == 4 and stats["gave_up"] == 1:
+        print(f"✅ Transient failures retried, persistent ones reported: {stats}")
+        return True
+    print(f"❌ Unexpected retry behavior: {stats}")
+    return False
+
+
+async def test_retry_after_honored():
+    """Test that a 429 with Retry-After waits the requested time."""
+    async with FakeWeatherServer() as server:
+        async with service_for(server, retry_policy=fast_retry_policy()) as service:
+            server.inject(429, retry_after="1")
+            start = time.perf_counter()
+            await service.get_weather("London")
+            waited = time.perf_counter() - start
+            
+            # Longer than RetryPolicy.max_retry_after: give up instead of blocking
+            server.inject(429, retry_after="3600")
+            try:
+                await service.get_weather("Paris")
+                too_long_ok = False
+            except WeatherServiceError:
+                too_long_ok = True
+    
+    if waited >= 1.0 and too_long_ok and service.breaker.state == CircuitBreaker.CLOSED:
+        print(f"✅ Retry-After honored ({waited:.2f} s) and long waits refused")
+        return True
+    print(f"❌ Retry-After not honored (waited {waited:.2f} s)")
+    return False
+
+
+async def test_circuit_breaker():
+    """Test that the breaker opens, fails fast and recovers via a half-open probe."""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=lambda: now[0])
+    async with FakeWeatherServer() as server:
+        async with service_for(
+            server,
+            retry_policy=RetryPolicy(max_attempts=1),
+            breaker=breaker,
+        ) as service:
+            server.inject(503, count=3)
+            for city in ["A", "B", "C"]:
+                try:
+                    await service.get_weather(city)
+                except WeatherServiceError:
+                    pass
+            opened = breaker.state == CircuitBreaker.OPEN
+            
+            sent = server.request_count
+            try:
+                await service.get_weather("London")
+                fail_fast = False
+            except CircuitOpenError:
+                fail_fast = server.request_count == sent
+            
+            now[0] = 31.0  # reset timeout elapsed: one probe allowed
+            half_open = breaker.state == CircuitBreaker.HALF_OPEN
+            await service.get_weather("London")
+            closed = breaker.state == CircuitBreaker.CLOSED
+    
+    if opened and fail_fast and half_open and closed:
+        print(f"✅ Circuit breaker opened, failed fast and closed after a probe: "
+              f"{breaker.as_dict()}")
+        return True
+    print(f"❌ Circuit breaker misbehaved: {breaker.as_dict()}")
+    return False
+
+
+async def test_rate_limiter_burst_and_priority():
+    """Test the token bucket's burst, refill rate and priority lanes."""
+    bucket = TokenBucket(rate=20, burst=2)
+    start = time.perf_counter()
+    for _ in range(6):
+        await bucket.acquire()
+    # 2 tokens up front, then 4 more at 20 per second
+    rate_ok = 0.15 <= time.perf_counter() - start < 0.5
+    
+    order = []
+    
+    async def take(name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+    
+    background = [asyncio.create_task(take(f"bg{i}", Priority.BACKGROUND)) for i in range(3)]
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(take("search", Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    depth = bucket.queue_depth()
+    await asyncio.gather(*background, interactive)
+    
+    if rate_ok and depth == 4 and order == ["search", "bg0", "bg1", "bg2"]:
+        print(f"✅ Token bucket paced requests and served searches first: {bucket.as_dict()}")
+        return True
+    print(f"❌ Unexpected token bucket behavior: order={order}, depth={depth}")
+    return False
+
+
+async def test_rate_limit_max_wait():
+    """Test that a caller past its max wait gets a fast RateLimitedError."""
+    async with FakeWeatherServer() as server:
+        async with service_for(server, rate_limiter=TokenBucket(rate=1, burst=1)) as service:
+            await service.get_weather("London")
+            start = time.perf_counter()
+            try:
+                await service.get_weather("Paris", max_wait=0.05)
+                limited = False
+            except RateLimitedError:
+                limited = True
+            waited = time.perf_counter() - start
+            metrics = service.rate_limiter.as_dict()
+    
+    if limited and waited < 0.5 and server.request_count == 1 and metrics["rejected"] == 1:
+        print(f"✅ Rate-limited caller failed fast after {waited * 1000:.0f} ms")
+        return True
+    print(f"❌ Expected RateLimitedError, metrics={metrics}")
+    return False
+
+
+async def test_search_not_queued_behind_prefetch():
+    """Test that a search for a city being prefetched waits in its own lane."""
+    bucket = TokenBucket(rate=10, burst=1)
+    async with FakeWeatherServer() as server:
+        async with service_for(server, rate_limiter=bucket) as service:
+            bucket.try_acquire()
+            # Background work queued ahead of the prefetch
+            queued = [asyncio.create_task(bucket.acquire(Priority.BACKGROUND)) for _ in range(5)]
+            prefetch = asyncio.create_task(service.prefetch("London", max_wait=0.15))
+            await asyncio.sleep(0.01)
+            start = time.perf_counter()
+            try:
+                weather = await service.get_weather("London", max_wait=0.5)
+            except RateLimitedError:
+                weather = None
+            waited = time.perf_counter() - start
+            prefetched = (await asyncio.gather(prefetch, return_exceptions=True))[0]
+            await asyncio.gather(*queued)
+    
+    if weather is not None and waited < 0.3 and isinstance(prefetched, RateLimitedError):
+        print(f"✅ Search got the next token ({waited * 1000:.0f} ms) while the prefetch gave up")
+        return True
+    print(f"❌ Search joined the throttled prefetch: {weather}, {waited * 1000:.0f} ms, {prefetched!r}")
+    return False
+
+
+async def test_open_circuit_skips_rate_limit():
+    """Test that an open circuit fails fast without waiting for, or spending, a token."""
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=lambda: now[0])
+    bucket = TokenBucket(rate=0.01, burst=1)
+    async with FakeWeatherServer() as server:
+        async with service_for(
+            server, retry_policy=RetryPolicy(max_attempts=1), breaker=breaker, rate_limiter=bucket,
+        ) as service:
+            server.inject(503)
+            try:
+                await service.get_weather("London")  # spends the only token, opens the circuit
+            except WeatherServiceError:
+                pass
+            start = time.perf_counter()
+            try:
+                await service.get_weather("Paris", max_wait=3)
+                error = None
+            except WeatherServiceError as e:
+                error = e
+            waited = time.perf_counter() - start
+            
+            # Half-open with no token: the probe slot is given back
+            now[0] = 31.0
+            try:
+                await service.get_weather("Paris", max_wait=0.05)
+            except RateLimitedError:
+                pass
+            probe_released = breaker.allow_request()
+    
+    if (isinstance(error, CircuitOpenError) and waited < 0.5 and bucket.granted == 1
+            and probe_released):
+        print(f"✅ Open circuit failed fast in {waited * 1000:.0f} ms without taking a token")
+        return True
+    print(f"❌ Open circuit waited {waited:.2f}s and raised {type(error).__name__}, "
+          f"tokens granted {bucket.granted}, probe released {probe_released}")
+    return False
+
+
+async def test_response_models():
+    """Test that responses are parsed into compact, immutable models."""
+    async with FakeWeatherServer() as server:
+        async with service_for(server) as service:
+            weather = await service.get_weather("London")
+            forecast = await service.get_forecast("London")
+    
+    try:
+        forecast.temp[0] = 99.0
+        arrays_frozen = False
+    except ValueError:
+        arrays_frozen = True
+    try:
+        forecast.city = "Elsewhere"
+        model_frozen = False
+    except AttributeError:
+        model_frozen = True
+    
+    slot = forecast[0]
+    if (
+        isinstance(weather, CurrentWeather) and weather.city == "London"
+        and weather.country == "GB" and weather.icon
+        and len(forecast) == 40 and forecast.timezone == 3600
+        and slot.temp == float(forecast.temp[0]) and slot.description
+        and arrays_frozen and model_frozen and not hasattr(forecast, "__dict__")
+    ):
+        print("✅ Responses parsed into immutable CurrentWeather and columnar Forecast")
+        return True
+    print(f"❌ Unexpected models: {weather}, {forecast}")
+    return False
+
+
+async def test_forecast_daily_aggregation():
+    """Test per-day min/max/pop/condition, split at the city's local midnight."""
+    def slot(hour, temp, condition, pop=0.0):
+        # 2024-01-01 00:00 UTC plus the given hour
+        return {
+            "dt": 1704067200 + hour * 3600,
+            "main": {"temp": temp, "temp_min": temp - 1, "temp_max": temp + 1, "humidity": 50},
+            "weather": [{"id": condition, "description": f"condition {condition}", "icon": "10n"}],
+            "pop": pop,
+        }
+    
+    # UTC-5: 03:00 UTC on Jan 1 is still Dec 31 in the city
+    forecast = {
+        "city": {"timezone": -5 * 3600},
+        "list": [
+            slot(3, 2.0, 800),
+            slot(6, 4.0, 500, pop=0.3),
+            slot(9, 6.0, 500, pop=0.8),
+            slot(12, 10.0, 800),
+            slot(15, 8.0, 801),
+        ],
+    }
+    days = aggregate_daily(Forecast.from_response(forecast))
+    
+    first, second = days if len(days) == 2 else (None, None)
+    if (
+        first is not None
+        and str(first.date) == "2023-12-31" and first.slots == 1
+        and str(second.date) == "2024-01-01" and second.slots == 4
+        and second.temp_min == 3.0 and second.temp_max == 11.0
+        and second.temp_mean == 7.0 and second.pop == 0.8
+        and second.condition_id == 500 and second.icon == "10d"
+    ):
+        print("✅ Forecast aggregated per local day with true min/max and dominant condition")
+        return True
+    print(f"❌ Unexpected daily forecast: {days}")
+    return False
+
+
+async def test_decoders_agree():
+    """Test that every installed JSON backend decodes to the same models."""
+    weather_body = (FIXTURES_DIR / "weather_london.json").read_bytes()
+    forecast_body = (FIXTURES_DIR / "forecast_london.json").read_bytes()
+    
+    decoded = {}
+    rejected = []
+    for backend in available_backends():
+        decoder = Decoder(backend)
+        forecast = decoder.forecast(forecast_body)
+        decoded[backend] = (
+            decoder.weather(weather_body),
+            forecast.city, forecast.timezone, forecast.description,
+            forecast.temp.tolist(), forecast.pop.tolist(), forecast.condition_id.tolist(),
+        )
+        for body in (b"", b"not json", b"[]"):
+            try:
+                decoder.weather(body)
+            except DecodeError:
+                rejected.append(backend)
+    
+    reference = decoded["json"]
+    if all(result == reference for result in decoded.values()) and len(rejected) == 3 * len(decoded):
+        print(f"✅ Decoders agree: {', '.join(decoded)}")
+        return True
+    print(f"❌ Decoders disagree or accepted bad input: {decoded}, rejected {rejected}")
+    return False
+
+
+async def test_icon_store_prefetch():
+    """Test that icons are downloaded once and then served from assets."""
+    with tempfile.TemporaryDirectory() as tmp:
+        async with FakeWeatherServer() as server:
+            store = IconStore(tmp, server.icon_url)
+            remote = store.src("10d", "@2x")
+            fetched = await store.prefetch(codes=["10d", "01n"])
+            first_requests = server.request_count
+            again = await store.prefetch(codes=["10d", "01n"])
+            # A new store finds the icons already on disk
+            reopened = IconStore(tmp, server.icon_url)
+        
+        stored = sorted(p.name for p in reopened.icon_dir.iterdir())
+        ok = (
+            remote.startswith("http://")
+            and fetched == 4 and first_requests == 4
+            and again == 0 and server.request_count == first_requests
+            and stored == ["01n.png", "01n@2x.png", "10d.png", "10d@2x.png"]
+            and reopened.src("10d", "@2x") == "/icons/10d@2x.png"
+            and reopened.src("13d").startswith("http://")
+        )
+    if ok:
+        print(f"✅ Icons stored locally after {first_requests} downloads")
+        return True
+    print(f"❌ Icon store: fetched {fetched}, again {again}, files {stored}")
+    return False
+
+
+async def test_offline_last_known():
+    """Test that the last successful response is kept for offline use."""
+    with tempfile.TemporaryDirectory() as tmp:
+        disk = DiskCache(f"{tmp}/cache.sqlite3")
+        async with FakeWeatherServer() as server:
+            service = service_for(server, disk_cache=disk, retry_policy=fast_retry_policy())
+            await service.get_weather("London")
+            await service.get_forecast("London")
+        
+        # The server is gone and the cached copy has aged out
+        key = f"weather|{grid_cell(*service.locations.get('london'), Config.GRID_RESOLUTION)}|metric"
+        body, _stored_at, _size = disk.get(key)
+        disk.set(key, body, stored_at=0)
+        service.cache.clear()
+        try:
+            await service.get_weather("London")
+            offline_error = None
+        except ServiceUnavailableError as e:
+            offline_error = e
+        in_memory = await service.get_last_known("london")
+        await service.close()
+        
+        # After a restart the snapshots come from disk
+        restarted = WeatherService(base_url=server.weather_url, disk_cache=disk)
+        weather = await restarted.get_last_known("London")
+        forecast = await restarted.get_last_known("London", "forecast")
+        unknown = await restarted.get_last_known("Paris")
+        disk.close()
+    
+    async with FakeWeatherServer(error_rate=1.0) as server:
+        async with service_for(server, retry_policy=fast_retry_policy()) as service:
+            try:
+                await service.get_forecast("London")
+                outage_error = None
+            except ServiceUnavailableError as e:
+                outage_error = e
+    
+    ok = (
+        offline_error is not None and in_memory is not None
+        and weather is not None and weather.model.city == "London"
+        and weather.stored_at > 0 and weather.as_of == weather.model.dt
+        and forecast is not None and len(forecast.model) > 0
+        and forecast.as_of == forecast.stored_at and forecast.age() < 60
+        and unknown is None and outage_error is not None
+    )
+    if ok:
+        print(f"✅ Last-known London served offline ({weather.age():.0f}s old)")
+        return True
+    print(f"❌ Offline fallback: error={offline_error!r}, weather={weather}, "
+          f"forecast={forecast}, outage={outage_error!r}")
+    return False
+
+
+async def test_prefetch_scheduler():
+    """Test that history cities are refreshed within the per-minute budget."""
+    now = [1000.0]
+    async with FakeWeatherServer() as server:
+        async with service_for(server) as service:
+            scheduler = PrefetchScheduler(
+                lambda city: service.prefetch(city, min_ttl=100),
+                interval=300,
+                budget_per_minute=4,
+                idle_after=120,
+                startup_spread=0,
+                clock=lambda: now[0],
+                rng=lambda: 0.5,
+            )
+            scheduler.set_cities(["London", "Paris", "Tokyo"])
+            first = [await scheduler.run_once() for _ in range(3)]
+            schedule = scheduler.schedule()
+            
+            # A minute later the budget is back for Tokyo
+            now[0] += 61
+            later = await scheduler.run_once()
+            requests_after_tokyo = server.request_count
+            
+            # Still fresh in the cache: the next round costs nothing
+            now[0] += 300
+            again = await scheduler.run_once()
+            
+            idle = scheduler.idle
+            scheduler.touch()
+            scheduler.pause("hidden")
+            paused = scheduler.paused
+            scheduler.resume("hidden")
+            
+            # Selecting a prefetched city is answered from the cache
+            await service.get_weather("Paris")
+    
+    # Retries are charged too, failed refreshes included
+    async with FakeWeatherServer(error_rate=0.6, seed=3) as flaky:
+        async with service_for(flaky, retry_policy=fast_retry_policy()) as service:
+            budgeted = PrefetchScheduler(
+                service.prefetch,
+                interval=300,
+                budget_per_minute=6,
+                startup_spread=0,
+                clock=lambda: now[0],
+            )
+            budgeted.set_cities([f"City {i}" for i in range(10)])
+            while await budgeted.run_once() is not None:
+                pass
+            charged = budgeted.requests
+            sent = flaky.request_count
+    
+    ok = (
+        first == ["London", "Paris", None]
+        and schedule == [("Tokyo", 0.0), ("London", 300.0), ("Paris", 300.0)]
+        and later == "Tokyo" and requests_after_tokyo == 6
+        and again == "London" and server.request_count == 6
+        and idle and paused and not scheduler.paused
+        and charged == sent > 6 and budgeted.failures > 0
+    )
+    if ok:
+        print(f"✅ Prefetched {scheduler.runs} times with {scheduler.requests} requests")
+        return True
+    print(f"❌ Prefetch scheduler: {first}, {schedule}, {later}, {again}, "
+          f"{server.request_count} requests, flaky {charged} charged of {sent} sent")
+    return False
+
+
+async def test_settings_store():
+    """Test that settings migrate, rank history and coalesce writes."""
+    now = [1_000_000.0]
+    day = 24 * 3600
+    with tempfile.TemporaryDirectory() as tmp:
+        # The old two-file layout is imported on first load
+        with open(f"{tmp}/search_history.json", "w") as f:
+            f.write('["london", "Naga", "naga", "miami"]')
+        with open(f"{tmp}/temp_preference.json", "w") as f:
+            f.write('{"unit": "F"}')
+        path = f"{tmp}/settings.json"
+        store = SettingsStore(path, max_history=3, half_life=day, save_delay=0.05,
+                              clock=lambda: now[0])
+        store.record_search("Paris")  # before load: applied on top of the file
+        await store.load()
+        migrated = store.history()
+        unit = store.unit
+        
+        # A burst of changes is written once, with the migrated settings
+        for city in ("Miami", "miami", "Miami"):
+            store.record_search(city)
+        store.set_unit("C")
+        await asyncio.sleep(0.15)
+        writes = store.writes
+        
+        # Three days later a single search beats four old ones
+        now[0] += 3 * day
+        store.record_search("Tokyo")
+        await store.flush()
+        ranked = store.history()
+        
+        reloaded = SettingsStore(path, max_history=3, half_life=day, clock=lambda: now[0])
+        await reloaded.load()
+        
+        with open(path, "w") as f:
+            f.write('{"unit": "F", "hist')
+        corrupt = SettingsStore(path)
+        await corrupt.load()
+    
+    ok = (
+        migrated == ["Paris", "london", "Naga"] and unit == "F"
+        and writes == 1 and store.writes == 2 and store.entry("miami").count == 3
+        and ranked == ["Tokyo", "Miami", "Paris"]
+        and reloaded.history() == ranked and reloaded.unit == "C"
+        and corrupt.history() == [] and corrupt.unit == "C"
+    )
+    if ok:
+        print(f"✅ Settings migrated, ranked {ranked} in {store.writes} writes")
+        return True
+    print(f"❌ Settings store: {migrated} {unit}, writes {writes}, {ranked}, "
+          f"reloaded {reloaded.history()}, corrupt {corrupt.history()}")
+    return False
+
+
+async def test_city_suggestions():
+    """Test offline city suggestions by prefix, population and history."""
+    cities = [
+        {"id": 1, "name": "London", "country": "GB", "coord": {"lat": 51.5, "lon": -0.13},
+         "population": 8_900_000},
+        {"id": 2, "name": "London", "country": "CA", "coord": {"lat": 42.98, "lon": -81.23},
+         "population": 380_000},
+        {"id": 3, "name": "Londrina", "country": "BR", "coord": {"lat": -23.3, "lon": -51.16},
+         "population": 500_000},
+        {"id": 4, "name": "São Paulo", "country": "BR", "coord": {"lat": -23.55, "lon": -46.64},
+         "population": 12_000_000},
+        {"id": 5, "name": "Springfield", "state": "IL", "country": "US",
+         "coord": {"lat": 39.8, "lon": -89.64}},
+        {"id": 6, "name": "Springfield", "state": "MA", "country": "US",
+         "coord": {"lat": 42.1, "lon": -72.59}},
+        {"id": 7, "name": "", "country": "XX", "coord": {}},
+    ]
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(f"{tmp}/city.list.json", "w", encoding="utf-8") as f:
+            json.dump(cities, f)
+        indexed = build_index(f"{tmp}/city.list.json", f"{tmp}/cities.idx")
+        index = CityIndex(f"{tmp}/cities.idx")
+        by_population = [c.label for c in index.suggest("lon")]
+        accents = [c.label for c in index.suggest("SAO p")]
+        history_first = [c.query for c in index.suggest("spr", preferred=["Tokyo", "Springfield,MA,US"])]
+        top = index.suggest("l", limit=1)
+        nothing = index.suggest("xyz") + index.suggest("  ")
+        index.close()
+    
+    ok = (
+        indexed == 6
+        and by_population == ["London, GB", "Londrina, BR", "London, CA"]
+        and accents == ["São Paulo, BR"]
+        and history_first == ["Springfield,MA,US", "Springfield,IL,US"]
+        and top[0].id == 1 and (top[0].lat, top[0].lon) == (51.5, -0.13)
+        and nothing == []
+    )
+    if ok:
+        print(f"✅ Suggested {by_population} for 'lon'")
+        return True
+    print(f"❌ City suggestions: {indexed} cities, {by_population}, {accents}, "
+          f"{history_first}, {top}")
+    return False
+
+
+async def test_spatial_cache():
+    """Test that nearby points share one cached response per grid cell."""
+    async with FakeWeatherServer(unknown_cities={"0.0,0.0"}) as server:
+        async with service_for(server, grid_resolution=0.05,
+                               retry_policy=fast_retry_policy()) as service:
+            pili = await service.get_weather("Pili")
+            # A GPS reading a kilometre from the cell's center, and a respelling
+            center = (round(pili.lat / 0.05) * 0.05, round(pili.lon / 0.05) * 0.05)
+            nearby = await service.get_weather_by_coordinates(center[0] + 0.01, center[1] - 0.01)
+            respelled = await service.get_weather(" PILI ")
+            forecast = await service.get_forecast("pili")  # first forecast: by coordinates
+            shared_requests = server.request_count
+            
+            far = await service.get_weather_by_coordinates(pili.lat + 1, pili.lon)
+            await service.remember_location("Naga", 13.62, 123.19)
+            await service.get_weather("Naga")
+            known_by_name = sorted(server.places)
+            
+            errors = []
+            for lat, lon in ((0.0, 0.0), (91.0, 0.0)):
+                try:
+                    await service.get_weather_by_coordinates(lat, lon)
+                except WeatherServiceError as e:
+                    errors.append(str(e))
+            stats = service.location_stats
+    
+    async with FakeWeatherServer(error_rate=1.0) as server:
+        async with service_for(server, retry_policy=fast_retry_policy()) as service:
+            try:
+                await service.get_weather_by_coordinates(14.6, 121.0)
+                outage = None
+            except ServiceUnavailableError as e:
+                outage = e
+    
+    ok = (
+        shared_requests == 2 and nearby is pili and respelled is pili
+        and forecast.city == "Pili" and far.city != "Pili"
+        and known_by_name == ["pili"]
+        and len(errors) == 2 and errors[0].startswith("No weather data")
+        and errors[1].startswith("Invalid coordinates")
+        and stats.hits == 2 and stats.geocoded == 1 and stats.resolved == 3
+        and outage is not None
+    )
+    if ok:
+        print(f"✅ Grid cache shared {shared_requests} requests: {stats.as_dict()}")
+        return True
+    print(f"❌ Spatial cache: {shared_requests} requests, {known_by_name}, {errors}, "
+          f"{stats.as_dict()}, outage={outage!r}")
+    return False
+
+
+async def test_hedged_endpoints():
+    """Test that a slow primary is hedged to a faster mirror, which then leads."""
+    async with FakeWeatherServer(latency=0.3) as slow, FakeWeatherServer(latency=0.01) as fast:
+        primary = Endpoint(slow.weather_url, slow.forecast_url)
+        mirror = Endpoint(fast.weather_url, fast.forecast_url)
+        async with WeatherService(endpoints=[primary, mirror]) as service:
+            service.hedger.initial_delay = 0.05
+            start = time.perf_counter()
+            first = await service.get_weather("London")
+            first_elapsed = time.perf_counter() - start
+            
+            # The mirror answered first, so it is tried first from now on
+            start = time.perf_counter()
+            for city in ("Paris", "Tokyo", "Quito", "Lima"):
+                await service.get_weather(city)
+            later_elapsed = time.perf_counter() - start
+            order = service.hedger.ordered()
+            hedger = service.hedger.as_dict()
+    
+    # A primary that refuses connections fails over at once
+    async with FakeWeatherServer() as down:
+        down_endpoint = Endpoint(down.weather_url, down.forecast_url)
+    async with FakeWeatherServer(latency=0.01) as fast:
+        backup = Endpoint(fast.weather_url, fast.forecast_url)
+        async with WeatherService(
+            endpoints=[down_endpoint, backup], retry_policy=fast_retry_policy()
+        ) as service:
+            start = time.perf_counter()
+            failed_over = await service.get_weather("Naga")
+            failover_elapsed = time.perf_counter() - start
+            failovers = service.hedger.failovers
+    
+    ok = (
+        first.city == "London" and first_elapsed < 0.2 and later_elapsed < 0.2
+        and order == [mirror, primary] and hedger["hedges"] == 1 and hedger["hedge_wins"] == 1
+        and failed_over.city == "Naga" and failover_elapsed < 0.2 and failovers == 1
+    )
+    if ok:
+        print(f"✅ Hedged to the mirror in {first_elapsed * 1000:.0f} ms, "
+              f"failed over in {failover_elapsed * 1000:.0f} ms")
+        return True
+    print(f"❌ Hedging: first {first_elapsed:.3f}s, later {later_elapsed:.3f}s, {hedger}, "
+          f"failover {failover_elapsed:.3f}s ({failovers})")
+    return False
+
+
+async def test_batch_cli():
+    """Test the headless CLI: NDJSON per result, worker cap, and no GUI import."""
+    lines = ["# sites", "London", "", "Naga, PH", "13.62,123.19", "Atlantis"] + [
+        f"City {i}" for i in range(20)
+    ]
+    out, stats_out = io.StringIO(), io.StringIO()
+    async with FakeWeatherServer(latency=0.01, unknown_cities={"Atlantis"}) as server:
+        async with service_for(server) as service:
+            stats = await cli.run(
+                cli.read_queries(lines), out, workers=4, service=service, stats_out=stats_out
+            )
+            forecast_out = io.StringIO()
+            await cli.run(["London"], forecast_out, workers=1, forecast=True, service=service)
+    
+    # A stale entry whose background refresh fails must not add to stdout
+    piped = io.StringIO()
+    with tempfile.TemporaryDirectory() as tmp:
+        disk = DiskCache(os.path.join(tmp, "cache.sqlite3"))
+        stale_at = time.time() - Config.CURRENT_WEATHER_TTL - 60
+        disk.set(f"weather|london|{Config.UNITS}", b'{"name": "Stale London"}', stored_at=stale_at)
+        async with FakeWeatherServer(error_rate=1.0) as failing:
+            async with service_for(failing, disk_cache=disk, retry_policy=fast_retry_policy()) as service:
+                with contextlib.redirect_stdout(piped):
+                    await cli.run(["London"], sys.stdout, workers=1, service=service)
+                    await asyncio.gather(*service._refreshing.values())
+        disk.close()
+    
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    by_query = {json.dumps(r["query"]): r for r in records}
+    forecast = json.loads(forecast_out.getvalue())
+    # Importing the CLI must not load the GUI toolkit
+    probe = subprocess.run(
+        [sys.executable, "-c", "import sys, cli; print('flet' in sys.modules)"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+    )
+    ok = (
+        len(records) == 24 and stats.completed == 23 and stats.failed == 1
+        and by_query['"Atlantis"']["error_type"] == "NotFoundError"
+        and by_query['"London"']["data"]["city"] == "London"
+        and by_query["[13.62, 123.19]"]["ok"] and by_query['"Naga, PH"']["ok"]
+        and server.max_in_flight <= 4 and "lookups/s" in stats_out.getvalue()
+        and forecast["ok"] and len(forecast["data"]["slots"]) > 0
+        and probe.stdout.strip() == "False"
+        and len(piped.getvalue().splitlines()) == 1 and json.loads(piped.getvalue())["ok"]
+    )
+    if ok:
+        print(f"✅ CLI wrote {len(records)} NDJSON lines: {stats_out.getvalue().splitlines()[0]}")
+        return True
+    print(f"❌ CLI output wrong: {len(records)} lines, {stats.summary()}, "
+          f"max in flight {server.max_in_flight}, flet imported: {probe.stdout.strip()} {probe.stderr}, piped: {piped.getvalue()!r}")
+    return False
+
+
+async def test_gateway():
+    """Test the HTTP gateway: shared cache, cache headers and error statuses."""
+    async with FakeWeatherServer(latency=0.02, unknown_cities={"Atlantis"}) as server:
+        async with service_for(server) as service, WeatherGateway(service) as gateway:
+            async with httpx.AsyncClient(base_url=gateway.base_url) as client:
+                first = await client.get("/weather", params={"q": "London"})
+                second = await client.get("/weather", params={"q": "london "})
+                etag = second.headers["etag"]
+                revalidated = await client.get(
+                    "/weather", params={"q": "London"}, headers={"If-None-Match": etag}
+                )
+                
+                # Many clients asking at once share one upstream request
+                before = server.request_count
+                clients = [httpx.AsyncClient(base_url=gateway.base_url) for _ in range(20)]
+                try:
+                    burst = await asyncio.gather(
+                        *(c.get("/forecast", params={"q": "Paris"}) for c in clients)
+                    )
+                finally:
+                    await asyncio.gather(*(c.aclose() for c in clients))
+                burst_upstream = server.request_count - before
+                
+                point = await client.get("/weather", params={"lat": "13.62", "lon": "123.19"})
+                missing = await client.get("/weather", params={"q": "Atlantis"})
+                invalid = await client.get("/weather", params={"lat": "95", "lon": "0"})
+                batch = await client.post("/batch", json={
+                    "queries": ["London", [13.62, 123.19], "Atlantis"], "kind": "weather",
+                })
+                stats = (await client.get("/stats")).json()
+        upstream = server.request_count
+    
+    # A request that would wait too long for the API budget is refused
+    async with FakeWeatherServer() as server:
+        limiter = TokenBucket(rate=0.01, burst=1)
+        async with service_for(server, rate_limiter=limiter) as service:
+            async with WeatherGateway(service, max_wait=0.05) as gateway:
+                async with httpx.AsyncClient(base_url=gateway.base_url) as client:
+                    allowed = await client.get("/weather", params={"q": "Quito"})
+                    limited = await client.get("/weather", params={"q": "Lima"})
+    
+    results = {json.dumps(r["query"]): r for r in batch.json()["results"]}
+    ok = (
+        first.status_code == 200 and first.headers["x-cache"] == "MISS"
+        and Config.CURRENT_WEATHER_TTL - 1 <= int(first.headers["cache-control"].split("=")[1])
+        and second.headers["x-cache"] == "HIT" and "age" in second.headers
+        and second.json()["city"] == "London" and first.headers["etag"] == etag
+        and revalidated.status_code == 304 and not revalidated.content
+        and all(r.status_code == 200 for r in burst) and burst_upstream == 1
+        and point.status_code == 200 and point.json()["lat"] == 13.62
+        and missing.status_code == 404 and invalid.status_code == 400
+        and results['"Atlantis"']["error_type"] == "NotFoundError" and results['"London"']["ok"]
+        and stats["upstream_requests"] == upstream
+        and allowed.status_code == 200 and limited.status_code == 429
+        and "retry-after" in limited.headers
+    )
+    if ok:
+        print(f"✅ Gateway served 20 concurrent clients from 1 upstream request; "
+              f"{stats['gateway']['requests']} requests, cache {stats['gateway']['cache']}")
+        return True
+    print(f"❌ Gateway: {first.status_code} {dict(first.headers)}, {second.headers.get('x-cache')}, "
+          f"304={revalidated.status_code}, burst upstream {burst_upstream}, point {point.status_code}, "
+          f"404={missing.status_code}, 400={invalid.status_code}, 429={limited.status_code}, {stats}")
+    return False
+
+
+async def test_search_scheduler():
+    """Test that only the latest of several quick searches runs."""
+    shown = []
+    async with FakeWeatherServer(latency=0.05) as server:
+        async with service_for(server) as service:
+            
+            async def search(city):
+                shown.append((await service.get_weather(city)).city)
+            
+            scheduler = SearchScheduler(search, debounce=0.05)
+            # Typed and submitted again within the debounce period
+            await scheduler.submit("London")
+            await scheduler.submit("Paris")
+            await scheduler._task
+            debounced_requests = server.request_count
+            
+            # A newer search also cancels one whose request is in flight
+            await scheduler.submit("Tokyo")
+            await asyncio.sleep(0.07)
+            in_flight = server.in_flight
+            await scheduler.submit("Berlin")
+            await scheduler._task
+    
+    if (shown == ["Paris", "Berlin"] and debounced_requests == 1
+            and in_flight == 1 and scheduler.superseded == 2):
+        print("✅ Search scheduler ran only the latest search")
+        return True
+    print(f"❌ Search scheduler: shown {shown}, {debounced_requests} requests after the "
+          f"debounce, {in_flight} in flight, superseded {scheduler.superseded}")
+    return False
+
+
+async def test_update_batcher():
+    """Test that page updates requested together go out in one update()."""
+    
+    class Page:
+        def __init__(self):
+            self.loop = asyncio.get_running_loop()
+            self.updates = []
+        
+        def update(self):
+            self.updates.append(time.monotonic())
+    
+    page = Page()
+    ui = UpdateBatcher(page, interval=0.05)
+    for _ in range(10):
+        ui.request()
+    await asyncio.sleep(0.1)
+    burst = len(page.updates)
+    
+    # Requests from Flet's handler threads are batched the same way
+    await asyncio.to_thread(lambda: [ui.request() for _ in range(5)])
+    await asyncio.sleep(0.1)
+    threaded = len(page.updates)
+    
+    # flush() goes out at once; a request right after it waits an interval
+    ui.request()
+    ui.flush()
+    ui.request()
+    await asyncio.sleep(0.1)
+    gap = page.updates[-1] - page.updates[-2]
+    
+    if burst == 1 and threaded == 2 and len(page.updates) == 4 and gap >= 0.04:
+        print(f"✅ Update batcher sent {ui.requests} requests as {ui.flushes} page updates")
+        return True
+    print(f"❌ Update batcher: {burst} updates for a burst, {threaded} after threads, "
+          f"{len(page.updates)} in total, {gap * 1000:.0f} ms after a flush")
+    return False
+
+
 async def run_tests():
     """Run all tests."""
     print("Running Weather Service Tests\n")
@@ -50,7 +1223,39 @@ async def run_tests():
     results = []
     results.append(await test_valid_city())
     results.append(await test_invalid_city())
+    results.append(await test_invalid_api_key())
     results.append(await test_empty_city())
+    results.append(await test_connection_reuse())
+    results.append(await test_ssl_context_loaded_once())
+    results.append(await test_cache_normalized_keys())
+    results.append(await test_cache_ttl_and_lru())
+    results.append(await test_stale_while_revalidate())
+    results.append(await test_disk_reads_off_event_loop())
+    results.append(await test_disk_cache_eviction_and_compaction())
+    results.append(await test_concurrent_lookups_coalesced())
+    results.append(await test_singleflight_cancellation())
+    results.append(await test_batch_lookup())
+    results.append(await test_retry_on_server_errors())
+    results.append(await test_retry_after_honored())
+    results.append(await test_circuit_breaker())
+    results.append(await test_rate_limiter_burst_and_priority())
+    results.append(await test_rate_limit_max_wait())
+    results.append(await test_search_not_queued_behind_prefetch())
+    results.append(await test_open_circuit_skips_rate_limit())
+    results.append(await test_forecast_daily_aggregation())
+    results.append(await test_response_models())
+    results.append(await test_decoders_agree())
+    results.append(await test_icon_store_prefetch())
+    results.append(await test_offline_last_known())
+    results.append(await test_prefetch_scheduler())
+    results.append(await test_settings_store())
+    results.append(await test_city_suggestions())
+    results.append(await test_spatial_cache())
+    results.append(await test_hedged_endpoints())
+    results.append(await test_batch_cli())
+    results.append(await test_gateway())
+    results.append(await test_search_scheduler())
+    results.append(await test_update_batcher())
     
     print("\n" + "=" * 50)
     passed = sum(results)
@@ -1,9 +1,40 @@
 # weather_service.py
 """Weather API service layer."""
 
+import asyncio
+import functools
+import inspect
+import logging
+import ssl
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
 import httpx
-from typing import Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+from batch import Query, WeatherBatch
+from cache import ResponseCache
 from config import Config
+from decode import DecodeError, Decoder
+from disk_cache import DiskCache
+from geo import LocationCache, LocationStats, grid_cell
+from hedging import Endpoint, HedgedSender
+from models import CurrentWeather, Forecast, approximate_size
+from rate_limit import Priority, TokenBucket
+from resilience import CircuitBreaker, RetryPolicy, RetryStats, parse_retry_after
+from singleflight import SingleFlight
+
+try:
+    import h2  # noqa: F401  (optional, enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Problems nobody is waiting on; never stdout, which callers such as the CLI own
+logger = logging.getLogger(__name__)
+
+# HTTP requests sent on behalf of the running prefetch(), hedges included;
+# tasks it starts share the counter
+_sent: ContextVar[Optional[List[int]]] = ContextVar("sent", default=None)
 
 
 class WeatherServiceError(Exception):
@@ -11,23 +42,336 @@ class WeatherServiceError(Exception):
     pass
 
 
+class NotFoundError(WeatherServiceError):
+    """Raised when the API has no data for a city or point."""
+    pass
+
+
+class ServiceUnavailableError(WeatherServiceError):
+    """Raised when the API cannot be reached: timeouts, network errors, 5xx."""
+    pass
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    """Raised without contacting the API while the circuit breaker is open."""
+    pass
+
+
+class RateLimitedError(WeatherServiceError):
+    """Raised when the client-side rate limit would delay a call past max_wait."""
+    pass
+
+
+# What the service hands out: parsed, immutable responses
+WeatherModel = Union[CurrentWeather, Forecast]
+
+# Receives fresh data after a stale-while-revalidate refresh
+RefreshCallback = Callable[[WeatherModel], Any]
+
+# fetch(city or (lat, lon), priority, max_wait) -> raw response body
+FetchFunction = Callable[[Query, int, Optional[float]], Awaitable[bytes]]
+
+# Decodes a raw response body into its model
+ParseFunction = Callable[[bytes], WeatherModel]
+
+
+class Snapshot(NamedTuple):
+    """The last successful response for a location, kept for offline use."""
+    
+    model: WeatherModel
+    stored_at: float  # unix time it was fetched
+    
+    @property
+    def as_of(self) -> float:
+        """When the data was observed: the reading's own time, else when it was fetched."""
+        if isinstance(self.model, Forecast):
+            # Its slots are predictions, not readings
+            return self.stored_at
+        return self.model.dt or self.stored_at
+    
+    def age(self, now: Optional[float] = None) -> float:
+        """Seconds since as_of."""
+        return max(0.0, (time.time() if now is None else now) - self.as_of)
+
+
+def normalize_city(city: str) -> str:
+    """Canonical form of a city name, so "Pili" and " pili " share a cache entry."""
+    return " ".join(city.split()).casefold()
+
+
 class WeatherService:
     """Service for fetching weather data from OpenWeatherMap API."""
     
-    def __init__(self):
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        forecast_url: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        http2: Optional[bool] = None,
+        cache: Optional[ResponseCache] = None,
+        disk_cache: Optional[DiskCache] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        decoder: Optional[Decoder] = None,
+        grid_resolution: Optional[float] = None,
+        endpoints: Optional[Sequence[Endpoint]] = None,
+    ):
+        """
+        Create the service. The HTTP client is opened lazily on first use
+        and reused by every request until close() is called.
+        
+        Args:
+            base_url: Current weather endpoint (defaults to Config.BASE_URL)
+            forecast_url: Forecast endpoint (defaults to Config.FORECAST_URL)
+            max_connections: Maximum open connections in the pool
+            max_keepalive_connections: Idle connections kept for reuse
+            keepalive_expiry: Seconds an idle connection is kept alive
+            http2: Use HTTP/2 when the optional 'h2' package is installed
+            cache: Response cache (a new bounded cache by default)
+            disk_cache: Persistent cache consulted after the memory cache
+            retry_policy: Retry/backoff policy for failed requests
+            breaker: Circuit breaker shared by all requests to the API
+            rate_limiter: Token bucket for the API key's quota (built from
+                Config.RATE_LIMIT_PER_MINUTE; 0 there disables limiting)
+            decoder: Response body decoder (Config.JSON_DECODER backend)
+            grid_resolution: Size in degrees of the grid cells responses
+                are cached on (Config.GRID_RESOLUTION)
+            endpoints: Equivalent upstreams in order of preference; by
+                default base_url/forecast_url followed by Config.API_MIRRORS.
+                A slow request is hedged to the next one.
+        """
         self.api_key = Config.API_KEY
-        self.base_url = Config.BASE_URL
+        if endpoints is None:
+            endpoints = [
+                Endpoint(base_url or Config.BASE_URL, forecast_url or Config.FORECAST_URL)
+            ] + [Endpoint.from_root(root) for root in Config.API_MIRRORS]
         self.timeout = Config.TIMEOUT
+        self.limits = httpx.Limits(
+            max_connections=max_connections or Config.MAX_CONNECTIONS,
+            max_keepalive_connections=(
+                max_keepalive_connections or Config.MAX_KEEPALIVE_CONNECTIONS
+            ),
+            keepalive_expiry=(
+                Config.KEEPALIVE_EXPIRY if keepalive_expiry is None else keepalive_expiry
+            ),
+        )
+        self.http2 = (Config.HTTP2 if http2 is None else http2) and HTTP2_AVAILABLE
+        self._client: Optional[httpx.AsyncClient] = None
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        self._ssl_loading: Optional["asyncio.Future[ssl.SSLContext]"] = None  # shared by first callers
+        self.cache = cache if cache is not None else ResponseCache(
+            max_entries=Config.CACHE_MAX_ENTRIES,
+            max_bytes=Config.CACHE_MAX_BYTES,
+        )
+        self.disk_cache = disk_cache
+        self._refreshing: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        # Concurrent lookups for the same key share one upstream request
+        self.inflight = SingleFlight()
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_attempts=Config.RETRY_MAX_ATTEMPTS,
+            base_delay=Config.RETRY_BASE_DELAY,
+            max_delay=Config.RETRY_MAX_DELAY,
+            max_retry_after=Config.RETRY_AFTER_MAX,
+        )
+        self.retry_stats = RetryStats()
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=Config.BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=Config.BREAKER_RESET_TIMEOUT,
+        )
+        if rate_limiter is None and Config.RATE_LIMIT_PER_MINUTE > 0:
+            rate_limiter = TokenBucket.per_minute(
+                Config.RATE_LIMIT_PER_MINUTE, burst=Config.RATE_LIMIT_BURST
+            )
+        self.rate_limiter = rate_limiter
+        # Hedges and failovers are real API calls: each needs a spare token
+        self.hedger = HedgedSender(
+            endpoints,
+            initial_delay=Config.HEDGE_INITIAL_DELAY,
+            min_delay=Config.HEDGE_MIN_DELAY,
+            max_delay=Config.HEDGE_MAX_DELAY,
+            max_hedges=Config.HEDGE_MAX,
+            allow_hedge=rate_limiter.try_acquire if rate_limiter is not None else None,
+        )
+        self.decoder = decoder or Decoder(Config.JSON_DECODER)
+        # Last successful response per location, for get_last_known()
+        self._last_known: "OrderedDict[Tuple[str, str, str], Snapshot]" = OrderedDict()
+        self.max_snapshots = Config.OFFLINE_SNAPSHOTS
+        # Responses are cached per grid cell; city names are resolved to
+        # coordinates once, from their first response
+        self.grid_resolution = grid_resolution or Config.GRID_RESOLUTION
+        self.locations = LocationCache(Config.LOCATION_CACHE_SIZE, disk_cache)
+        self.location_stats = LocationStats()
+    
+    @property
+    def base_url(self) -> str:
+        """Current weather URL of the preferred endpoint (read-only)."""
+        return self.hedger.endpoints[0].weather_url
+    
+    @property
+    def forecast_url(self) -> str:
+        """Forecast URL of the preferred endpoint (read-only)."""
+        return self.hedger.endpoints[0].forecast_url
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                http2=self.http2,
+                verify=self._ssl_context if self._ssl_context is not None else True,
+            )
+        return self._client
+    
+    async def _open_client(self) -> httpx.AsyncClient:
+        """
+        Return the shared HTTP client. The CA certificates are loaded in
+        a thread the first time: that takes tens of milliseconds, which
+        would otherwise stall e.g. the render of a stale cached entry.
+        Concurrent first callers wait for the same load.
+        """
+        if self._ssl_context is None:
+            if self._ssl_loading is None:
+                self._ssl_loading = asyncio.ensure_future(asyncio.to_thread(httpx.create_ssl_context))
+            try:
+                # A cancelled caller must not cancel the load for the others
+                context = await asyncio.shield(self._ssl_loading)
+            except Exception:
+                self._ssl_loading = None  # let the next caller try again
+                raise
+            self._ssl_context = context
+        return self._get_client()
+    
+    async def _send(
+        self,
+        kind: str,
+        params: Dict,
+        priority: int = Priority.INTERACTIVE,
+        max_wait: Optional[float] = None,
+    ) -> httpx.Response:
+        """
+        GET the "weather" or "forecast" API through the circuit breaker,
+        the rate limiter and the retry policy. Every attempt the breaker
+        lets through, including retries and hedges, takes a token. Each
+        attempt goes to the best endpoint and is hedged to the next one
+        when it is slow.
+        
+        Timeouts, network errors and retryable statuses (5xx, 429) are
+        retried with jittered backoff, honoring Retry-After. The last
+        response is returned even if it is an error, so callers keep their
+        own status handling; the last network error is re-raised.
+        
+        Raises:
+            CircuitOpenError: If the breaker is rejecting requests
+            RateLimitedError: If no token became available within max_wait
+        """
+        self.retry_stats.requests += 1
+        attempt = 0
+        while True:
+            attempt += 1
+            # Ask the breaker first, so an open circuit fails fast and
+            # only requests that will be sent take a token
+            if not self.breaker.allow_request():
+                self.retry_stats.short_circuited += 1
+                raise CircuitOpenError(
+                    "Weather service is temporarily unavailable. "
+                    "Please try again in a moment."
+                )
+            if self.rate_limiter is not None:
+                try:
+                    acquired = await self.rate_limiter.acquire(priority, max_wait)
+                except BaseException:
+                    self.breaker.release_probe()
+                    raise
+                if not acquired:
+                    self.breaker.release_probe()
+                    raise RateLimitedError(
+                        "Too many requests right now. Please try again in a moment."
+                    )
+            
+            self.retry_stats.attempts += 1
+            verdict = False
+            try:
+                client = await self._open_client()
+                
+                def get(endpoint: Endpoint):
+                    sent = _sent.get()
+                    if sent is not None:
+                        sent[0] += 1
+                    return client.get(endpoint.url(kind), params=params)
+                
+                response = await self.hedger.send(get)
+            except (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError):
+                self.breaker.record_failure()
+                verdict = True
+                if not self.retry_policy.should_retry(attempt):
+                    self.retry_stats.gave_up += 1
+                    raise
+                delay = self.retry_policy.delay(attempt)
+            else:
+                status = response.status_code
+                if status >= 500:
+                    self.breaker.record_failure()
+                    verdict = True
+                elif status != 429:
+                    # 2xx and 4xx both mean the API is up; 429 says nothing
+                    self.breaker.record_success()
+                    verdict = True
+                if not self.retry_policy.should_retry(attempt, status):
+                    if status in self.retry_policy.retry_statuses:
+                        self.retry_stats.gave_up += 1
+                    return response
+                delay = self.retry_policy.delay(
+                    attempt, parse_retry_after(response.headers.get("Retry-After"))
+                )
+                if delay is None:
+                    # The server asked for a longer wait than we are willing to block
+                    self.retry_stats.gave_up += 1
+                    return response
+            finally:
+                if not verdict:
+                    self.breaker.release_probe()
+            
+            self.retry_stats.retries += 1
+            await asyncio.sleep(delay)
+    
+    async def close(self):
+        """Cancel background refreshes and release pooled connections."""
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def __aenter__(self) -> "WeatherService":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
     
-    async def get_weather(self, city: str) -> Dict:
+    async def get_weather(
+        self,
+        city: str,
+        on_refresh: Optional[RefreshCallback] = None,
+        priority: int = Priority.INTERACTIVE,
+        max_wait: Optional[float] = None,
+    ) -> CurrentWeather:
         """
         Fetch weather data for a given city.
         
         Args:
             city: Name of the city
+            on_refresh: Called with fresh data when a stale cached response
+                was returned and its background refresh completes
+            priority: Rate limiter lane (Priority.INTERACTIVE or BACKGROUND)
+            max_wait: Fail with RateLimitedError rather than queue longer
+                than this many seconds for the rate limiter
             
         Returns:
-            Dictionary containing weather data
+            Current weather for the city (immutable, shared with the cache)
             
         Raises:
             WeatherServiceError: If the request fails
@@ -37,63 +381,56 @@ class WeatherService:
             raise WeatherServiceError("City name cannot be empty")
         
         city = city.strip()
-        
+        return await self._lookup(
+            "weather", city, Config.CURRENT_WEATHER_TTL, self._fetch_weather,
+            self.decoder.weather, on_refresh, priority, max_wait,
+        )
+    
+    async def _fetch_weather(
+        self, query: Query, priority: int, max_wait: Optional[float]
+    ) -> bytes:
+        """Request current weather from the API; returns the raw body."""
         # Build request parameters
-        params = {
-            "q": city,
-            "appid": self.api_key,
-            "units": Config.UNITS,
-        }
+        params = self._params(query)
         
         try:
-            # Make async HTTP request
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(self.base_url, params=params)
-                
-                # Check for HTTP errors
-                if response.status_code == 404:
-                    raise WeatherServiceError(
-                        f"City '{city}' not found. Please check the spelling."
-                    )
-                elif response.status_code == 401:
-                    raise WeatherServiceError(
-                        "Invalid API key. Please check your configuration."
-                    )
-                elif response.status_code >= 500:
-                    raise WeatherServiceError(
-                        "Weather service is currently unavailable. "
-                        "Please try again later."
-                    )
-                elif response.status_code != 200:
-                    raise WeatherServiceError(
-                        f"Error fetching weather data: {response.status_code}"
-                    )
-                
-                # Parse JSON response
-                try:
-                    data = response.json()
-                except ValueError:
-                    raise WeatherServiceError(
-                        "Invalid response from weather service. Please try again."
-                    )
-                
-                # Validate response data
-                if not data:
-                    raise WeatherServiceError(
-                        "Empty response from weather service. Please try again."
-                    )
-                
-                return data
-                
+            # Make async HTTP request on the shared connection pool
+            response = await self._send("weather", params, priority, max_wait)
+            
+            # Check for HTTP errors
+            if response.status_code == 404:
+                raise NotFoundError(self._not_found(query))
+            elif response.status_code == 401:
+                raise WeatherServiceError(
+                    "Invalid API key. Please check your configuration."
+                )
+            elif response.status_code >= 500:
+                raise ServiceUnavailableError(
+                    "Weather service is currently unavailable. "
+                    "Please try again later."
+                )
+            elif response.status_code != 200:
+                raise WeatherServiceError(
+                    f"Error fetching weather data: {response.status_code}"
+                )
+            
+            # Validate response data; it is decoded by the caller
+            if not response.content.strip():
+                raise WeatherServiceError(
+                    "Empty response from weather service. Please try again."
+                )
+            
+            return response.content
+            
         except WeatherServiceError:
             # Re-raise our custom exceptions
             raise
         except httpx.TimeoutException:
-            raise WeatherServiceError(
+            raise ServiceUnavailableError(
                 "Request timed out. Please check your internet connection."
             )
-        except httpx.NetworkError:
-            raise WeatherServiceError(
+        except (httpx.NetworkError, httpx.RemoteProtocolError):
+            raise ServiceUnavailableError(
                 "Network error. Please check your internet connection."
             )
         except httpx.HTTPError as e:
@@ -104,43 +441,117 @@ class WeatherService:
     async def get_weather_by_coordinates(
         self, 
         lat: float, 
-        lon: float
-    ) -> Dict:
+        lon: float,
+        on_refresh: Optional[RefreshCallback] = None,
+        priority: int = Priority.INTERACTIVE,
+        max_wait: Optional[float] = None,
+    ) -> CurrentWeather:
         """
         Fetch weather data by coordinates.
         
+        Nearby points share a grid cell and with it one cached response.
+        
         Args:
             lat: Latitude
             lon: Longitude
+            on_refresh: Called with fresh data after a stale-while-revalidate refresh
+            priority: Rate limiter lane
+            max_wait: Longest wait for the rate limiter, in seconds
             
         Returns:
-            Dictionary containing weather data
+            Current weather at the coordinates
+            
+        Raises:
+            WeatherServiceError: If the coordinates are invalid or the request fails
+        """
+        self._check_coordinates(lat, lon)
+        return await self._lookup(
+            "weather", (lat, lon), Config.CURRENT_WEATHER_TTL, self._fetch_weather,
+            self.decoder.weather, on_refresh, priority, max_wait,
+        )
+    
+    def get_weather_many(
+        self,
+        queries: Iterable[Query],
+        concurrency: Optional[int] = None,
+        priority: int = Priority.BACKGROUND,
+    ) -> WeatherBatch:
         """
-        params = {
-            "lat": lat,
-            "lon": lon,
-            "appid": self.api_key,
-            "units": Config.UNITS,
-        }
+        Fetch current weather for many cities or coordinates.
         
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(self.base_url, params=params)
-                response.raise_for_status()
-                return response.json()
-                
-        except Exception as e:
-            raise WeatherServiceError(f"Error fetching weather data: {str(e)}")
+        Args:
+            queries: City names and/or (lat, lon) pairs
+            concurrency: Maximum lookups in flight (Config.BATCH_CONCURRENCY);
+                all of them share this service's connection pool, so keep
+                it within the pool's keep-alive limit
+            priority: Rate limiter lane; batches yield to interactive searches
+            
+        Returns:
+            Async iterator of BatchResult in completion order; its stats
+            attribute reports throughput once the loop finishes
+        
+        Example:
+            batch = service.get_weather_many(["London", (14.6, 121.0)])
+            async for result in batch:
+                print(result.query, result.data or result.error)
+            print(batch.stats.summary())
+        """
+        return WeatherBatch(
+            functools.partial(self._fetch_query, priority=priority),
+            queries,
+            concurrency or Config.BATCH_CONCURRENCY,
+        )
     
-    async def get_forecast(self, city: str) -> Dict:
+    async def _fetch_query(self, query: Query, priority: int) -> CurrentWeather:
+        """Look up a single batch query (city name or coordinates)."""
+        if isinstance(query, str):
+            return await self.get_weather(query, priority=priority)
+        lat, lon = query
+        return await self.get_weather_by_coordinates(lat, lon, priority=priority)
+    
+    def get_forecast_many(
+        self,
+        queries: Iterable[Query],
+        concurrency: Optional[int] = None,
+        priority: int = Priority.BACKGROUND,
+    ) -> WeatherBatch:
+        """
+        Fetch 5-day forecasts for many cities or coordinates.
+        
+        Same as get_weather_many, but each BatchResult holds a Forecast.
+        """
+        return WeatherBatch(
+            functools.partial(self._fetch_forecast_query, priority=priority),
+            queries,
+            concurrency or Config.BATCH_CONCURRENCY,
+        )
+    
+    async def _fetch_forecast_query(self, query: Query, priority: int) -> Forecast:
+        """Look up the forecast for a single batch query."""
+        if isinstance(query, str):
+            return await self.get_forecast(query, priority=priority)
+        lat, lon = query
+        return await self.get_forecast_by_coordinates(lat, lon, priority=priority)
+    
+    async def get_forecast(
+        self,
+        city: str,
+        on_refresh: Optional[RefreshCallback] = None,
+        priority: int = Priority.INTERACTIVE,
+        max_wait: Optional[float] = None,
+    ) -> Forecast:
         """
         Fetch 5-day weather forecast for a given city.
         
         Args:
             city: Name of the city
+            on_refresh: Called with fresh data when a stale cached response
+                was returned and its background refresh completes
+            priority: Rate limiter lane (Priority.INTERACTIVE or BACKGROUND)
+            max_wait: Longest wait for the rate limiter, in seconds
             
         Returns:
-            Dictionary containing forecast data
+            Forecast for the city (immutable, shared with the cache)
             
         Raises:
             WeatherServiceError: If the request fails
@@ -150,30 +561,402 @@ class WeatherService:
             raise WeatherServiceError("City name cannot be empty")
         
         city = city.strip()
+        return await self._lookup(
+            "forecast", city, Config.FORECAST_TTL, self._fetch_forecast,
+            self.decoder.forecast, on_refresh, priority, max_wait,
+        )
+    
+    async def get_forecast_by_coordinates(
+        self,
+        lat: float,
+        lon: float,
+        on_refresh: Optional[RefreshCallback] = None,
+        priority: int = Priority.INTERACTIVE,
+        max_wait: Optional[float] = None,
+    ) -> Forecast:
+        """
+        Fetch the 5-day forecast by coordinates, cached per grid cell.
         
-        # Use forecast API endpoint
-        forecast_url = "https://api.openweathermap.org/data/2.5/forecast"
-        
-        params = {
-            "q": city,
-            "appid": self.api_key,
-            "units": Config.UNITS,
-        }
+        Raises:
+            WeatherServiceError: If the coordinates are invalid or the request fails
+        """
+        self._check_coordinates(lat, lon)
+        return await self._lookup(
+            "forecast", (lat, lon), Config.FORECAST_TTL, self._fetch_forecast,
+            self.decoder.forecast, on_refresh, priority, max_wait,
+        )
+    
+    async def _fetch_forecast(
+        self, query: Query, priority: int, max_wait: Optional[float]
+    ) -> bytes:
+        """Request the forecast from the API; returns the raw body."""
+        params = self._params(query)
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(forecast_url, params=params)
-                response.raise_for_status()
-                return response.json()
+            response = await self._send("forecast", params, priority, max_wait)
+            response.raise_for_status()
+            return response.content
         
+        except WeatherServiceError:
+            raise
         except httpx.TimeoutException:
-            raise WeatherServiceError("Request timed out. Please try again.")
+            raise ServiceUnavailableError("Request timed out. Please try again.")
+        except (httpx.NetworkError, httpx.RemoteProtocolError):
+            raise ServiceUnavailableError(
+                "Network error. Please check your internet connection."
+            )
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
-                raise WeatherServiceError(f"City '{city}' not found")
+                raise NotFoundError(self._not_found(query))
             elif e.response.status_code == 401:
                 raise WeatherServiceError("Invalid API key")
+            elif e.response.status_code >= 500:
+                raise ServiceUnavailableError(
+                    "Weather service is currently unavailable. "
+                    "Please try again later."
+                )
             else:
                 raise WeatherServiceError(f"HTTP error occurred: {str(e)}")
         except Exception as e:
-            raise WeatherServiceError(f"Error fetching forecast data: {str(e)}")
\ No newline at end of file
+            raise WeatherServiceError(f"Error fetching forecast data: {str(e)}")
+    
+    def _params(self, query: Query) -> Dict:
+        """Request parameters for a city name or a (lat, lon) pair."""
+        if isinstance(query, str):
+            location = {"q": query}
+        else:
+            location = {"lat": round(query[0], 6), "lon": round(query[1], 6)}
+        return {**location, "appid": self.api_key, "units": Config.UNITS}
+    
+    @staticmethod
+    def _not_found(query: Query) -> str:
+        if isinstance(query, str):
+            return f"City '{query}' not found. Please check the spelling."
+        return f"No weather data for {query[0]:.4f}, {query[1]:.4f}."
+    
+    @staticmethod
+    def _check_coordinates(lat: float, lon: float):
+        if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+            raise WeatherServiceError(
+                f"Invalid coordinates: {lat}, {lon}. "
+                "Latitude must be within ±90 and longitude within ±180."
+            )
+    
+    def _location(self, query: Query) -> Tuple[str, Query]:
+        """
+        Cache key part and API query for a city name or (lat, lon) pair.
+        
+        Points, and cities whose coordinates are known, map to their grid
+        cell and are requested by coordinates. Other cities are keyed and
+        requested by name until their first response says where they are.
+        Only coordinates in memory count; see _load_location().
+        """
+        if isinstance(query, str):
+            name = normalize_city(query)
+            coordinates = self.locations.get(name)
+            if coordinates is None:
+                return name, query
+            query = coordinates
+        lat, lon = query
+        return grid_cell(lat, lon, self.grid_resolution), (lat, lon)
+    
+    async def _load_location(self, query: Query):
+        """Bring a city's coordinates saved by an earlier session into memory."""
+        if self.disk_cache is None or not isinstance(query, str):
+            return
+        name = normalize_city(query)
+        if self.locations.get(name) is None:
+            coordinates = await asyncio.to_thread(self.locations.read, name)
+            if coordinates is not None:
+                self.locations.set(name, *coordinates)
+    
+    async def remember_location(self, city: str, lat: float, lon: float):
+        """
+        Record where a city is, e.g. from an offline suggestion, so its
+        first lookup already goes by coordinates.
+        """
+        name = normalize_city(city)
+        if self.locations.set(name, lat, lon) and self.disk_cache is not None:
+            await asyncio.to_thread(self.locations.persist, name)
+    
+    async def prefetch(
+        self,
+        city: str,
+        min_ttl: float = 0.0,
+        priority: int = Priority.BACKGROUND,
+        max_wait: Optional[float] = None,
+    ) -> int:
+        """
+        Refresh the cached weather and forecast for a city ahead of use.
+        
+        A response that stays fresh in the memory cache for at least
+        min_ttl more seconds is left alone, so calling this often is cheap.
+        
+        Args:
+            city: Name of the city
+            min_ttl: Refresh responses that expire sooner than this
+            priority: Rate limiter lane; background by default
+            max_wait: Longest wait for the rate limiter, in seconds
+            
+        Returns:
+            Number of HTTP requests sent to the API, retries and hedges
+            included
+            
+        Raises:
+            WeatherServiceError: If a request fails; its `requests`
+                attribute holds the requests sent before that
+        """
+        if not city or not city.strip():
+            raise WeatherServiceError("City name cannot be empty")
+        
+        city = city.strip()
+        sent = [0]
+        token = _sent.set(sent)
+        try:
+            await self._prefetch(city, min_ttl, priority, max_wait)
+        except WeatherServiceError as e:
+            e.requests = sent[0]
+            raise
+        finally:
+            _sent.reset(token)
+        return sent[0]
+    
+    async def _prefetch(self, city: str, min_ttl: float, priority: int, max_wait: Optional[float]):
+        for kind, ttl, fetch, parse in (
+            ("weather", Config.CURRENT_WEATHER_TTL, self._fetch_weather, self.decoder.weather),
+            ("forecast", Config.FORECAST_TTL, self._fetch_forecast, self.decoder.forecast),
+        ):
+            await self._load_location(city)
+            location, request = self._location(city)
+            key = (kind, location, Config.UNITS)
+            if self.cache.ttl(key) > min_ttl:
+                continue
+            if self.disk_cache is not None:
+                # A fresh enough copy from an earlier session only needs loading
+                model, stored_at = await asyncio.to_thread(self._load_from_disk, key, parse)
+                remaining = ttl - (time.time() - stored_at)
+                if model is not None and remaining > min_ttl:
+                    self.cache.set(key, model, remaining, approximate_size(model))
+                    self._remember(key, Snapshot(model, stored_at))
+                    continue
+            await self.inflight.do(
+                self._flight_key(key, priority),
+                functools.partial(
+                    self._fetch_and_store, key, request, ttl, fetch, parse, priority, max_wait
+                ),
+            )
+    
+    def _flight_key(self, key: Tuple[str, str, str], priority: int) -> Tuple:
+        """
+        Key a fetch is shared under. A caller only joins a fetch waiting in
+        a rate limiter lane at least as urgent as its own, so a search is
+        never queued (or rejected) behind a background refresh.
+        """
+        for lane in Priority.ALL:
+            if lane > priority:
+                break
+            if (key, lane) in self.inflight:
+                return key, lane
+        return key, priority
+    
+    async def _lookup(
+        self,
+        kind: str,
+        query: Query,
+        ttl: float,
+        fetch: FetchFunction,
+        parse: ParseFunction,
+        on_refresh: Optional[RefreshCallback],
+        priority: int,
+        max_wait: Optional[float],
+    ) -> WeatherModel:
+        """
+        Resolve a request through the memory cache, then the disk cache,
+        then the network.
+        
+        A disk entry older than its TTL but within Config.STALE_TTL is
+        returned immediately while a background task fetches a fresh copy
+        and hands it to on_refresh (stale-while-revalidate). Refreshes use
+        the background rate limiter lane. The memory cache holds parsed
+        models; the disk cache holds raw response bodies.
+        """
+        await self._load_location(query)
+        location, request = self._location(query)
+        key = (kind, location, Config.UNITS)
+        stats = self.location_stats
+        stats.lookups += 1
+        if isinstance(query, str) and not isinstance(request, str):
+            stats.resolved += 1
+        cached = self.cache.get(key)
+        if cached is not None:
+            stats.hits += 1
+            return cached
+        
+        if self.disk_cache is not None:
+            model, stored_at = await asyncio.to_thread(self._load_from_disk, key, parse)
+            if model is not None:
+                self._remember(key, Snapshot(model, stored_at))
+                age = time.time() - stored_at
+                if age < ttl + Config.STALE_TTL:
+                    if age < ttl:
+                        self.cache.set(key, model, ttl - age, approximate_size(model))
+                    else:
+                        self._revalidate(key, request, ttl, fetch, parse, on_refresh)
+                    stats.hits += 1
+                    return model
+        
+        return await self.inflight.do(
+            self._flight_key(key, priority),
+            lambda: self._fetch_and_store(key, request, ttl, fetch, parse, priority, max_wait),
+        )
+    
+    async def _fetch_and_store(
+        self,
+        key: Tuple[str, str, str],
+        request: Query,
+        ttl: float,
+        fetch: FetchFunction,
+        parse: ParseFunction,
+        priority: int = Priority.INTERACTIVE,
+        max_wait: Optional[float] = None,
+    ) -> WeatherModel:
+        """Fetch from the network, decode, and store the response in both caches."""
+        body = await fetch(request, priority, max_wait)
+        try:
+            model = parse(body)
+        except DecodeError:
+            raise WeatherServiceError(
+                "Invalid response from weather service. Please try again."
+            )
+        if isinstance(request, str) and (model.lat or model.lon):
+            # The response says where the city is: from now on it is looked
+            # up by coordinates and stored in that grid cell
+            name = normalize_city(request)
+            if self.locations.set(name, model.lat, model.lon):
+                self.location_stats.geocoded += 1
+                if self.disk_cache is not None:
+                    await asyncio.to_thread(self.locations.persist, name)
+            key = (key[0], grid_cell(model.lat, model.lon, self.grid_resolution), key[2])
+        stored_at = time.time()
+        self.cache.set(key, model, ttl, approximate_size(model))
+        self._remember(key, Snapshot(model, stored_at))
+        if self.disk_cache is not None:
+            await asyncio.to_thread(
+                self.disk_cache.set, self._disk_key(key), body, stored_at, True
+            )
+        return model
+    
+    def _revalidate(self, key, request, ttl, fetch, parse, on_refresh):
+        """Refresh a stale entry in the background (once per key)."""
+        if key in self._refreshing:
+            return
+        
+        async def refresh():
+            try:
+                data = await self.inflight.do(
+                    self._flight_key(key, Priority.BACKGROUND),
+                    lambda: self._fetch_and_store(key, request, ttl, fetch, parse, Priority.BACKGROUND),
+                )
+                if on_refresh is not None:
+                    result = on_refresh(data)
+                    if inspect.isawaitable(result):
+                        await result
+            except WeatherServiceError as e:
+                # The stale copy is already on screen; try again next lookup
+                logger.warning("Background refresh failed for %s: %s", request, e)
+            finally:
+                self._refreshing.pop(key, None)
+        
+        self._refreshing[key] = asyncio.create_task(refresh())
+    
+    def _load_from_disk(self, key, parse: ParseFunction) -> Tuple[Optional[WeatherModel], float]:
+        """
+        Return (model, stored_at) from the disk cache, or (None, 0) if
+        unusable (blocking; run it off the event loop).
+        """
+        entry = self.disk_cache.get(self._disk_key(key))
+        if entry is None:
+            return None, 0.0
+        body, stored_at, _size = entry
+        try:
+            return parse(body), stored_at
+        except DecodeError:
+            # Written by an older version or corrupted; fetch a fresh copy
+            self.disk_cache.delete(self._disk_key(key))
+            return None, 0.0
+    
+    def cache_status(self, kind: str, query: Query) -> Tuple[float, Optional[float]]:
+        """
+        How fresh the cached response for a lookup is, e.g. for HTTP
+        cache headers.
+        
+        Args:
+            kind: "weather" or "forecast"
+            query: City name or (lat, lon) pair
+            
+        Returns:
+            (seconds the memory cache keeps serving it, 0 if it holds no
+            fresh copy; seconds since it was fetched, None if unknown)
+        """
+        location, _ = self._location(query)
+        key = (kind, location, Config.UNITS)
+        snapshot = self._last_known.get(key)
+        age = max(0.0, time.time() - snapshot.stored_at) if snapshot is not None else None
+        return self.cache.ttl(key), age
+    
+    async def get_last_known(self, city: str, kind: str = "weather") -> Optional[Snapshot]:
+        """
+        The last successful response for a city, however old.
+        
+        Used to keep showing something useful while the API is unreachable;
+        check the snapshot's age before presenting it as current.
+        
+        Args:
+            city: Name of the city
+            kind: "weather" or "forecast"
+            
+        Returns:
+            Snapshot of the model and when it was fetched, or None if the
+            city was never fetched successfully
+        """
+        await self._load_location(city)
+        location, _ = self._location(city)
+        keys = [(kind, location, Config.UNITS)]
+        if location != normalize_city(city):
+            # Saved before the city's coordinates were known
+            keys.append((kind, normalize_city(city), Config.UNITS))
+        for key in keys:
+            snapshot = self._last_known.get(key)
+            if snapshot is not None:
+                return snapshot
+        if self.disk_cache is None:
+            return None
+        
+        # Not seen in this session; snapshots survive restarts on disk
+        parse = self.decoder.weather if kind == "weather" else self.decoder.forecast
+        for key in keys:
+            entry = await asyncio.to_thread(self.disk_cache.get_snapshot, self._disk_key(key))
+            if entry is None:
+                continue
+            body, stored_at = entry
+            try:
+                snapshot = Snapshot(parse(body), stored_at)
+            except DecodeError:
+                continue
+            self._remember(key, snapshot)
+            return snapshot
+        return None
+    
+    def _remember(self, key: Tuple[str, str, str], snapshot: Snapshot):
+        """Keep a snapshot as the key's last-known response, bounded LRU."""
+        current = self._last_known.get(key)
+        if current is not None and current.stored_at > snapshot.stored_at:
+            return
+        self._last_known[key] = snapshot
+        self._last_known.move_to_end(key)
+        while len(self._last_known) > self.max_snapshots:
+            self._last_known.popitem(last=False)
+    
+    @staticmethod
+    def _disk_key(key: Tuple[str, str, str]) -> str:
+        return "|".join(key)
@@ -2,12 +2,31 @@
 """Simple tests for weather service."""
 
 import asyncio
-from weather_service import WeatherService, WeatherServiceError
+import os
+import sys
+from pathlib import Path
 
+# Run against the stand-in OpenWeatherMap server shared with mod6_labs,
+# so no real API key or network access is needed
+sys.path.append(str(Path(__file__).resolve().parent.parent / "mod6_labs"))
+os.environ.setdefault("OPENWEATHER_API_KEY", "test-key")
 
-async def test_valid_city():
-    """Test fetching weather for a valid city."""
+from fake_server import FakeWeatherServer  # noqa: E402
+from weather_service import WeatherService, WeatherServiceError  # noqa: E402
+
+UNKNOWN_CITY = "InvalidCityXYZ123"
+
+
+def make_service(server: FakeWeatherServer) -> WeatherService:
+    """Create a WeatherService pointed at the stand-in server."""
     service = WeatherService()
+    service.base_url = server.weather_url
+    return service
+
+
+async def test_valid_city(server: FakeWeatherServer):
+    """Test fetching weather for a valid city."""
+    service = make_service(server)
     try:
         data = await service.get_weather("London")
         print(f"✅ Successfully fetched weather for {data['name']}")
@@ -18,11 +37,11 @@ async def test_valid_city():
         return False
 
 
-async def test_invalid_city():
+async def test_invalid_city(server: FakeWeatherServer):
     """Test handling of invalid city."""
-    service = WeatherService()
+    service = make_service(server)
     try:
-        await service.get_weather("InvalidCityXYZ123")
+        await service.get_weather(UNKNOWN_CITY)
         print("❌ Should have raised an error")
         return False
     except WeatherServiceError as e:
@@ -48,8 +67,9 @@ async def run_tests():
     print("=" * 50)
     
     results = []
-    results.append(await test_valid_city())
-    results.append(await test_invalid_city())
+    async with FakeWeatherServer(unknown_cities={UNKNOWN_CITY}) as server:
+        results.append(await test_valid_city(server))
+        results.append(await test_invalid_city(server))
     results.append(await test_empty_city())
     
     print("\n" + "=" * 50)